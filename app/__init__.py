@@ -4,17 +4,56 @@ from config import Config
 
 db = SQLAlchemy()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
+
+    # pool and driver settings for the configured backend, explicit options take precedence
+    from app.engine import engine_options, register_sqlite_pragmas
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
 
     db.init_app(app)
+    with app.app_context():
+        register_sqlite_pragmas(db.engine, app.config)
+
+    from app.cache import cache
+    cache.init_app(app)
+
+    from app.events import stock_events
+    stock_events.init_app(app)
+
+    from app.jobs import JobRunner
+    app.extensions['jobs'] = JobRunner(app, max_workers=app.config['JOB_WORKERS'])
+
+    from app.uploads import receipt_thumbnail
+    app.jinja_env.globals['receipt_thumbnail'] = receipt_thumbnail
 
     from app.routes_main import main
     from app.routes_form import form
     from app.auth import auth
+    from app.routes_api import api
     app.register_blueprint(main)
     app.register_blueprint(form)
     app.register_blueprint(auth)
+    app.register_blueprint(api)
+
+    from app.profiling import profiler
+    profiler.init_app(app)
+
+    from app.commands import (
+        reconcile_stock, check_stock, rebuild_movements, check_indexes, create_user, migrate, expire_stock,
+        collapse_items, split_lots, rebuild_search, archive_items)
+    app.cli.add_command(reconcile_stock)
+    app.cli.add_command(check_stock)
+    app.cli.add_command(rebuild_movements)
+    app.cli.add_command(rebuild_search)
+    app.cli.add_command(check_indexes)
+    app.cli.add_command(create_user)
+    app.cli.add_command(migrate)
+    app.cli.add_command(expire_stock)
+    app.cli.add_command(collapse_items)
+    app.cli.add_command(split_lots)
+    app.cli.add_command(archive_items)
 
     return app
\ No newline at end of file
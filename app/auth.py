@@ -1,8 +1,18 @@
-from flask import Blueprint, redirect, url_for, session, render_template, request, flash
+from functools import lru_cache, wraps
+from flask import Blueprint, redirect, url_for, session, render_template, request, flash, g, abort
+from app.database import DatabaseManager
 
 # Create a Blueprint for the authentication routes
 auth = Blueprint('auth', __name__)
 
+# The permissions granted to every role
+ROLE_PERMISSIONS = {
+    'Cashier': ('view_stock', 'reduce_stock'),
+    'Admin Gudang': ('view_stock', 'reduce_stock', 'receive_stock', 'view_dashboard'),
+    'Super Admin': ('view_stock', 'reduce_stock', 'receive_stock', 'view_dashboard', 'edit_product', 'delete_product',
+                    'view_metrics'),
+}
+
 # * Route endpoint login
 @auth.route('/login', methods=['GET', 'POST'])
 def login():
@@ -10,23 +20,81 @@ def login():
         username = request.form['username']
         password = request.form['password']
 
-        # check username and password is correct and set as role session
-        if username == 'cashier' and password == 'cashier':
-            session['role'] = 'Cashier'
-        elif username == 'admingudang' and password == 'admingudang':
-            session['role'] = 'Admin Gudang'
-        elif username == 'superadmin' and password == 'superadmin':
-            session['role'] = 'Super Admin'
-        else:
+        # check username and password against the user table and keep the role in the session
+        user = DatabaseManager.authenticate_user(username, password)
+        if not user:
+            flash('Username atau password salah.', 'danger')
             return redirect(url_for('auth.login'))
 
-        return redirect(url_for('main.products'))
+        session['user_id'] = user.user_id
+        session['role'] = user.role
+        # only follow local paths back after logging in
+        next_url = request.args.get('next', '')
+        if not next_url.startswith('/') or next_url.startswith('//'):
+            next_url = url_for('main.products')
+        return redirect(next_url)
 
     return render_template('login.html')
 
 # * Route endpoint logout
 @auth.route('/logout')
 def logout():
-    # remove role session
+    # remove user and role session
+    session.pop('user_id', None)
     session.pop('role', None)
     return redirect(url_for('main.index'))
+
+
+@lru_cache(maxsize=None)
+def role_permissions(role:str):
+    '''Returns the permissions of a role as a frozenset, empty for unknown roles or anonymous users.'''
+    return frozenset(ROLE_PERMISSIONS.get(role, ()))
+
+
+@auth.before_app_request
+def load_permissions():
+    '''
+    Resolve the permissions of the current user once per request from their role in the user table,
+    so a demoted or deleted user loses access on their next request instead of at logout.
+    '''
+    if request.endpoint == 'static':
+        g.permissions = role_permissions(None)
+        return
+    user_id = session.get('user_id')
+    role = DatabaseManager.get_user_role(user_id) if user_id is not None else None
+    if role is None:
+        # a deleted user, or a session from before the user table, is logged out
+        session.pop('user_id', None)
+        session.pop('role', None)
+    elif session.get('role') != role:
+        session['role'] = role
+    g.permissions = role_permissions(role)
+
+
+@auth.app_template_global()
+def can(permission:str):
+    '''Template helper returning whether the current user has a permission.'''
+    return permission in g.get('permissions', ())
+
+
+def permission_required(permission:str):
+    '''
+    Decorate a view so it only runs for users with a permission.
+
+    Anonymous users are redirected to the login page, logged in users without
+    the permission get a 403. The role was already loaded by `load_permissions`, no hash is computed.
+
+    Parameters:
+        permission (str): The permission from `ROLE_PERMISSIONS` the view needs.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if permission not in g.permissions:
+                if 'role' not in session:
+                    next_url = request.full_path if request.query_string else request.path
+                    return redirect(url_for('auth.login', next=next_url))
+                abort(403)
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,164 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict, Counter
+from flask import current_app
+
+
+class LocalCacheBackend:
+    """
+    In-process cache with per-entry TTL and least recently used eviction.
+
+    Methods:
+        get: Get a value, or None if it is missing or expired.
+        set: Store a value for a number of seconds.
+        delete_prefix: Remove every key starting with a prefix.
+        size: Returns the number of stored entries.
+    """
+    def __init__(self, max_entries:int=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key:str):
+        '''Get a value, or None if it is missing or expired.'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key:str, value, ttl:int):
+        '''Store a value for `ttl` seconds, evicting the least recently used entries when full.'''
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix:str):
+        '''Remove every key starting with `prefix`.'''
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def size(self):
+        '''Returns the number of stored entries.'''
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Cache shared by every worker through Redis, so an invalidation in one worker is seen by all.
+    Requires the optional `redis` package.
+
+    Methods:
+        get: Get a value, or None if it is missing or expired.
+        set: Store a value for a number of seconds.
+        delete_prefix: Remove every key starting with a prefix.
+        size: Returns the number of stored entries.
+    """
+    def __init__(self, url:str, key_prefix:str='inventory:'):
+        try:
+            import redis
+        except ImportError as error:
+            raise RuntimeError('CACHE_BACKEND points to Redis but the `redis` package is not installed') from error
+        self.key_prefix = key_prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key:str):
+        '''Get a value, or None if it is missing or expired.'''
+        value = self._client.get(self.key_prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key:str, value, ttl:int):
+        '''Store a value for `ttl` seconds, Redis evicts according to its own `maxmemory-policy`.'''
+        self._client.set(self.key_prefix + key, pickle.dumps(value), ex=ttl)
+
+    def delete_prefix(self, prefix:str):
+        '''Remove every key starting with `prefix`.'''
+        keys = list(self._client.scan_iter(match=f'{self.key_prefix}{prefix}*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def size(self):
+        '''Returns the number of stored entries.'''
+        return sum(1 for _ in self._client.scan_iter(match=f'{self.key_prefix}*'))
+
+
+class Cache:
+    """
+    Read-through cache for rarely changing data, with explicit invalidation by namespace.
+
+    Keys are `<namespace>:<name>`. The backend is chosen per application with `CACHE_BACKEND`:
+    `local` for an in-process LRU cache, or a `redis://` URL to share entries between workers.
+
+    Methods:
+        init_app: Set up the cache backend of an application.
+        get_or_set: Get a cached value, computing and storing it on a miss.
+        invalidate: Remove every cached value of a namespace.
+        stats: Returns the hit and miss counters of the cache.
+    """
+    def init_app(self, app):
+        '''Set up the cache backend of an application from its config.'''
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'local':
+            backend = LocalCacheBackend(app.config['CACHE_MAX_ENTRIES'])
+        else:
+            backend = RedisCacheBackend(backend)
+        app.extensions['cache'] = {
+            'backend': backend,
+            'hits': Counter(),
+            'misses': Counter(),
+        }
+
+    def get_or_set(self, key:str, factory, ttl:int=None):
+        '''
+        Get a cached value, computing and storing it on a miss.
+
+        Parameters:
+            key (str): The cache key, `<namespace>:<name>`.
+            factory (callable): Computes the value on a miss, its result must not be None.
+            ttl (int): The seconds to keep the value (optional, defaults to `CACHE_DEFAULT_TTL`).
+
+        Returns:
+            The cached or freshly computed value.
+        '''
+        state = current_app.extensions['cache']
+        namespace = key.split(':', 1)[0]
+        value = state['backend'].get(key)
+        if value is not None:
+            state['hits'][namespace] += 1
+            return value
+
+        state['misses'][namespace] += 1
+        value = factory()
+        state['backend'].set(key, value, ttl or current_app.config['CACHE_DEFAULT_TTL'])
+        return value
+
+    def invalidate(self, namespace:str):
+        '''Remove every cached value of a namespace.'''
+        current_app.extensions['cache']['backend'].delete_prefix(f'{namespace}:')
+
+    def stats(self):
+        '''
+        Returns the hit and miss counters of the cache.
+
+        Returns:
+            dict: The backend name, the entry count and per-namespace `hits` and `misses`.
+        '''
+        state = current_app.extensions['cache']
+        return {
+            'backend': type(state['backend']).__name__,
+            'size': state['backend'].size(),
+            'hits': dict(state['hits']),
+            'misses': dict(state['misses']),
+        }
+
+
+cache = Cache()
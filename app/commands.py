@@ -0,0 +1,142 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from app.database import DatabaseManager
+
+
+# * Command reconcile stock counters
+@click.command('reconcile-stock')
+@click.option('--product-id', type=int, default=None, help='Only reconcile this product.')
+@with_appcontext
+def reconcile_stock(product_id):
+    '''Rebuild the per-status product counters from the item table.'''
+    count = DatabaseManager.reconcile_stock_counts(product_id)
+    click.echo(f'Reconciled stock counters of {count} product(s).')
+
+
+# * Command check stock counters
+@click.command('check-stock')
+@click.option('--product-id', type=int, default=None, help='Only check this product.')
+@with_appcontext
+def check_stock(product_id):
+    '''Verify the per-status product counters against the item table.'''
+    mismatches = DatabaseManager.check_stock_counts(product_id)
+    for mismatch_product_id, status, stored, actual in mismatches:
+        click.echo(f'product {mismatch_product_id}: {status} counter is {stored}, item table has {actual}')
+    # counted stock that reductions cannot claim is as wrong for the cashier as a bad counter
+    unclaimable = DatabaseManager.find_unclaimable_lots(product_id)
+    for lot_product_id, units in unclaimable.items():
+        click.echo(f'product {lot_product_id}: {units} available unit(s) are in lots, '
+                   f'which cannot be reduced without STOCK_LOTS')
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} stock counter(s) out of sync.')
+    if unclaimable:
+        raise click.ClickException(f'{len(unclaimable)} product(s) have lots, run `flask split-lots`.')
+    click.echo('Stock counters are consistent.')
+
+
+# * Command rebuild stock movement rollup
+@click.command('rebuild-movements')
+@with_appcontext
+def rebuild_movements():
+    '''Rebuild the daily stock movement rollup from the item table.'''
+    count = DatabaseManager.rebuild_stock_movements()
+    click.echo(f'Rebuilt {count} stock movement row(s).')
+
+
+# * Command rebuild product search index
+@click.command('rebuild-search')
+@with_appcontext
+def rebuild_search():
+    '''Rebuild the product search index from the product table.'''
+    count = DatabaseManager.rebuild_product_search()
+    click.echo(f'Indexed {count} product(s) for search.')
+
+
+# * Command check query plans
+@click.command('check-indexes')
+@with_appcontext
+def check_indexes():
+    '''Verify with the query planner that the hot queries use their indexes.'''
+    from app.query_plan import hot_query_indexes, assert_uses_index
+    failures = 0
+    for name, (statement, index_name) in hot_query_indexes().items():
+        try:
+            assert_uses_index(statement, index_name)
+            click.echo(f'{name}: uses {index_name}')
+        except AssertionError as error:
+            failures += 1
+            click.echo(f'{name}: {error}')
+    if failures:
+        raise click.ClickException(f'{failures} query plan(s) do not use their index.')
+
+
+# * Command create or update a user
+@click.command('create-user')
+@click.argument('username')
+@click.option('--role', required=True, type=click.Choice(['Cashier', 'Admin Gudang', 'Super Admin']),
+              help='The role of the user.')
+@click.password_option(help='The password, prompted for when omitted.')
+@with_appcontext
+def create_user(username, role, password):
+    '''Create a user, or change the role and password of an existing one.'''
+    DatabaseManager.save_user(username, password, role)
+    click.echo(f'Saved user {username} as {role}.')
+
+
+# * Command migrate the database schema
+@click.command('migrate')
+@with_appcontext
+def migrate():
+    '''Create the database or bring its schema up to date with the models.'''
+    from app.migrations import upgrade_schema
+    applied = upgrade_schema()
+    for change in applied:
+        click.echo(change)
+    click.echo(f'Applied {len(applied)} change(s).' if applied else 'Schema is up to date.')
+
+
+# * Command expire stock
+@click.command('expire-stock')
+@click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Expire items whose expiry date is before this day (defaults to today).')
+@with_appcontext
+def expire_stock(as_of):
+    '''Mark the available items past their expiry date as expired, meant to run daily from cron.'''
+    swept = DatabaseManager.expire_items(as_of.date() if as_of else None)
+    click.echo(f'Expired {sum(swept.values())} item(s) of {len(swept)} product(s).')
+
+
+# * Command collapse items into lots
+@click.command('collapse-items')
+@click.option('--product-id', type=int, default=None, help='Only collapse this product.')
+@with_appcontext
+def collapse_items(product_id):
+    '''Merge the item rows that only differ by ID into lots, run once after enabling STOCK_LOTS.'''
+    if not current_app.config['STOCK_LOTS']:
+        raise click.ClickException('Set STOCK_LOTS=1 first, lots are only split by reductions when it is enabled.')
+    rows_before, rows_after = DatabaseManager.collapse_items(product_id)
+    click.echo(f'Collapsed {rows_before} item row(s) into {rows_after} lot(s).')
+
+
+# * Command split lots into items
+@click.command('split-lots')
+@click.option('--product-id', type=int, default=None, help='Only split the lots of this product.')
+@with_appcontext
+def split_lots(product_id):
+    '''Split the available lots into one item row per unit, run once after disabling STOCK_LOTS.'''
+    if current_app.config['STOCK_LOTS']:
+        raise click.ClickException('Unset STOCK_LOTS first, lots are reduced as they are while it is enabled.')
+    lots, rows = DatabaseManager.split_lots(product_id)
+    click.echo(f'Split {lots} lot(s) into {rows} item row(s).')
+
+
+# * Command archive closed items
+@click.command('archive-items')
+@click.option('--days', type=int, default=None,
+              help='Archive items that left stock more than this many days ago (defaults to ARCHIVE_AFTER_DAYS).')
+@with_appcontext
+def archive_items(days):
+    '''Move old sold, expired and broken items out of the live item table, meant to run nightly from cron.'''
+    count = DatabaseManager.archive_items(days)
+    click.echo(f'Archived {count} item(s).')
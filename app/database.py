@@ -1,6 +1,90 @@
+import heapq
+from collections import namedtuple
+from itertools import islice
+from flask import current_app
 from app import db
-from .models import Product, Item
-from datetime import datetime
+from app.cache import cache
+from app.events import stock_events
+from app.search import search_query, rebuild_search_index, index_product, unindex_product
+from .models import Product, Item, ArchivedItem, StockMovement, User, ITEM_STATUSES
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta
+
+# The order items are allocated in when stock is reduced, both served by an index
+FIFO_ORDER = (Item.entry_date, Item.item_id)
+FEFO_ORDER = (Item.expiry_date, Item.entry_date, Item.item_id)
+
+# The lots marked per UPDATE when a reduction claims whole lots, kept below SQLite's bound parameter limit
+LOT_UPDATE_CHUNK_SIZE = 500
+
+class ProductRow(namedtuple('ProductRow', [
+        'product_id', 'name', 'category', 'sell_price', 'buy_price',
+        'available_count', 'sold_count', 'expire_count', 'broken_count', 'version'])):
+    """
+    Read-only row of a product with its per-status counters, selected as plain columns
+    for the list pages instead of loading `Product` instances into the session.
+
+    Methods:
+        item_count: Returns the count of `available` items for this product.
+        status_counts: Returns the item count of every status for this product.
+        to_dict: Returns the product and its counters as a JSON serialisable dict.
+    """
+    __slots__ = ()
+    columns = (Product.product_id, Product.name, Product.category, Product.sell_price, Product.buy_price,
+               Product.available_count, Product.sold_count, Product.expire_count, Product.broken_count,
+               Product.version)
+
+    item_count = Product.item_count
+    status_counts = Product.status_counts
+    to_dict = Product.to_dict
+
+
+class ItemRow(namedtuple('ItemRow', [
+        'item_id', 'product_id', 'status', 'entry_date', 'exit_date', 'sales_receipt', 'purchase_receipt',
+        'expiry_date', 'quantity'])):
+    """
+    Read-only row of an item or lot of either tier, selected as plain columns for the item pages
+    instead of loading `Item` instances.
+
+    Methods:
+        to_dict: Returns the item as a JSON serialisable dict.
+    """
+    __slots__ = ()
+
+    to_dict = Item.to_dict
+
+
+class InsufficientStockError(Exception):
+    """
+    Raised when a product does not have enough available items for a reduction.
+
+    Attributes:
+        product_id (int): The identifier of the product.
+        requested (int): The number of items that were requested.
+        available (int): The number of items that could be claimed.
+    """
+    def __init__(self, product_id:int, requested:int, available:int):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f'Product {product_id} has {available} available item(s), {requested} requested')
+
+
+class BatchLineError(Exception):
+    """
+    Raised when one line of a batch operation fails, the whole batch is rolled back.
+
+    Attributes:
+        index (int): The zero-based index of the failing line.
+        error (Exception): The error of the line.
+    """
+    def __init__(self, index:int, error:Exception):
+        self.index = index
+        self.error = error
+        super().__init__(f'Line {index + 1}: {error}')
+
 
 class DatabaseManager:
     """
@@ -8,14 +92,43 @@ class DatabaseManager:
 
     Methods:
         add_product: Add a new product or update an existing one with items.
-        get_all_products: Retrieve all products from the database.
+        add_product_bulk: Add items in bulk and return the created item ID range.
+        get_categories: Retrieve the distinct product categories (cached).
+        search_products: Find the products best matching a typeahead string.
+        rebuild_product_search: Rebuild the product search index from the product table.
+        filter_products: Build a query of the products, optionally of one category.
+        filter_items: Build a query of the items of a product with optional filters.
+        paginate_products: Retrieve one keyset page of products.
+        paginate_items: Retrieve one keyset page of the items of a product.
+        iter_items: Stream the filtered items of a product in chunks.
         get_product_by_id: Get a product by its ID.
+        get_product_row: Get a product by its ID as a read-only row.
         update_product: Update details of a product.
         delete_product: Delete a product and its associated items.
         reduce_item_quantity: Reduce the quantity of available items for a product.
+        reduce_items_batch: Reduce items of many products in one transaction.
+        receive_items_batch: Add items for many products in one transaction.
+        expire_items: Mark the available items past their expiry date as expired.
+        archive_items: Move closed items older than a number of days to the archive table.
+        collapse_items: Merge item rows that only differ by ID into lots.
+        split_lots: Split available lots back into one row per unit.
+        find_unclaimable_lots: Count the available units held in lots while `STOCK_LOTS` is disabled.
+        reconcile_stock_counts: Rebuild the per-status product counters from the item table.
+        check_stock_counts: Compare the per-status product counters against the item table.
+        iter_report_rows: Stream items joined with their product, ordered by week, in chunks.
+        rebuild_stock_movements: Rebuild the daily stock movement rollup from the item table.
+        get_weekly_movements: Summarise the stock movement rollup per week and product.
+        get_dashboard: Summarise stock value, margin and sell-through per category (cached).
+        save_user: Create a user or change their password and role.
+        authenticate_user: Verify a username and password, upgrading an outdated hash.
+
+    Catalog reads are cached in the `catalog` cache namespace, every method that changes
+    the catalog invalidates it after committing and keeps the product search index in sync. Dashboard figures are cached in the
+    `dashboard` namespace, which every stock change invalidates. Every commit that changes stock counters
+    publishes the new counters of the changed products to the `stock_events` change feed.
     """
     @staticmethod
-    def add_product(name: str, category: str, quantity: int, sell_price: float, buy_price: float, sales_receipt: str, entry_date: str):
+    def add_product(name: str, category: str, quantity: int, sell_price: float, buy_price: float, sales_receipt: str, entry_date: str, expiry_date: str = None):
         '''
         Add a new product or update an existing one with items.
 
@@ -27,47 +140,336 @@ class DatabaseManager:
             buy_price (float): The buying price of the product.
             sales_receipt (str): The sales receipt associated with the item.
             entry_date (str): The date and time when the product was added.
+            expiry_date (str): The last day the items may be sold, `YYYY-MM-DD` (optional).
 
         Returns:
             Product: The existing product if updated, or the new product added with items.
+
+        Raises:
+            ValueError: If the quantity is negative or a number or date is malformed, nothing is added.
+        '''
+        return DatabaseManager.add_product_bulk(
+            name, category, quantity, sell_price, buy_price, sales_receipt, entry_date, expiry_date=expiry_date)[0]
+
+    @staticmethod
+    def add_product_bulk(name: str, category: str, quantity: int, sell_price: float, buy_price: float, sales_receipt: str, entry_date: str, chunk_size: int = None, expiry_date: str = None):
+        '''
+        Add a new product or update an existing one with items, inserting the item rows
+        with executemany in bounded chunks instead of one ORM object per unit.
+
+        Parameters:
+            name (str): The name of the product.
+            category (str): The category of the product.
+            quantity (int): The quantity of items to add.
+            sell_price (float): The selling price of the product.
+            buy_price (float): The buying price of the product.
+            sales_receipt (str): The sales receipt associated with the item.
+            entry_date (str): The date and time when the product was added.
+            chunk_size (int): The number of rows per INSERT (optional, defaults to `ITEM_INSERT_CHUNK_SIZE`).
+            expiry_date (str): The last day the items may be sold, `YYYY-MM-DD` (optional).
+
+        Returns:
+            tuple: `(product, first_item_id, last_item_id)`, the item IDs are None when quantity is 0.
+            On SQLite the range is contiguous because the write lock is held from the first insert.
         '''
         entry_date = datetime.strptime(entry_date, '%Y-%m-%dT%H:%M')
-        # check if the product already exists
-        existing_product = Product.query.filter_by(
-            name=name, category=category, sell_price=sell_price, buy_price=buy_price).first()
-
-        # if the product already exists, add the quantity to the existing product
-        if existing_product:
-            for _ in range(int(quantity)):
-                new_item = Item(product_id=existing_product.product_id,
-                                status='available', sales_receipt=sales_receipt, entry_date=entry_date)
-                db.session.add(new_item)
-        # if the product does not exist, create a new product
-        else:
-            new_product = Product(
-                name=name, category=category, sell_price=sell_price, buy_price=buy_price)
-            db.session.add(new_product)
-            db.session.commit()
-            
-            # add item for the new product based on the quantity
-            for _ in range(int(quantity)):
-                new_item = Item(product_id=new_product.product_id,
-                                status='available', sales_receipt=sales_receipt, entry_date=entry_date)
-                db.session.add(new_item)
-
-        # commit the changes to the database
+        product, created, first_item_id, last_item_id = DatabaseManager._receive_items(
+            name, category, quantity, sell_price, buy_price, sales_receipt, entry_date, chunk_size,
+            DatabaseManager._parse_expiry_date(expiry_date))
+
+        # commit the items, the counters and the rollup in one transaction
+        db.session.commit()
+        cache.invalidate('dashboard')
+        stock_events.publish()
+        if created:
+            cache.invalidate('catalog')
+        return product, first_item_id, last_item_id
+
+    @staticmethod
+    def receive_items_batch(lines:list, entry_date:str, sales_receipt:str=None):
+        '''
+        Add items for many products in one all-or-nothing transaction, as `add_product` does per line.
+
+        Parameters:
+            lines (list): Dicts with `name`, `category`, `quantity`, `sell_price`, `buy_price`
+                and optionally `expiry_date` (`YYYY-MM-DD`).
+            entry_date (str): The date and time when the items were added.
+            sales_receipt (str): The sales receipt associated with the items (optional).
+
+        Returns:
+            list: One dict per line with `product_id`, `quantity`, `first_item_id` and `last_item_id`.
+
+        Raises:
+            BatchLineError: If a line is invalid, nothing is added.
+        '''
+        entry_date = datetime.strptime(entry_date, '%Y-%m-%dT%H:%M')
+        results, created_any = [], False
+        try:
+            for index, line in enumerate(lines):
+                try:
+                    product, created, first_item_id, last_item_id = DatabaseManager._receive_items(
+                        line['name'], line['category'], line['quantity'], line['sell_price'],
+                        line['buy_price'], sales_receipt, entry_date,
+                        expiry_date=DatabaseManager._parse_expiry_date(line.get('expiry_date')))
+                except (KeyError, TypeError, ValueError) as error:
+                    raise BatchLineError(index, error) from error
+                created_any = created_any or created
+                results.append({'product_id': product.product_id, 'quantity': int(line['quantity']),
+                                'first_item_id': first_item_id, 'last_item_id': last_item_id})
+        except BatchLineError:
+            db.session.rollback()
+            raise
+
         db.session.commit()
-        return existing_product if existing_product else new_product
+        cache.invalidate('dashboard')
+        stock_events.publish()
+        if created_any:
+            cache.invalidate('catalog')
+        return results
 
     @staticmethod
-    def get_all_products():
+    def _receive_items(name:str, category:str, quantity:int, sell_price:float, buy_price:float, sales_receipt:str, entry_date:datetime, chunk_size:int=None, expiry_date:date=None):
+        '''Find or create a product and add its items, counters and rollup without committing.'''
+        quantity = int(quantity)
+        if quantity < 0:
+            raise ValueError(f'Cannot add a negative quantity: {quantity}')
+        sell_price, buy_price = float(sell_price), float(buy_price)
+        chunk_size = chunk_size or current_app.config['ITEM_INSERT_CHUNK_SIZE']
+        # check if the product already exists, its identity is served by the `ux_product_identity` index
+        identity = {'name': name, 'category': category, 'sell_price': sell_price, 'buy_price': buy_price}
+        product = Product.query.filter_by(**identity).first()
+
+        # if the product does not exist, create a new product, unless a concurrent request just did
+        created = False
+        if product is None:
+            insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+            created = db.session.execute(insert(Product.__table__).values(**identity).on_conflict_do_nothing(
+                index_elements=['name', 'category', 'sell_price', 'buy_price'])).rowcount == 1
+            product = Product.query.filter_by(**identity).one()
+            if created:
+                index_product(product.product_id, name, category)
+
+        # add items for the product based on the quantity
+        first_item_id, last_item_id = DatabaseManager._insert_items(
+            product.product_id, quantity, sales_receipt, entry_date, chunk_size, expiry_date)
+        DatabaseManager._adjust_stock_counts(product.product_id, {'available': quantity})
+        DatabaseManager._record_movement(product, entry_date.date(), 'available', entries=quantity)
+        return product, created, first_item_id, last_item_id
+
+    @staticmethod
+    def get_categories():
         '''
-        Retrieve all products from the database.
+        Retrieve the distinct product categories, cached until the catalog changes.
 
         Returns:
-            list: A list of all products in the database.
+            list: A list of category names.
         '''
-        return Product.query.all()
+        return cache.get_or_set('catalog:categories', lambda: [
+            category for category, in db.session.query(Product.category).distinct().order_by(Product.category)
+        ])
+
+    @staticmethod
+    def search_products(query:str, limit:int=10):
+        '''
+        Find the products best matching a typeahead string with the product search index.
+
+        Parameters:
+            query (str): The text typed so far, matched against word prefixes of the name and category.
+            limit (int): The maximum number of products to return.
+
+        Returns:
+            list: Up to `limit` `ProductRow` tuples, best match first.
+        '''
+        query = search_query(ProductRow.columns, query, limit)
+        return [ProductRow(*row) for row in query] if query is not None else []
+
+    @staticmethod
+    def rebuild_product_search():
+        '''
+        Rebuild the product search index from the product table.
+
+        Returns:
+            int: The number of indexed products.
+        '''
+        rebuild_search_index()
+        db.session.commit()
+        return Product.query.count()
+
+    @staticmethod
+    def filter_products(category:str=None):
+        '''
+        Build a query of the products, optionally of one category.
+
+        Parameters:
+            category (str): Only include products of this category (optional).
+
+        Returns:
+            Query: The products query.
+        '''
+        query = Product.query
+        if category:
+            query = query.filter_by(category=category)
+        return query
+
+    @staticmethod
+    def filter_items(product_id:int, status:str=None, start_date:str=None, end_date:str=None, model=Item):
+        '''
+        Build a query of the items of a product, served by the `ix_item_product_status_entry` index
+        (`ix_item_archive_product_entry` on the archive).
+
+        Parameters:
+            product_id (int): The unique identifier of the product.
+            status (str): Only include items with this status (optional).
+            start_date (str): Only include items that entered on or after this date (optional).
+            end_date (str): Only include items that entered on or before this date (optional).
+            model: The tier to query, `Item` or `ArchivedItem` (optional, defaults to the live items).
+
+        Returns:
+            Query: The items query.
+        '''
+        query = model.query.filter_by(product_id=product_id)
+
+        # Filter items by status, start date, and end date
+        if status:
+            query = query.filter_by(status=status)
+        if start_date:
+            query = query.filter(model.entry_date >= start_date)
+        if end_date:
+            query = query.filter(model.entry_date <= end_date)
+        return query
+
+    @staticmethod
+    def paginate_products(category:str=None, after:str=None, limit:int=50):
+        '''
+        Retrieve one page of products ordered by ID, continuing after a cursor.
+
+        Parameters:
+            category (str): Only include products of this category (optional).
+            after (str): The cursor returned with the previous page (optional, starts at the first page).
+            limit (int): The maximum number of products on the page.
+
+        Returns:
+            tuple: `(products, next_cursor)` with `ProductRow` tuples, `next_cursor` is None on the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        '''
+        query = DatabaseManager.filter_products(category).with_entities(*ProductRow.columns)
+        if after:
+            query = query.filter(Product.product_id > int(after))
+        products = [ProductRow(*row) for row in query.order_by(Product.product_id).limit(limit + 1)]
+
+        # the extra row only tells whether there is a next page
+        if len(products) > limit:
+            products = products[:limit]
+            return products, str(products[-1].product_id)
+        return products, None
+
+    @staticmethod
+    def paginate_items(product_id:int, status:str=None, start_date:str=None, end_date:str=None, after:str=None, limit:int=100):
+        '''
+        Retrieve one page of the items of a product ordered by `(entry_date, item_id)`, continuing after a cursor.
+        The archived items are merged in when the filters reach the archive (see `_item_tiers`).
+
+        Parameters:
+            product_id (int): The unique identifier of the product.
+            status (str): Only include items with this status (optional).
+            start_date (str): Only include items that entered on or after this date (optional).
+            end_date (str): Only include items that entered on or before this date (optional).
+            after (str): The cursor returned with the previous page (optional, starts at the first page).
+            limit (int): The maximum number of items on the page.
+
+        Returns:
+            tuple: `(items, next_cursor)` with `ItemRow` tuples, `next_cursor` is None on the last page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        '''
+        cursor = DatabaseManager._parse_item_cursor(after) if after else None
+        tiers = []
+        for model in DatabaseManager._item_tiers(product_id, status, start_date):
+            query = DatabaseManager.filter_items(product_id, status, start_date, end_date, model) \
+                .with_entities(*DatabaseManager._item_columns(model))
+            if cursor:
+                query = query.filter(db.tuple_(model.entry_date, model.item_id) > cursor)
+            tiers.append(query.order_by(model.entry_date, model.item_id).limit(limit + 1))
+        items = [ItemRow(*row) for row in islice(DatabaseManager._merge_items(tiers), limit + 1)]
+
+        # the extra row only tells whether there is a next page
+        if len(items) > limit:
+            items = items[:limit]
+            return items, f'{items[-1].entry_date.isoformat()}_{items[-1].item_id}'
+        return items, None
+
+    @staticmethod
+    def iter_items(product_id:int, status:str=None, start_date:str=None, end_date:str=None, chunk_size:int=1000):
+        '''
+        Stream the items of a product with the filters of `filter_items`, ordered by `(entry_date, item_id)`.
+
+        The rows come from a server-side cursor `chunk_size` at a time, so memory use does not
+        depend on the number of items. Archived items are merged in when the filters reach the archive.
+
+        Parameters:
+            product_id (int): The unique identifier of the product.
+            status (str): Only include items with this status (optional).
+            start_date (str): Only include items that entered on or after this date (optional).
+            end_date (str): Only include items that entered on or before this date (optional).
+            chunk_size (int): The number of rows fetched from the database at a time.
+
+        Yields:
+            Row: `(item_id, status, entry_date, exit_date, sales_receipt, purchase_receipt, expiry_date, quantity)`.
+        '''
+        return DatabaseManager._merge_items([
+            DatabaseManager.filter_items(product_id, status, start_date, end_date, model)
+                .with_entities(model.item_id, model.status, model.entry_date, model.exit_date,
+                               model.sales_receipt, model.purchase_receipt, model.expiry_date, model.quantity)
+                .order_by(model.entry_date, model.item_id)
+                .execution_options(stream_results=True)
+                .yield_per(chunk_size)
+            for model in DatabaseManager._item_tiers(product_id, status, start_date)
+        ])
+
+    @staticmethod
+    def _item_tiers(product_id:int=None, status:str=None, start_date=None):
+        '''
+        Returns the item tables a read must query, the live items plus the archive only when it can hold matches.
+
+        The archive watermark is the newest entry date in the archive (of the product), read from the end of
+        an index. Reads of available items, or of items that entered after the watermark, skip the archive.
+        '''
+        if status == 'available':
+            return (Item,)
+        watermark = db.session.query(db.func.max(ArchivedItem.entry_date))
+        if product_id is not None:
+            watermark = watermark.filter(ArchivedItem.product_id == product_id)
+        watermark = watermark.scalar()
+        if isinstance(start_date, str):
+            try:
+                start_date = datetime.fromisoformat(start_date)
+            except ValueError:
+                # the database compares the raw string, keep both tiers
+                start_date = None
+        if watermark is None or (start_date and start_date > watermark):
+            return (Item,)
+        return (Item, ArchivedItem)
+
+    @staticmethod
+    def _item_columns(model):
+        '''Returns the columns of an item tier in `ItemRow` order.'''
+        return tuple(getattr(model, field) for field in ItemRow._fields)
+
+    @staticmethod
+    def _merge_items(tiers:list, key=lambda row: (row.entry_date, row.item_id)):
+        '''Merge item rows of several tiers, each already ordered by `key`, into one ordered iterator.'''
+        if len(tiers) == 1:
+            return iter(tiers[0])
+        return heapq.merge(*tiers, key=key)
+
+    @staticmethod
+    def _parse_item_cursor(cursor:str):
+        '''Split an item cursor `<entry_date ISO>_<item_id>` into its datetime and ID.'''
+        entry_date, _, item_id = cursor.rpartition('_')
+        return datetime.fromisoformat(entry_date), int(item_id)
 
     @staticmethod
     def get_product_by_id(product_id:int):
@@ -82,6 +484,20 @@ class DatabaseManager:
         '''
         return Product.query.get(product_id)
 
+    @staticmethod
+    def get_product_row(product_id:int):
+        '''
+        Get a product with its counters as a read-only row, without loading it into the session.
+
+        Parameters:
+            product_id (int): The unique identifier of the product.
+
+        Returns:
+            ProductRow: The product row if found, otherwise None.
+        '''
+        row = db.session.query(*ProductRow.columns).filter(Product.product_id == product_id).first()
+        return ProductRow(*row) if row else None
+
     @staticmethod
     def update_product(product_id:int, name:str=None, category:str=None, sell_price:float=None, buy_price:float=None):
         '''
@@ -96,6 +512,9 @@ class DatabaseManager:
 
         Returns:
             Product: The updated product object if successful, otherwise None.
+
+        Raises:
+            ValueError: If another product already has the updated name, category and prices.
         '''
         product = Product.query.get(product_id)
 
@@ -109,7 +528,16 @@ class DatabaseManager:
                 product.sell_price = sell_price
             if buy_price:
                 product.buy_price = buy_price
+            product.version = Product.version + 1
+            try:
+                db.session.flush()
+            except IntegrityError:
+                db.session.rollback()
+                raise ValueError('Another product has the same name, category and prices')
+            index_product(product.product_id, product.name, product.category)
             db.session.commit()
+            cache.invalidate('catalog')
+            cache.invalidate('dashboard')
         return product
 
     @staticmethod
@@ -127,13 +555,16 @@ class DatabaseManager:
 
         # if the product exists, delete the product and its items
         if product:
-            items = Item.query.filter_by(product_id=product_id).all()
-            
-            # delete each item associated with the product
-            for item in items:
-                db.session.delete(item)
+            # delete the items associated with the product in one statement,
+            # the per-status counters go away together with the product row
+            Item.query.filter_by(product_id=product_id).delete(synchronize_session=False)
+            ArchivedItem.query.filter_by(product_id=product_id).delete(synchronize_session=False)
+            StockMovement.query.filter_by(product_id=product_id).delete(synchronize_session=False)
             db.session.delete(product)
+            unindex_product(product_id)
             db.session.commit()
+            cache.invalidate('catalog')
+            cache.invalidate('dashboard')
             return True
         return False
 
@@ -142,18 +573,770 @@ class DatabaseManager:
         '''
         Reduce the quantity of available items for a product.
 
+        The items are claimed with a single `UPDATE ... WHERE item_id IN (SELECT ... LIMIT n)`
+        that re-checks `status = 'available'`, so concurrent reductions never claim the same row.
+
         Parameters:
             product_id: The identifier of the product.
             quantity: The number of items to reduce.
             status: The new status for the items.
+            exit_date: The date and time when the items were reduced.
             purchase_receipt: The purchase receipt associated with the items (optional).
 
+        Returns:
+            int: The number of items that were reduced.
+
+        Raises:
+            InsufficientStockError: If fewer than `quantity` items are available, nothing is reduced.
+            ValueError: If the status is not a reduced status or the quantity or date is malformed.
+        '''
+        exit_date = datetime.strptime(exit_date, '%Y-%m-%dT%H:%M')
+        try:
+            reduced = DatabaseManager._reduce_items(product_id, quantity, status, exit_date, purchase_receipt)
+        except (InsufficientStockError, ValueError):
+            db.session.rollback()
+            raise
+        db.session.commit()
+        cache.invalidate('dashboard')
+        stock_events.publish()
+        return reduced
+
+    @staticmethod
+    def reduce_items_batch(lines:list, exit_date:str, purchase_receipt:str=None):
+        '''
+        Reduce items of many products in one all-or-nothing transaction, as `reduce_item_quantity` does per line.
+
+        Parameters:
+            lines (list): Dicts with `product_id`, `quantity` and `status`.
+            exit_date (str): The date and time when the items were reduced.
+            purchase_receipt (str): The purchase receipt associated with the sold items (optional).
+
+        Returns:
+            list: One dict per line with `product_id`, `status`, `quantity` and `reduced`.
+
+        Raises:
+            BatchLineError: If a line is invalid or short of stock, nothing is reduced.
+        '''
+        exit_date = datetime.strptime(exit_date, '%Y-%m-%dT%H:%M')
+        results = []
+        try:
+            for index, line in enumerate(lines):
+                try:
+                    reduced = DatabaseManager._reduce_items(
+                        int(line['product_id']), line['quantity'], line['status'], exit_date, purchase_receipt)
+                except (KeyError, TypeError, ValueError, InsufficientStockError) as error:
+                    raise BatchLineError(index, error) from error
+                results.append({'product_id': int(line['product_id']), 'status': line['status'],
+                                'quantity': int(line['quantity']), 'reduced': reduced})
+        except BatchLineError:
+            db.session.rollback()
+            raise
+
+        db.session.commit()
+        cache.invalidate('dashboard')
+        stock_events.publish()
+        return results
+
+    @staticmethod
+    def _reduce_items(product_id:int, quantity:int, status:str, exit_date:datetime, purchase_receipt:str=None):
+        '''Claim available items of a product and update its counters and rollup without committing.'''
+        quantity = int(quantity)
+        if status not in ITEM_STATUSES or status == 'available':
+            raise ValueError(f'Cannot reduce items to status: {status}')
+        if quantity <= 0:
+            return 0
+
+        values = {'status': status, 'exit_date': exit_date}
+        conditions = []
+        if status == 'sold':
+            values['purchase_receipt'] = purchase_receipt
+            # expired items that the sweep has not reached yet are never sold
+            conditions.append(db.or_(Item.expiry_date.is_(None), Item.expiry_date >= exit_date.date()))
+
+        if current_app.config['STOCK_LOTS']:
+            # moving the counters first locks the product row, so its lots are split by one reducer at a time
+            DatabaseManager._adjust_stock_counts(product_id, {'available': -quantity, status: quantity})
+            reduced = DatabaseManager._claim_lots(product_id, quantity, values, conditions)
+            if reduced < quantity:
+                raise InsufficientStockError(product_id, quantity, reduced)
+        else:
+            # every row is a single unit here, lots are only claimed by the lot path above
+            conditions.append(Item.quantity == 1)
+            reduced = 0
+            if current_app.config['STOCK_ALLOCATION'] == 'fefo':
+                # perishable items first, the ones expiring soonest first
+                reduced = db.session.execute(DatabaseManager._claim_items_statement(
+                    product_id, quantity, values, conditions + [Item.expiry_date.isnot(None)], FEFO_ORDER)).rowcount
+            if reduced < quantity:
+                # then the oldest items first
+                reduced += db.session.execute(DatabaseManager._claim_items_statement(
+                    product_id, quantity - reduced, values, conditions, FIFO_ORDER)).rowcount
+            if reduced < quantity:
+                raise InsufficientStockError(product_id, quantity, reduced)
+
+            # move the reduced items from the `available` counter to the new status counter
+            DatabaseManager._adjust_stock_counts(product_id, {'available': -reduced, status: reduced})
+        DatabaseManager._record_movement(
+            Product.query.get(product_id), exit_date.date(), status, exits=reduced)
+        return reduced
+
+    @staticmethod
+    def _claim_items_statement(product_id:int, quantity:int, values:dict, conditions:list=(), order_by:tuple=()):
+        '''
+        Build the UPDATE that claims up to `quantity` available items of a product and sets `values` on them.
+        The items are picked in `order_by` order, which an index on `(product_id, status, ...)` serves
+        as an ordered scan that stops after `quantity` rows.
+        '''
+        # rows locked by another reducer are skipped where the database supports it
+        claimed = db.select(Item.item_id) \
+            .where(Item.product_id == product_id, Item.status == 'available', *conditions) \
+            .order_by(*order_by) \
+            .limit(quantity) \
+            .with_for_update(skip_locked=True) \
+            .scalar_subquery()
+        return db.update(Item) \
+            .where(Item.item_id.in_(claimed), Item.status == 'available') \
+            .values(values) \
+            .execution_options(synchronize_session=False)
+
+    @staticmethod
+    def _claim_lots(product_id:int, quantity:int, values:dict, conditions:list=()):
+        '''
+        Claim `quantity` units from the available lots of a product and set `values` on them, returning the
+        units claimed. Whole lots are claimed in allocation order and the last lot needed is split, its
+        claimed part becoming a new lot with the same entry date, receipt and expiry date.
+        '''
+        passes = [([Item.expiry_date.isnot(None)], FEFO_ORDER)] \
+            if current_app.config['STOCK_ALLOCATION'] == 'fefo' else []
+        passes.append(([], FIFO_ORDER))
+
+        claimed, split = 0, None
+        for extra, order_by in passes:
+            # a lot holds at least one unit, so no more lots than missing units are read
+            lots = db.session.execute(db.select(Item.item_id, Item.quantity)
+                .where(Item.product_id == product_id, Item.status == 'available', *conditions, *extra)
+                .order_by(*order_by)
+                .limit(quantity - claimed)
+                .with_for_update())
+            whole = []
+            for item_id, lot_quantity in lots:
+                if claimed + lot_quantity <= quantity:
+                    whole.append(item_id)
+                    claimed += lot_quantity
+                else:
+                    split = (item_id, quantity - claimed)
+                    claimed = quantity
+                if claimed == quantity:
+                    break
+            lots.close()
+
+            for start in range(0, len(whole), LOT_UPDATE_CHUNK_SIZE):
+                db.session.execute(db.update(Item)
+                    .where(Item.item_id.in_(whole[start:start + LOT_UPDATE_CHUNK_SIZE]))
+                    .values(values)
+                    .execution_options(synchronize_session=False))
+            if claimed == quantity:
+                break
+
+        if split:
+            item_id, part = split
+            db.session.execute(db.update(Item)
+                .where(Item.item_id == item_id)
+                .values(quantity=Item.quantity - part)
+                .execution_options(synchronize_session=False))
+            # copy the lot with the claimed part and the new values
+            columns = ['product_id', 'entry_date', 'sales_receipt', 'expiry_date', 'status', 'exit_date',
+                       'purchase_receipt', 'quantity']
+            values = dict(values, quantity=part)
+            claimed_part = db.select(*[
+                db.literal(values[column], Item.__table__.c[column].type) if column in values
+                else Item.__table__.c[column]
+                for column in columns
+            ]).where(Item.item_id == item_id)
+            db.session.execute(Item.__table__.insert().from_select(columns, claimed_part))
+        return claimed
+
+    @staticmethod
+    def expire_items(as_of:date=None, batch_size:int=None):
+        '''
+        Mark the available items whose expiry date has passed as expired, with set-based updates.
+
+        The products with expired stock are found with one query on the
+        `ix_item_product_status_expiry` index, then every product is swept in batches of
+        `batch_size` rows (items or whole lots), each batch committed with its counters and rollup.
+
+        Parameters:
+            as_of (date): Items expiring before this day are expired (optional, defaults to today).
+            batch_size (int): The items updated per transaction (optional, defaults to `EXPIRY_SWEEP_BATCH_SIZE`).
+
+        Returns:
+            dict: The number of expired items per product ID.
+        '''
+        as_of = as_of or datetime.utcnow().date()
+        batch_size = batch_size or current_app.config['EXPIRY_SWEEP_BATCH_SIZE']
+        exit_date = datetime.utcnow()
+        expired = Item.expiry_date < as_of
+
+        product_ids = [product_id for product_id, in DatabaseManager._expired_products_query(as_of)]
+        swept = {}
+        for product_id in product_ids:
+            while True:
+                rows = db.session.execute(DatabaseManager._claim_items_statement(
+                    product_id, batch_size, {'status': 'expire', 'exit_date': exit_date}, [expired])).rowcount
+                count = 0
+                if rows:
+                    # rows may be lots, count the units this sweep has expired so far by its exit date
+                    count = db.session.query(db.func.sum(Item.quantity)) \
+                        .filter(Item.product_id == product_id, Item.exit_date == exit_date,
+                                Item.status == 'expire').scalar() - swept.get(product_id, 0)
+                    DatabaseManager._adjust_stock_counts(product_id, {'available': -count, 'expire': count})
+                    DatabaseManager._record_movement(
+                        Product.query.get(product_id), exit_date.date(), 'expire', exits=count)
+                    swept[product_id] = swept.get(product_id, 0) + count
+                db.session.commit()
+                stock_events.publish()
+                if rows < batch_size:
+                    break
+
+        if swept:
+            cache.invalidate('dashboard')
+        return swept
+
+    @staticmethod
+    def _expired_products_query(as_of:date):
+        '''Build the query of the products that have available items expiring before a day.'''
+        return db.session.query(Item.product_id) \
+            .filter(Item.status == 'available', Item.expiry_date < as_of) \
+            .distinct()
+
+    @staticmethod
+    def archive_items(older_than_days:int=None, batch_size:int=None):
+        '''
+        Move the closed items that left stock more than `older_than_days` days ago to the archive table.
+
+        Every product is swept on the `ix_item_product_exit` index in batches of `batch_size` items,
+        each batch copied to `item_archive` and deleted from `item` in one transaction. Counters and
+        the movement rollup do not change, the item reads and the report add the archive when their
+        date range reaches it.
+
+        Parameters:
+            older_than_days (int): The age of the exit date to archive at (optional, defaults to `ARCHIVE_AFTER_DAYS`).
+            batch_size (int): The items moved per transaction (optional, defaults to `ARCHIVE_BATCH_SIZE`).
+
+        Returns:
+            int: The number of archived item rows.
+        '''
+        if older_than_days is None:
+            older_than_days = current_app.config['ARCHIVE_AFTER_DAYS']
+        batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        columns = [column.name for column in ArchivedItem.__table__.columns]
+
+        archived = 0
+        product_ids = [product_id for product_id, in db.session.query(Product.product_id).order_by(Product.product_id)]
+        for product_id in product_ids:
+            while True:
+                item_ids = [item_id for item_id, in DatabaseManager._archive_batch_query(product_id, cutoff, batch_size)]
+                if not item_ids:
+                    break
+                db.session.execute(ArchivedItem.__table__.insert().from_select(columns, db.select(
+                    *[Item.__table__.c[column] for column in columns]).where(Item.item_id.in_(item_ids))))
+                Item.query.filter(Item.item_id.in_(item_ids)).delete(synchronize_session=False)
+                db.session.commit()
+                archived += len(item_ids)
+                if len(item_ids) < batch_size:
+                    break
+        return archived
+
+    @staticmethod
+    def _archive_batch_query(product_id:int, cutoff:datetime, batch_size:int):
+        '''Build the query of the IDs of the next batch of closed items of a product that left stock before a cutoff.'''
+        return db.session.query(Item.item_id) \
+            .filter(Item.product_id == product_id, Item.exit_date < cutoff, Item.status != 'available') \
+            .order_by(Item.exit_date) \
+            .limit(batch_size)
+
+    @staticmethod
+    def collapse_items(product_id:int=None):
+        '''
+        Merge the item rows that only differ by ID into lots, one product per transaction.
+
+        Rows of the same product, status, entry and exit date, receipts and expiry date become a
+        single row holding their summed quantity, so counters and the movement rollup do not change.
+        The item IDs do, so every collapsed product gets a new version and is published to open pages.
+        Products whose rows are already distinct are left untouched.
+
+        Parameters:
+            product_id (int): Only collapse this product (optional, defaults to all products).
+
+        Returns:
+            tuple: `(rows_before, rows_after)` of the products that were collapsed.
+        '''
+        group = (Item.product_id, Item.status, Item.entry_date, Item.exit_date,
+                 Item.sales_receipt, Item.purchase_receipt, Item.expiry_date)
+        columns = [column.name for column in group] + ['quantity']
+        product_ids = [product_id] if product_id is not None \
+            else [product_id for product_id, in db.session.query(Product.product_id).order_by(Product.product_id)]
+
+        rows_before = rows_after = 0
+        for product_id in product_ids:
+            last_item_id, rows = db.session.query(db.func.max(Item.item_id), db.func.count(Item.item_id)) \
+                .filter(Item.product_id == product_id).one()
+            lots = db.session.query(*group).filter(Item.product_id == product_id).group_by(*group).count()
+            if lots == rows:
+                continue
+
+            # insert the lots after the existing rows, then delete the rows they replace
+            old_rows = (Item.product_id == product_id, Item.item_id <= last_item_id)
+            db.session.execute(Item.__table__.insert().from_select(columns, db.select(
+                *group, db.func.sum(Item.quantity)).where(*old_rows).group_by(*group)))
+            Item.query.filter(*old_rows).delete(synchronize_session=False)
+            Product.query.filter_by(product_id=product_id) \
+                .update({Product.version: Product.version + 1}, synchronize_session=False)
+            stock_events.track(product_id)
+            db.session.commit()
+            stock_events.publish()
+            rows_before += rows
+            rows_after += lots
+        return rows_before, rows_after
+
+    @staticmethod
+    def split_lots(product_id:int=None, chunk_size:int=None):
+        '''
+        Split the available lots into one item row per unit, one product per transaction.
+
+        Without `STOCK_LOTS` reductions only claim single units, so a lot left from lots mode
+        could never be reduced. The rows keep the receipt, entry and expiry date of their lot,
+        closed lots stay as they are. Every split product gets a new version and is published.
+
+        Parameters:
+            product_id (int): Only split the lots of this product (optional, defaults to all products).
+            chunk_size (int): The number of rows per INSERT (optional, defaults to `ITEM_INSERT_CHUNK_SIZE`).
+
+        Returns:
+            tuple: `(lots, rows)`, the number of lots split and of unit rows written for them.
+        '''
+        chunk_size = chunk_size or current_app.config['ITEM_INSERT_CHUNK_SIZE']
+        lot_filter = (Item.status == 'available', Item.quantity > 1)
+        query = db.session.query(Item.product_id).filter(*lot_filter).distinct().order_by(Item.product_id)
+        if product_id is not None:
+            query = query.filter(Item.product_id == product_id)
+
+        lots = rows = 0
+        insert = Item.__table__.insert()
+        for product_id, in query.all():
+            for lot in Item.query.filter(Item.product_id == product_id, *lot_filter).order_by(Item.item_id):
+                row = {'product_id': product_id, 'status': 'available', 'sales_receipt': lot.sales_receipt,
+                       'entry_date': lot.entry_date, 'expiry_date': lot.expiry_date, 'quantity': 1}
+                for start in range(0, lot.quantity, chunk_size):
+                    db.session.execute(insert, [row] * min(chunk_size, lot.quantity - start))
+                lots += 1
+                rows += lot.quantity
+                db.session.delete(lot)
+            Product.query.filter_by(product_id=product_id) \
+                .update({Product.version: Product.version + 1}, synchronize_session=False)
+            stock_events.track(product_id)
+            db.session.commit()
+            stock_events.publish()
+        return lots, rows
+
+    @staticmethod
+    def find_unclaimable_lots(product_id:int=None):
         '''
-        items = Item.query.filter_by(product_id=product_id, status='available').limit(quantity).all()
-    
-        for item in items:
-            item.status = status
-            item.exit_date = datetime.strptime(exit_date, '%Y-%m-%dT%H:%M')
-            if status == 'sold':
-                item.purchase_receipt = purchase_receipt
+        Count the available units held in lots that reductions cannot claim, which only happens
+        when `STOCK_LOTS` was disabled after lots were stored. Run `split_lots` to free them.
+
+        Parameters:
+            product_id (int): Only check this product (optional, defaults to all products).
+
+        Returns:
+            dict: `{product_id: units}`, empty when lots are enabled or every available row is a single unit.
+        '''
+        if current_app.config['STOCK_LOTS']:
+            return {}
+        query = db.session.query(Item.product_id, db.func.sum(Item.quantity)) \
+            .filter(Item.status == 'available', Item.quantity > 1).group_by(Item.product_id)
+        if product_id is not None:
+            query = query.filter(Item.product_id == product_id)
+        return dict(query.all())
+
+    @staticmethod
+    def reconcile_stock_counts(product_id:int=None):
+        '''
+        Rebuild the per-status product counters from the item table.
+
+        Parameters:
+            product_id (int): Only reconcile this product (optional, defaults to all products).
+
+        Returns:
+            int: The number of products whose counters were rewritten.
+        '''
+        query = Product.query
+        if product_id is not None:
+            query = query.filter_by(product_id=product_id)
+
+        # count every status per product in a single grouped query
+        actual = DatabaseManager._count_items_by_status(product_id)
+        products = query.all()
+        for product in products:
+            counts = actual.get(product.product_id, {})
+            # corrected counters are a change like any other, pages patch them by the newer version
+            if product.status_counts != {status: counts.get(status, 0) for status in ITEM_STATUSES}:
+                product.version = Product.version + 1
+                stock_events.track(product.product_id)
+            for status in ITEM_STATUSES:
+                setattr(product, f'{status}_count', counts.get(status, 0))
         db.session.commit()
+        cache.invalidate('dashboard')
+        stock_events.publish()
+        return len(products)
+
+    @staticmethod
+    def check_stock_counts(product_id:int=None):
+        '''
+        Compare the per-status product counters against the item table.
+
+        Parameters:
+            product_id (int): Only check this product (optional, defaults to all products).
+
+        Returns:
+            list: A list of `(product_id, status, stored, actual)` tuples, empty when consistent.
+        '''
+        query = Product.query
+        if product_id is not None:
+            query = query.filter_by(product_id=product_id)
+
+        actual = DatabaseManager._count_items_by_status(product_id)
+        mismatches = []
+        for product in query.all():
+            counts = actual.get(product.product_id, {})
+            for status, stored in product.status_counts.items():
+                if stored != counts.get(status, 0):
+                    mismatches.append((product.product_id, status, stored, counts.get(status, 0)))
+        return mismatches
+
+    @staticmethod
+    def iter_report_rows(start_date:datetime, end_date:datetime, chunk_size:int=1000):
+        '''
+        Stream the items that entered between two dates, joined with their product.
+
+        The rows are fetched `chunk_size` at a time and are ordered by the week they
+        entered in (computed by the database), so they can be grouped while streaming.
+        Archived items are merged in when the period reaches the archive.
+
+        Parameters:
+            start_date (datetime): The start of the period (inclusive).
+            end_date (datetime): The end of the period (inclusive).
+            chunk_size (int): The number of rows fetched from the database at a time.
+
+        Yields:
+            Row: `(week_start, name, category, sell_price, buy_price, item_id, status, entry_date, exit_date,
+            quantity)`,
+            where `week_start` is the `YYYY-MM-DD` date of the Monday of the entry week.
+        '''
+        return DatabaseManager._merge_items([
+            DatabaseManager._report_rows_query(start_date, end_date, model)
+                .execution_options(stream_results=True).yield_per(chunk_size)
+            for model in DatabaseManager._item_tiers(start_date=start_date)
+        ], key=lambda row: (row.week_start, row.item_id))
+
+    @staticmethod
+    def _report_rows_query(start_date:datetime, end_date:datetime, model=Item):
+        '''Build the query of items of a tier in a period joined with their product, ordered by entry week.'''
+        week_start = DatabaseManager._week_start(model.entry_date).label('week_start')
+        return db.session.query(
+            week_start, Product.name, Product.category, Product.sell_price, Product.buy_price,
+            model.item_id, model.status, model.entry_date, model.exit_date, model.quantity) \
+            .join(Product, Product.product_id == model.product_id) \
+            .filter(model.entry_date >= start_date, model.entry_date <= end_date) \
+            .order_by(week_start, model.item_id)
+
+    @staticmethod
+    def rebuild_stock_movements():
+        '''
+        Rebuild the daily stock movement rollup from the live and archived items, using the current product prices.
+
+        Returns:
+            int: The number of rollup rows written.
+        '''
+        StockMovement.query.delete(synchronize_session=False)
+        table = StockMovement.__table__
+        columns = ['product_id', 'day', 'status', 'entry_count', 'exit_count', 'buy_value', 'sell_value']
+        # the live and the archived items together
+        items = db.union_all(*[
+            db.select(model.product_id, model.entry_date, model.exit_date, model.status, model.quantity)
+            for model in (Item, ArchivedItem)
+        ]).subquery()
+        count = db.func.sum(items.c.quantity)
+
+        # every item entered stock as `available` on its entry day
+        entry_day = db.func.date(items.c.entry_date)
+        entries = db.select(
+            items.c.product_id, entry_day, db.literal('available'), count, db.literal(0),
+            count * Product.buy_price, count * Product.sell_price) \
+            .join(Product, Product.product_id == items.c.product_id) \
+            .group_by(items.c.product_id, entry_day, Product.buy_price, Product.sell_price)
+        db.session.execute(table.insert().from_select(columns, entries))
+
+        # items that left stock did so under their current status on their exit day
+        exit_day = db.func.date(items.c.exit_date)
+        exits = db.select(
+            items.c.product_id, exit_day, items.c.status, db.literal(0), count,
+            count * Product.buy_price, count * Product.sell_price) \
+            .join(Product, Product.product_id == items.c.product_id) \
+            .filter(items.c.exit_date.isnot(None), items.c.status != 'available') \
+            .group_by(items.c.product_id, exit_day, items.c.status, Product.buy_price, Product.sell_price)
+        db.session.execute(table.insert().from_select(columns, exits))
+
+        db.session.commit()
+        cache.invalidate('dashboard')
+        return StockMovement.query.count()
+
+    @staticmethod
+    def get_weekly_movements(start_date:date, end_date:date):
+        '''
+        Summarise the stock movement rollup per week and product, without touching the item table.
+
+        Parameters:
+            start_date (date): The first day of the period (inclusive).
+            end_date (date): The last day of the period (inclusive).
+
+        Returns:
+            list: Rows of `(week_start, name, category, entered, sold, expired, broken, entry_value, sold_value)`,
+            ordered by week and product name. `entry_value` is at buying price, `sold_value` at selling price.
+        '''
+        week_start = DatabaseManager._week_start(StockMovement.day).label('week_start')
+
+        def exits(status):
+            return db.func.sum(db.case((StockMovement.status == status, StockMovement.exit_count), else_=0))
+
+        return db.session.query(
+            week_start, Product.name, Product.category,
+            db.func.sum(StockMovement.entry_count).label('entered'),
+            exits('sold').label('sold'), exits('expire').label('expired'), exits('broken').label('broken'),
+            db.func.sum(db.case((StockMovement.status == 'available', StockMovement.buy_value), else_=0)).label('entry_value'),
+            db.func.sum(db.case((StockMovement.status == 'sold', StockMovement.sell_value), else_=0)).label('sold_value')) \
+            .join(Product, Product.product_id == StockMovement.product_id) \
+            .filter(StockMovement.day >= start_date, StockMovement.day <= end_date) \
+            .group_by(week_start, Product.product_id, Product.name, Product.category) \
+            .order_by(week_start, Product.name) \
+            .all()
+
+    @staticmethod
+    def get_dashboard(start_date:date, end_date:date):
+        '''
+        Summarise stock value, margin and sell-through per category in one grouped query.
+
+        Stock on hand comes from the product counters and movements in the window from the
+        stock movement rollup, so the item table is never scanned.
+
+        Parameters:
+            start_date (date): The first day of the movement window (inclusive).
+            end_date (date): The last day of the movement window (inclusive).
+
+        Returns:
+            list: Dicts per category, ordered by category, with `category`, `products`, `available`,
+            `stock_value` (at buying price), `stock_margin` (selling minus buying price of the stock on hand),
+            `entered`, `sold`, `expired`, `broken`, `revenue`, `sold_margin` and `sell_through`
+            (sold / (sold + available), None without either).
+        '''
+        key = f'dashboard:{start_date.isoformat()}:{end_date.isoformat()}'
+        return cache.get_or_set(key, lambda: DatabaseManager._dashboard_rows(start_date, end_date))
+
+    @staticmethod
+    def _dashboard_rows(start_date:date, end_date:date):
+        '''Run the dashboard aggregate query and shape its rows, see `get_dashboard`.'''
+        dashboard = []
+        for (category, products, available, stock_value, stock_margin,
+             entered, sold, expired, broken, revenue, sold_margin) in DatabaseManager._dashboard_query(start_date, end_date):
+            dashboard.append({
+                'category': category, 'products': products, 'available': int(available),
+                'stock_value': float(stock_value), 'stock_margin': float(stock_margin),
+                'entered': int(entered), 'sold': int(sold), 'expired': int(expired), 'broken': int(broken),
+                'revenue': float(revenue), 'sold_margin': float(sold_margin),
+                'sell_through': sold / (sold + available) if sold + available else None,
+            })
+        return dashboard
+
+    @staticmethod
+    def _dashboard_query(start_date:date, end_date:date):
+        '''Build the grouped per-category query of the dashboard, served by the `ix_stock_movement_day` index.'''
+        def exits(status, column=StockMovement.exit_count):
+            return db.func.sum(db.case((StockMovement.status == status, column), else_=0))
+
+        # movements in the window per product, from the rollup
+        movements = db.session.query(
+            StockMovement.product_id,
+            db.func.sum(StockMovement.entry_count).label('entered'),
+            exits('sold').label('sold'), exits('expire').label('expired'), exits('broken').label('broken'),
+            exits('sold', StockMovement.sell_value).label('revenue'),
+            exits('sold', StockMovement.buy_value).label('cost')) \
+            .filter(StockMovement.day >= start_date, StockMovement.day <= end_date) \
+            .group_by(StockMovement.product_id) \
+            .subquery()
+
+        def total(column):
+            return db.func.coalesce(db.func.sum(column), 0)
+
+        return db.session.query(
+            Product.category,
+            db.func.count(Product.product_id),
+            total(Product.available_count),
+            total(Product.available_count * Product.buy_price),
+            total(Product.available_count * (Product.sell_price - Product.buy_price)),
+            total(movements.c.entered), total(movements.c.sold),
+            total(movements.c.expired), total(movements.c.broken),
+            total(movements.c.revenue), total(movements.c.revenue - movements.c.cost)) \
+            .outerjoin(movements, movements.c.product_id == Product.product_id) \
+            .group_by(Product.category) \
+            .order_by(Product.category)
+
+    @staticmethod
+    def save_user(username:str, password:str, role:str):
+        '''
+        Create a user, or change the password and role of an existing one.
+
+        Parameters:
+            username (str): The login name of the user.
+            password (str): The plaintext password, stored hashed with `PASSWORD_HASH_METHOD`.
+            role (str): The role of the user.
+
+        Returns:
+            User: The saved user.
+        '''
+        user = User.query.filter_by(username=username).first() or User(username=username)
+        user.role = role
+        user.set_password(password, current_app.config['PASSWORD_HASH_METHOD'])
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    @staticmethod
+    def get_user_role(user_id:int):
+        '''
+        Retrieve the current role of a user by primary key, read on every request so a changed
+        or deleted user loses their old permissions at once.
+
+        Parameters:
+            user_id (int): The unique identifier of the user.
+
+        Returns:
+            str: The role of the user, or None if the user no longer exists.
+        '''
+        return db.session.query(User.role).filter(User.user_id == user_id).scalar()
+
+    @staticmethod
+    def authenticate_user(username:str, password:str):
+        '''
+        Verify a username and password. This is the only place a password hash is computed,
+        later requests only look up the current role of the user in the session.
+
+        A hash made with another method or cost than `PASSWORD_HASH_METHOD` is replaced after
+        a successful login, so changing the setting upgrades users as they log in.
+
+        Parameters:
+            username (str): The login name of the user.
+            password (str): The plaintext password.
+
+        Returns:
+            User: The user if the password is correct, otherwise None.
+        '''
+        user = User.query.filter_by(username=username).first()
+        if not user or not user.check_password(password):
+            return None
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        if user.needs_rehash(method):
+            user.set_password(password, method)
+            db.session.commit()
+        return user
+
+    @staticmethod
+    def _week_start(column):
+        '''Build a SQL expression for the `YYYY-MM-DD` Monday of the week a datetime column falls in.'''
+        if db.engine.dialect.name == 'postgresql':
+            return db.func.to_char(db.func.date_trunc('week', column), 'YYYY-MM-DD')
+        # SQLite: move forward to Sunday, then back to that week's Monday
+        return db.func.date(column, 'weekday 0', '-6 days')
+
+    @staticmethod
+    def _count_items_by_status(product_id:int=None):
+        '''Count item units of both tiers grouped by product and status, returned as `{product_id: {status: count}}`.'''
+        counts = {}
+        for model in (Item, ArchivedItem):
+            query = db.session.query(model.product_id, model.status, db.func.sum(model.quantity)) \
+                .group_by(model.product_id, model.status)
+            if product_id is not None:
+                query = query.filter(model.product_id == product_id)
+            for item_product_id, status, count in query:
+                product_counts = counts.setdefault(item_product_id, {})
+                product_counts[status] = product_counts.get(status, 0) + count
+        return counts
+
+    @staticmethod
+    def _insert_items(product_id:int, quantity:int, sales_receipt:str, entry_date:datetime, chunk_size:int, expiry_date:date=None):
+        '''
+        Insert `quantity` available items with Core executemany in chunks, returning the first and last item ID.
+        With `STOCK_LOTS` enabled a single lot row holds the whole quantity and both IDs are its ID.
+        '''
+        if quantity <= 0:
+            return None, None
+        insert = Item.__table__.insert()
+        row = {'product_id': product_id, 'status': 'available',
+               'sales_receipt': sales_receipt, 'entry_date': entry_date, 'expiry_date': expiry_date}
+        if current_app.config['STOCK_LOTS']:
+            lot_id = db.session.execute(insert, dict(row, quantity=quantity)).inserted_primary_key[0]
+            return lot_id, lot_id
+
+        # the first row is inserted alone to learn where the ID range starts
+        first_item_id = db.session.execute(insert, row).inserted_primary_key[0]
+        remaining = quantity - 1
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            db.session.execute(insert, [row] * size)
+            remaining -= size
+
+        last_item_id = db.session.query(db.func.max(Item.item_id)) \
+            .filter(Item.product_id == product_id, Item.item_id >= first_item_id).scalar()
+        return first_item_id, last_item_id
+
+    @staticmethod
+    def _parse_expiry_date(expiry_date:str):
+        '''Parse an optional `YYYY-MM-DD` expiry date, empty values mean the items do not perish.'''
+        return datetime.strptime(expiry_date, '%Y-%m-%d').date() if expiry_date else None
+
+    @staticmethod
+    def _record_movement(product:Product, day:date, status:str, entries:int=0, exits:int=0):
+        '''Add entries/exits of a product on a day to the stock movement rollup inside the current transaction.'''
+        moved = entries + exits
+        if not moved:
+            return
+        dialect = db.engine.dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(StockMovement.__table__).values(
+            product_id=product.product_id, day=day, status=status,
+            entry_count=entries, exit_count=exits,
+            buy_value=moved * product.buy_price, sell_value=moved * product.sell_price)
+
+        # add to the existing row of the same (product, day, status) if there is one
+        excluded = statement.excluded
+        table = StockMovement.__table__
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.day, table.c.status],
+            set_={
+                'entry_count': table.c.entry_count + excluded.entry_count,
+                'exit_count': table.c.exit_count + excluded.exit_count,
+                'buy_value': table.c.buy_value + excluded.buy_value,
+                'sell_value': table.c.sell_value + excluded.sell_value,
+            }))
+
+    @staticmethod
+    def _adjust_stock_counts(product_id:int, deltas:dict):
+        '''Apply `{status: delta}` changes to the product counters, bump its version and track it for the change feed inside the current transaction.'''
+        values = {
+            Product.count_column(status): Product.count_column(status) + delta
+            for status, delta in deltas.items() if delta
+        }
+        if values:
+            values[Product.version] = Product.version + 1
+            Product.query.filter_by(product_id=product_id).update(values, synchronize_session='evaluate')
+            stock_events.track(product_id)
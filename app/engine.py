@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def engine_options(config):
+    '''
+    Build the SQLAlchemy engine options for the configured database backend.
+
+    SQLite file databases get a connection pool shared across threads (instead of a new
+    connection per checkout) and a busy timeout, other backends get a tuned pool.
+
+    Parameters:
+        config (dict): The application config.
+
+    Returns:
+        dict: The keyword arguments for `create_engine`.
+    '''
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            # in-memory databases keep the single shared connection Flask-SQLAlchemy sets up
+            return {}
+        options['poolclass'] = QueuePool
+        options['connect_args'] = {
+            'timeout': config['DB_BUSY_TIMEOUT'] / 1000,
+            'check_same_thread': False,
+        }
+        return options
+
+    options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    options['pool_pre_ping'] = True
+    if url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {
+            'connect_timeout': max(1, config['DB_BUSY_TIMEOUT'] // 1000),
+            # give up on lock waits instead of piling up blocked workers
+            'options': f"-c lock_timeout={config['DB_BUSY_TIMEOUT']}",
+        }
+    return options
+
+
+def register_sqlite_pragmas(engine, config):
+    '''
+    Apply the configured SQLite pragmas to every new connection of an engine.
+
+    Parameters:
+        engine (Engine): The engine to configure, ignored when it is not SQLite.
+        config (dict): The application config holding the `SQLITE_*` settings.
+    '''
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = {
+        'journal_mode': config['SQLITE_JOURNAL_MODE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'busy_timeout': config['DB_BUSY_TIMEOUT'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+    }
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if value is not None:
+                cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
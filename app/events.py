@@ -0,0 +1,266 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from flask import current_app
+from app import db
+from app.models import Product, ITEM_STATUSES
+
+# The products whose counters are read per published event
+PUBLISH_CHUNK_SIZE = 500
+
+# The milliseconds a browser waits before reconnecting a closed stream
+RECONNECT_MS = 1000
+
+
+class Subscription:
+    """
+    The queue of stock events waiting to be streamed to one client.
+
+    A client that falls behind by more than the queue size is marked as lost instead of
+    slowing down the publisher, its stream then tells the page to reload.
+
+    Methods:
+        put: Queue an event without blocking.
+        get: Wait for the next event.
+    """
+    def __init__(self, queue_size:int):
+        self.lost = False
+        self._queue = queue.Queue(queue_size)
+
+    def put(self, event:tuple):
+        '''Queue an `(event_id, data)` event without blocking, marking the subscription lost when it is full.'''
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.lost = True
+
+    def get(self, timeout:float):
+        '''Wait up to `timeout` seconds for the next `(event_id, data)` event, or None.'''
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalEventBroker:
+    """
+    In-process fan-out of events to the subscriptions of this worker, keeping the latest events
+    so a reconnecting client gets the ones it missed.
+
+    Methods:
+        publish: Number an event and send it to every subscription.
+        subscribe: Register a subscription, replaying the events after the client's last one.
+        unsubscribe: Remove a subscription.
+        subscriber_count: Returns the number of open subscriptions.
+    """
+    def __init__(self, max_subscribers:int=32, queue_size:int=100, history_size:int=1000):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._history = deque(maxlen=history_size)
+        self._last_event_id = 0
+        self._lock = threading.Lock()
+
+    def publish(self, data:str):
+        '''Number an event and send it to every subscription of this worker.'''
+        self._deliver(data)
+
+    def _deliver(self, data:str, event_id:int=None):
+        '''Record an event in the history and queue it for every subscription, numbering it if it has no ID.'''
+        # queueing never blocks, so the lock keeps every subscription in publish order
+        with self._lock:
+            if event_id is None:
+                event_id = self._last_event_id + 1
+            self._last_event_id = max(self._last_event_id, event_id)
+            self._history.append((event_id, data))
+            for subscription in self._subscriptions:
+                subscription.put((event_id, data))
+
+    def subscribe(self, last_event_id:int=None):
+        '''
+        Register a subscription, queueing the events published after `last_event_id` first.
+
+        Parameters:
+            last_event_id (int): The ID of the last event the client received (optional).
+
+        Returns:
+            Subscription: The new subscription, marked lost if events after `last_event_id` are
+            no longer known, or None if the worker already streams to `max_subscribers` clients.
+        '''
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_event_id + 1
+                # a gap before the history or IDs from before a restart cannot be replayed
+                if last_event_id + 1 < oldest or last_event_id > self._last_event_id:
+                    subscription.lost = True
+                for event in self._history:
+                    if event[0] > last_event_id:
+                        subscription.put(event)
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription:Subscription):
+        '''Remove a subscription, its queued events are dropped.'''
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscriber_count(self):
+        '''Returns the number of open subscriptions of this worker.'''
+        return len(self._subscriptions)
+
+
+class RedisEventBroker(LocalEventBroker):
+    """
+    Fan-out through a Redis channel, so a write in one worker reaches the subscribers of every worker.
+    Event IDs come from a Redis counter and are the same in all workers. Requires the optional `redis` package.
+
+    Methods:
+        publish: Number an event and publish it on the channel.
+        subscribe: Register a subscription, listening to the channel from the first one on.
+    """
+    def __init__(self, url:str, logger, max_subscribers:int=32, queue_size:int=100, history_size:int=1000,
+                 channel:str='inventory:stock'):
+        try:
+            import redis
+        except ImportError as error:
+            raise RuntimeError('EVENTS_BACKEND points to Redis but the `redis` package is not installed') from error
+        super().__init__(max_subscribers, queue_size, history_size)
+        self.channel = channel
+        self.logger = logger
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def publish(self, data:str):
+        '''Number an event with the shared counter and publish it to every worker.'''
+        event_id = self._client.incr(f'{self.channel}:last_event_id')
+        self._client.publish(self.channel, f'{event_id} {data}')
+
+    def subscribe(self, last_event_id:int=None):
+        '''Register a subscription, see `LocalEventBroker.subscribe`.'''
+        # the listener is started lazily, after gunicorn has forked the worker
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='stock-events', daemon=True)
+                self._listener.start()
+        return super().subscribe(last_event_id)
+
+    def _listen(self):
+        '''Relay the events of the channel to the subscriptions of this worker, reconnecting after errors.'''
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        event_id, data = message['data'].decode().split(' ', 1)
+                        self._deliver(data, int(event_id))
+            except Exception:
+                self.logger.exception('Stock event listener lost its Redis connection')
+                time.sleep(1)
+
+
+class StockEvents:
+    """
+    Change feed of the stock counters of products, streamed to open pages as server-sent events.
+
+    The write methods of `DatabaseManager` track every product whose counters they change and
+    publish after committing. An event carries the current counters and version of the changed
+    products rather than the raw deltas, so applying it twice or after a newer one is harmless.
+    The broker is chosen per application with `EVENTS_BACKEND`: `local` for the subscribers of
+    this process, a `redis://` URL to reach the subscribers of every worker, or `off` for none.
+
+    Methods:
+        init_app: Set up the event broker of an application.
+        track: Remember a product whose counters changed in the current transaction.
+        publish: Publish the counters of the products changed since the last publish.
+        stream: Stream the events of a subscription in the server-sent events format.
+    """
+    def init_app(self, app):
+        '''Set up the event broker of an application from its config.'''
+        options = {
+            'max_subscribers': app.config['EVENTS_MAX_SUBSCRIBERS'],
+            'queue_size': app.config['EVENTS_QUEUE_SIZE'],
+            'history_size': app.config['EVENTS_HISTORY_SIZE'],
+        }
+        backend = app.config['EVENTS_BACKEND']
+        if backend == 'off':
+            broker = None
+        elif backend == 'local':
+            broker = LocalEventBroker(**options)
+        else:
+            broker = RedisEventBroker(backend, app.logger, **options)
+        app.extensions['stock_events'] = broker
+
+    @property
+    def broker(self):
+        '''Returns the event broker of the current application, None when the stream is off.'''
+        return current_app.extensions['stock_events']
+
+    def track(self, product_id:int):
+        '''Remember that the counters of a product changed in the current transaction.'''
+        db.session.info.setdefault('stock_changes', set()).add(product_id)
+
+    def publish(self):
+        '''
+        Publish the current counters of the products tracked since the last publish, call after committing.
+
+        Products of a rolled back transaction are published with their unchanged counters,
+        which subscribers apply as a no-op.
+        '''
+        product_ids = sorted(db.session.info.pop('stock_changes', ()))
+        if self.broker is None:
+            return
+        columns = [Product.product_id, Product.version] + [Product.count_column(status) for status in ITEM_STATUSES]
+        for start in range(0, len(product_ids), PUBLISH_CHUNK_SIZE):
+            rows = db.session.query(*columns) \
+                .filter(Product.product_id.in_(product_ids[start:start + PUBLISH_CHUNK_SIZE]))
+            products = [
+                {'product_id': product_id, 'version': version, 'counts': dict(zip(ITEM_STATUSES, counts))}
+                for product_id, version, *counts in rows
+            ]
+            if products:
+                self.broker.publish(json.dumps({'products': products}, separators=(',', ':')))
+
+    def stream(self, subscription:Subscription, keepalive:float, duration:float):
+        '''
+        Stream the events of a subscription in the server-sent events format until `duration` seconds
+        have passed, the browser then reconnects with the ID of its last event.
+
+        Parameters:
+            subscription (Subscription): The subscription to stream, removed when the stream ends.
+            keepalive (float): The seconds between comments that keep idle connections open.
+            duration (float): The seconds after which the stream ends and frees its server thread.
+
+        Returns:
+            generator: The `stock` events, keepalive comments, or a `reset` event once events were lost.
+            It runs after the request has ended, so it only holds the broker of the application.
+        '''
+        return event_stream(self.broker, subscription, keepalive, duration)
+
+
+def event_stream(broker:LocalEventBroker, subscription:Subscription, keepalive:float, duration:float):
+    '''Yield the events of a subscription as server-sent events, see `StockEvents.stream`.'''
+    try:
+        yield f'retry: {RECONNECT_MS}\n\n'
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            event = subscription.get(min(keepalive, max(deadline - time.monotonic(), 0)))
+            if subscription.lost:
+                # events were dropped, the page cannot be patched any more
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            event_id, data = event
+            yield f'id: {event_id}\nevent: stock\ndata: {data}\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+stock_events = StockEvents()
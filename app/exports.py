@@ -0,0 +1,48 @@
+import csv
+import io
+import zlib
+
+
+def csv_stream(header:list, rows, rows_per_chunk:int=1000, compress:bool=False):
+    '''
+    Encode rows as CSV lazily, yielding one chunk of bytes per `rows_per_chunk` rows.
+
+    Only one chunk is held in memory at a time, so the rows can come from a streaming
+    query of any size.
+
+    Parameters:
+        header (list): The column names written as the first line.
+        rows (iterable): The rows to write, each a sequence of values.
+        rows_per_chunk (int): The number of rows encoded per yielded chunk.
+        compress (bool): Gzip the output as it is produced.
+
+    Yields:
+        bytes: The next part of the CSV (or gzip) output.
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # wbits 31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= rows_per_chunk:
+            chunk = flush()
+            if chunk:
+                yield chunk
+            pending = 0
+
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
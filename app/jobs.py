@@ -0,0 +1,103 @@
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class Job:
+    """
+    Object representing a background job.
+
+    Attributes:
+        job_id (str): The unique identifier of the job.
+        name (str): A short description of what the job does.
+        status (str): One of `pending`, `running`, `done` or `failed`.
+        result: The return value of the job function once it is done.
+        error (str): The error message if the job failed.
+        created_at (datetime): The date and time when the job was submitted.
+        finished_at (datetime): The date and time when the job finished, if applicable.
+    """
+    def __init__(self, name:str, job_id:str=None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.name = name
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+
+    def to_dict(self):
+        '''Returns the job as a JSON serialisable dict.'''
+        return {
+            'job_id': self.job_id,
+            'name': self.name,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRunner:
+    """
+    Runs functions in a thread pool inside an application context and keeps track of them.
+
+    Only the most recent `max_jobs` jobs are remembered. Job state lives in the
+    process that submitted the job, so with several workers a job is only known
+    to the worker that started it.
+
+    Methods:
+        submit: Run a function in the background and return its Job.
+        get: Get a job by its ID.
+    """
+    def __init__(self, app, max_workers:int=2, max_jobs:int=100):
+        self.app = app
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name:str, function, args:tuple=(), kwargs:dict=None, job_id:str=None):
+        '''
+        Run a function in the background.
+
+        Parameters:
+            name (str): A short description of the job.
+            function (callable): The function to run, called with `*args` and `**kwargs`.
+            args (tuple): Positional arguments for the function.
+            kwargs (dict): Keyword arguments for the function (optional).
+            job_id (str): The ID to give the job (optional, defaults to a random ID).
+
+        Returns:
+            Job: The submitted job.
+        '''
+        job = Job(name, job_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            # forget the oldest jobs once the limit is reached
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, function, args, kwargs or {})
+        return job
+
+    def get(self, job_id:str):
+        '''Get a job by its ID, or None if it is unknown to this process.'''
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, function, args, kwargs):
+        '''Execute a job inside an application context and record its outcome.'''
+        from app import db
+        job.status = 'running'
+        with self.app.app_context():
+            try:
+                job.result = function(*args, **kwargs)
+                job.status = 'done'
+            except Exception as error:
+                self.app.logger.exception('Job %s (%s) failed', job.job_id, job.name)
+                job.error = str(error)
+                job.status = 'failed'
+            finally:
+                job.finished_at = datetime.utcnow()
+                db.session.remove()
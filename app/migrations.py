@@ -0,0 +1,165 @@
+from app import db
+from sqlalchemy import inspect, MetaData
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+# Accounts created with the user table, the password equals the username until changed with `flask create-user`
+DEFAULT_USERS = [
+    ('cashier', 'Cashier'),
+    ('admingudang', 'Admin Gudang'),
+    ('superadmin', 'Super Admin'),
+]
+
+
+def upgrade_schema():
+    '''
+    Bring an existing database up to date with the models.
+
+    Creates missing tables, adds columns and indexes that were introduced after the
+    table was created and backfills derived data for them. Every step is idempotent, so it is
+    safe to run on each start.
+
+    Returns:
+        list: A description of every change that was applied.
+    '''
+    applied = []
+    existing_tables = set(inspect(db.engine).get_table_names())
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            applied.append(f'create table {table.name}')
+
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            # render the column definition exactly as CREATE TABLE would
+            definition = CreateColumn(column).compile(dialect=db.engine.dialect)
+            db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {definition}'))
+            applied.append(f'add column {table.name}.{column.name}')
+    db.session.commit()
+
+    # SQLite cannot add AUTOINCREMENT to a table, rebuild the ones created without it (their indexes follow below)
+    if db.engine.dialect.name == 'sqlite':
+        for table in db.metadata.sorted_tables:
+            if table.dialect_options['sqlite']['autoincrement'] and not sqlite_autoincrement(table.name):
+                rebuild_sqlite_table(table)
+                applied.append(f'rebuild table {table.name} with AUTOINCREMENT')
+
+    # indexes are only created together with new tables, add the ones that are missing
+    inspector = inspect(db.engine)
+    # the unique product identity cannot be created over products that were entered twice
+    if 'ux_product_identity' not in {index['name'] for index in inspector.get_indexes('product')}:
+        duplicates = merge_duplicate_products()
+        if duplicates:
+            applied.append(f'merge {duplicates} duplicate product(s)')
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                applied.append(f'create index {index.name}')
+
+    # the stock counters start at zero when added, rebuild them from the item table
+    if any(change.startswith('add column product.') and change.endswith('_count') for change in applied):
+        from app.database import DatabaseManager
+        DatabaseManager.reconcile_stock_counts()
+        applied.append('reconcile stock counters')
+
+    # the movement rollup starts empty when created, backfill it from the item history
+    merged = any(change.startswith('merge ') for change in applied)
+    if merged or ('create table stock_movement' in applied and 'item' in existing_tables):
+        from app.database import DatabaseManager
+        DatabaseManager.rebuild_stock_movements()
+        applied.append('backfill stock movements')
+
+    # the product search index lives outside the models, create and fill it when missing
+    from app.search import create_search_index
+    if create_search_index():
+        from app.database import DatabaseManager
+        DatabaseManager.rebuild_product_search()
+        applied.append('create product search index')
+    elif merged:
+        from app.database import DatabaseManager
+        DatabaseManager.rebuild_product_search()
+        applied.append('rebuild product search index')
+
+    # seed the accounts that used to be hard-coded so existing logins keep working
+    if 'create table app_user' in applied:
+        from app.database import DatabaseManager
+        for username, role in DEFAULT_USERS:
+            DatabaseManager.save_user(username, username, role)
+        applied.append('seed default users')
+
+    return applied
+
+
+def merge_duplicate_products():
+    '''
+    Merge the products sharing a name, category and prices into the one with the lowest ID.
+
+    Receiving stock used to be able to create the same product twice. The live and archived
+    items of every duplicate move to the kept product, whose counters add up theirs, and the
+    duplicate is deleted with its movement rollup, which the caller rebuilds.
+
+    Returns:
+        int: The number of duplicate products that were merged away.
+    '''
+    from app.cache import cache
+    from app.models import Product, Item, ArchivedItem, StockMovement, ITEM_STATUSES
+    identity = (Product.name, Product.category, Product.sell_price, Product.buy_price)
+    groups = db.session.query(db.func.min(Product.product_id), *identity) \
+        .group_by(*identity).having(db.func.count(Product.product_id) > 1).all()
+
+    merged = 0
+    for keeper_id, *values in groups:
+        keeper = db.session.get(Product, keeper_id)
+        duplicates = Product.query.filter(
+            *(column == value for column, value in zip(identity, values)), Product.product_id != keeper_id).all()
+        duplicate_ids = [duplicate.product_id for duplicate in duplicates]
+        for model in (Item, ArchivedItem):
+            model.query.filter(model.product_id.in_(duplicate_ids)) \
+                .update({model.product_id: keeper_id}, synchronize_session=False)
+        for status in ITEM_STATUSES:
+            column = f'{status}_count'
+            setattr(keeper, column, getattr(keeper, column) + sum(getattr(duplicate, column) for duplicate in duplicates))
+        keeper.version = Product.version + 1
+        StockMovement.query.filter(StockMovement.product_id.in_(duplicate_ids)).delete(synchronize_session=False)
+        # bulk delete, the ORM would try to detach the items that already moved
+        Product.query.filter(Product.product_id.in_(duplicate_ids)).delete(synchronize_session=False)
+        merged += len(duplicate_ids)
+    db.session.commit()
+    if merged:
+        cache.invalidate('catalog')
+    return merged
+
+
+def sqlite_autoincrement(table_name:str):
+    '''Returns whether a SQLite table was created with an AUTOINCREMENT primary key.'''
+    sql = db.session.execute(db.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                             {'name': table_name}).scalar()
+    return 'AUTOINCREMENT' in (sql or '').upper()
+
+
+def rebuild_sqlite_table(table):
+    '''
+    Recreate a SQLite table from its model definition, keeping its rows and IDs.
+
+    SQLite cannot change the constraints of an existing table, so the rows are copied into a new
+    table that then replaces the old one. The indexes are dropped with the old table.
+
+    Parameters:
+        table (Table): The model table to rebuild.
+    '''
+    metadata = MetaData()
+    # the referenced tables come along so the foreign keys of the copy resolve
+    for foreign_key in table.foreign_keys:
+        foreign_key.column.table.to_metadata(metadata)
+    rebuilt = table.to_metadata(metadata, name=f'{table.name}_rebuild')
+    columns = ', '.join(column.name for column in table.columns)
+    db.session.execute(db.text(str(CreateTable(rebuilt).compile(dialect=db.engine.dialect))))
+    db.session.execute(db.text(f'INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}'))
+    db.session.execute(db.text(f'DROP TABLE {table.name}'))
+    db.session.execute(db.text(f'ALTER TABLE {rebuilt.name} RENAME TO {table.name}'))
+    db.session.commit()
@@ -1,5 +1,9 @@
 from app import db
 from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# The statuses an item can have, each with a maintained counter on `Product`
+ITEM_STATUSES = ('available', 'sold', 'expire', 'broken')
 
 class Product(db.Model):
     """
@@ -11,10 +15,18 @@ class Product(db.Model):
         category (str): The category of the product.
         sell_price (float): The selling price of the product.
         buy_price (float): The buying price of the product.
+        available_count (int): The number of `available` items of the product.
+        sold_count (int): The number of `sold` items of the product.
+        expire_count (int): The number of `expire` items of the product.
+        broken_count (int): The number of `broken` items of the product.
+        version (int): Incremented on every change of the product or its items, used for ETags.
 
     Methods:
         __repr__: Returns a string representation of the product.
-        item_count: Calculates and returns the count of `available` items for this product.
+        item_count: Returns the count of `available` items for this product.
+        status_counts: Returns the item count of every status for this product.
+        count_column: Returns the counter column of a status.
+        to_dict: Returns the product and its counters as a JSON serialisable dict.
     """
     # Define the columns of the 'product' table
     product_id = db.Column(db.Integer, primary_key=True)
@@ -22,19 +34,52 @@ class Product(db.Model):
     category = db.Column(db.Text)
     sell_price = db.Column(db.Float, nullable=False)
     buy_price = db.Column(db.Float, nullable=False)
-    
+
+    # Index the category filter of the products page and the product identity receiving stock looks up
+    __table_args__ = (
+        db.Index('ix_product_category', 'category'),
+        db.Index('ux_product_identity', 'name', 'category', 'sell_price', 'buy_price', unique=True),
+    )
+
+    # Per-status item counters, kept up to date by `DatabaseManager`
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    sold_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    expire_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    broken_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     def __repr__(self):
         '''Returns a string representation of the product.'''
         return f'<Product {self.name}>'
 
     @property
     def item_count(self):
-        '''Calculates and returns the count of `available` items for this product.'''
-        total_items = 0
-        for item in self.items:
-            if item.status == 'available':
-                total_items += 1    
-        return total_items
+        '''Returns the count of `available` items for this product.'''
+        return self.available_count or 0
+
+    @property
+    def status_counts(self):
+        '''Returns a dict mapping every item status to its count for this product.'''
+        return {status: getattr(self, f'{status}_count') or 0 for status in ITEM_STATUSES}
+
+    @staticmethod
+    def count_column(status:str):
+        '''Returns the counter column that tracks items with the given status.'''
+        if status not in ITEM_STATUSES:
+            raise ValueError(f'Unknown item status: {status}')
+        return getattr(Product, f'{status}_count')
+
+    def to_dict(self):
+        '''Returns the product and its counters as a JSON serialisable dict.'''
+        return {
+            'product_id': self.product_id,
+            'name': self.name,
+            'category': self.category,
+            'sell_price': self.sell_price,
+            'buy_price': self.buy_price,
+            'counts': self.status_counts,
+            'version': self.version,
+        }
 
 class Item(db.Model):
     """
@@ -48,11 +93,24 @@ class Item(db.Model):
         status (str): The status of the item.
         sales_receipt (str): The sales receipt associated with the item.
         purchase_receipt (str): The purchase receipt associated with the item.
+        expiry_date (date): The last day the item may be sold, if it perishes.
+        quantity (int): The number of units the row stands for, above 1 when it is a lot (see `STOCK_LOTS`).
         product (relationship): Relationship to the associated Product model.
 
     Methods:
         __repr__: Returns a string representation of the item.
+        to_dict: Returns the item as a JSON serialisable dict.
     """
+    # Indexes covering the item filters, the FIFO and FEFO stock allocation, the expiry sweep and the report window,
+    # SQLite must never hand out the ID of an archived item again
+    __table_args__ = (
+        db.Index('ix_item_product_status_entry', 'product_id', 'status', 'entry_date'),
+        db.Index('ix_item_product_status_expiry', 'product_id', 'status', 'expiry_date', 'entry_date'),
+        db.Index('ix_item_product_exit', 'product_id', 'exit_date'),
+        db.Index('ix_item_entry_date', 'entry_date'),
+        {'sqlite_autoincrement': True},
+    )
+
     # Define the columns of the 'item' table
     item_id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), nullable=False)
@@ -61,6 +119,8 @@ class Item(db.Model):
     status = db.Column(db.String(100), nullable=False)
     sales_receipt = db.Column(db.String(100), nullable=True)
     purchase_receipt = db.Column(db.String(100), nullable=True)
+    expiry_date = db.Column(db.Date, nullable=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     # Define the relationship between the 'item' and 'product' tables
     product = db.relationship('Product', backref=db.backref('items', lazy=True))
@@ -68,3 +128,128 @@ class Item(db.Model):
     def __repr__(self):
         '''Returns a string representation of the Item.'''
         return f'<Item {self.item_id} of Product {self.product.name}>'
+
+    def to_dict(self):
+        '''Returns the item as a JSON serialisable dict.'''
+        return {
+            'item_id': self.item_id,
+            'product_id': self.product_id,
+            'status': self.status,
+            'entry_date': self.entry_date.isoformat() if self.entry_date else None,
+            'exit_date': self.exit_date.isoformat() if self.exit_date else None,
+            'sales_receipt': self.sales_receipt,
+            'purchase_receipt': self.purchase_receipt,
+            'expiry_date': self.expiry_date.isoformat() if self.expiry_date else None,
+            'quantity': self.quantity,
+        }
+
+class ArchivedItem(db.Model):
+    """
+    Object representing a closed item moved out of the live item table by `DatabaseManager.archive_items`.
+
+    Items that were sold, expired or broken long ago are never modified again, the archive keeps
+    them with their original ID and columns so the hot `item` table only holds recent history.
+
+    Attributes:
+        The same as `Item`.
+
+    Methods:
+        to_dict: Returns the item as a JSON serialisable dict.
+    """
+    __tablename__ = 'item_archive'
+
+    # Indexes covering the item filters and the report window on the archive, and its watermark
+    __table_args__ = (
+        db.Index('ix_item_archive_product_entry', 'product_id', 'entry_date'),
+        db.Index('ix_item_archive_entry_date', 'entry_date'),
+    )
+
+    # Define the columns of the 'item_archive' table, the IDs are the ones the items had in 'item'
+    item_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), nullable=False)
+    entry_date = db.Column(db.DateTime)
+    exit_date = db.Column(db.DateTime)
+    status = db.Column(db.String(100), nullable=False)
+    sales_receipt = db.Column(db.String(100), nullable=True)
+    purchase_receipt = db.Column(db.String(100), nullable=True)
+    expiry_date = db.Column(db.Date, nullable=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    to_dict = Item.to_dict
+
+class StockMovement(db.Model):
+    """
+    Object representing the daily stock movement of a product, a rollup of the item table.
+
+    Items entering stock are counted under the `available` status on their entry day,
+    items leaving stock are counted under their new status on their exit day.
+
+    Attributes:
+        product_id (int): The identifier of the associated product.
+        day (date): The day of the movement.
+        status (str): The item status the movement is counted under.
+        entry_count (int): The number of items that entered stock.
+        exit_count (int): The number of items that left stock.
+        buy_value (float): The moved items valued at the buying price.
+        sell_value (float): The moved items valued at the selling price.
+    """
+    # Index the day window of the dashboard and weekly report
+    __table_args__ = (
+        db.Index('ix_stock_movement_day', 'day'),
+    )
+
+    # Define the columns of the 'stock_movement' table
+    product_id = db.Column(db.Integer, db.ForeignKey('product.product_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(100), primary_key=True)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    exit_count = db.Column(db.Integer, nullable=False, default=0)
+    buy_value = db.Column(db.Float, nullable=False, default=0)
+    sell_value = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        '''Returns a string representation of the stock movement.'''
+        return f'<StockMovement {self.product_id} {self.day} {self.status}>'
+
+
+class User(db.Model):
+    """
+    Object representing a user who can log in, with a salted password hash.
+
+    Attributes:
+        user_id (int): The unique identifier for the user.
+        username (str): The unique login name of the user.
+        password_hash (str): The werkzeug password hash, which embeds its method and cost.
+        role (str): The role of the user, which decides their permissions.
+
+    Methods:
+        __repr__: Returns a string representation of the user.
+        set_password: Hash and store a new password.
+        check_password: Verify a password against the stored hash.
+        needs_rehash: Whether the stored hash was made with another method or cost.
+    """
+    # `user` is a reserved word on PostgreSQL
+    __tablename__ = 'app_user'
+
+    # Define the columns of the 'app_user' table
+    user_id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), nullable=False, unique=True)
+    password_hash = db.Column(db.String(255), nullable=False)
+    role = db.Column(db.String(100), nullable=False)
+
+    def __repr__(self):
+        '''Returns a string representation of the user.'''
+        return f'<User {self.username}>'
+
+    def set_password(self, password:str, method:str):
+        '''Hash and store a new password with a werkzeug method such as `pbkdf2:sha256:260000`.'''
+        self.password_hash = generate_password_hash(password, method=method)
+
+    def check_password(self, password:str):
+        '''Returns whether the password matches the stored hash.'''
+        return check_password_hash(self.password_hash, password)
+
+    def needs_rehash(self, method:str):
+        '''Returns whether the stored hash was made with another method or cost than `method`.'''
+        return not self.password_hash.startswith(f'{method}$')
+
@@ -0,0 +1,210 @@
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import Blueprint, abort, current_app, g, has_request_context, jsonify, request, session
+from sqlalchemy import event
+from app import db
+
+# * Create a Blueprint for the metrics routes
+metrics = Blueprint('metrics', __name__)
+
+
+class RequestProfiler:
+    """
+    Opt-in per-endpoint instrumentation enabled with `PROFILING_ENABLED`.
+
+    Records, per endpoint, the wall time, the number of SQL statements, the time spent in
+    the database and the ORM rows loaded. A request that runs the same SELECT more than
+    `PROFILING_N_PLUS_ONE_THRESHOLD` times is flagged as an N+1 pattern. With
+    `PROFILING_SAMPLE_INTERVAL` set, a sampling profiler writes the folded stacks of
+    requests slower than `PROFILING_SLOW_SECONDS` to `PROFILING_OUTPUT_DIR`, ready for
+    flamegraph tools.
+
+    Methods:
+        init_app: Install the instrumentation on an application.
+        snapshot: Returns the collected statistics per endpoint.
+        prometheus: Returns the statistics in the Prometheus text format.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            'requests': 0, 'wall_seconds': 0.0, 'max_wall_seconds': 0.0,
+            'sql_statements': 0, 'db_seconds': 0.0, 'rows_loaded': 0,
+            'n_plus_one': 0, 'n_plus_one_statements': set(),
+        })
+        self._sampled_threads = {}
+        self._sampler = None
+
+    def init_app(self, app):
+        '''Install the request hooks, SQL event listeners and metrics routes on an application.'''
+        if not app.config['PROFILING_ENABLED']:
+            return
+        app.extensions['profiler'] = self
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+        app.register_blueprint(metrics)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        if not event.contains(db.Model, 'load', self._instance_loaded):
+            event.listen(db.Model, 'load', self._instance_loaded, propagate=True)
+
+        if app.config['PROFILING_SAMPLE_INTERVAL'] and self._sampler is None:
+            self._sampler = threading.Thread(
+                target=self._sample_stacks, args=(app.config['PROFILING_SAMPLE_INTERVAL'],),
+                name='profiler-sampler', daemon=True)
+            self._sampler.start()
+
+    def _start_request(self):
+        '''Start measuring a request.'''
+        g.profile = {'start': time.perf_counter(), 'statements': Counter(),
+                     'db_seconds': 0.0, 'rows_loaded': 0}
+        if self._sampler is not None:
+            self._sampled_threads[threading.get_ident()] = Counter()
+
+    def _finish_request(self, exception=None):
+        '''Fold the measurements of a request into the per-endpoint statistics.'''
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        wall_seconds = time.perf_counter() - profile['start']
+        endpoint = request.endpoint or 'unmatched'
+        threshold = current_app.config['PROFILING_N_PLUS_ONE_THRESHOLD']
+        repeated = [statement for statement, count in profile['statements'].items()
+                    if count > threshold and statement.lstrip().upper().startswith('SELECT')]
+
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats['requests'] += 1
+            stats['wall_seconds'] += wall_seconds
+            stats['max_wall_seconds'] = max(stats['max_wall_seconds'], wall_seconds)
+            stats['sql_statements'] += sum(profile['statements'].values())
+            stats['db_seconds'] += profile['db_seconds']
+            stats['rows_loaded'] += profile['rows_loaded']
+            if repeated:
+                stats['n_plus_one'] += 1
+                stats['n_plus_one_statements'].update(repeated)
+
+        stacks = self._sampled_threads.pop(threading.get_ident(), None)
+        if stacks and wall_seconds >= current_app.config['PROFILING_SLOW_SECONDS']:
+            self._write_stacks(endpoint, stacks)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        '''Remember when a statement started.'''
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        '''Count a finished statement and its duration against the current request.'''
+        started = conn.info['profile_started'].pop()
+        if has_request_context() and 'profile' in g:
+            g.profile['statements'][statement] += 1
+            g.profile['db_seconds'] += time.perf_counter() - started
+
+    def _instance_loaded(self, target, context):
+        '''Count an ORM instance loaded from a row against the current request.'''
+        if has_request_context() and 'profile' in g:
+            g.profile['rows_loaded'] += 1
+
+    def _sample_stacks(self, interval:float):
+        '''Periodically record the stack of every thread currently serving a request.'''
+        while True:
+            time.sleep(interval)
+            frames = sys._current_frames()
+            for thread_id, stacks in list(self._sampled_threads.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                stacks[';'.join(reversed(names))] += 1
+
+    def _write_stacks(self, endpoint:str, stacks:Counter):
+        '''Write folded stacks (`frame;frame;frame count` per line) of a slow request.'''
+        directory = current_app.config['PROFILING_OUTPUT_DIR']
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{endpoint}-{time.strftime("%Y%m%d-%H%M%S")}-{threading.get_ident()}.folded')
+        with open(path, 'w') as folded:
+            for stack, count in stacks.items():
+                folded.write(f'{stack} {count}\n')
+
+    def snapshot(self):
+        '''
+        Returns the collected statistics per endpoint.
+
+        Returns:
+            dict: Per endpoint the request count, wall/DB seconds, SQL statements, rows loaded
+            and the statements flagged as N+1 patterns.
+        '''
+        with self._lock:
+            return {
+                endpoint: {**stats, 'n_plus_one_statements': sorted(stats['n_plus_one_statements'])}
+                for endpoint, stats in self._stats.items()
+            }
+
+    def prometheus(self):
+        '''Returns the statistics in the Prometheus text exposition format.'''
+        metrics_help = [
+            ('requests', 'counter', 'Requests served'),
+            ('wall_seconds', 'counter', 'Total wall time of requests in seconds'),
+            ('max_wall_seconds', 'gauge', 'Slowest request in seconds'),
+            ('sql_statements', 'counter', 'SQL statements executed'),
+            ('db_seconds', 'counter', 'Total time spent executing SQL in seconds'),
+            ('rows_loaded', 'counter', 'ORM rows loaded'),
+            ('n_plus_one', 'counter', 'Requests flagged with an N+1 query pattern'),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for key, kind, description in metrics_help:
+            name = f'inventory_endpoint_{key}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for endpoint, stats in sorted(snapshot.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+profiler = RequestProfiler()
+
+
+@metrics.before_request
+def require_view_metrics():
+    '''
+    Serve the metrics, which include SQL text, to users with the `view_metrics` permission or to a
+    scraper sending `METRICS_TOKEN` as a bearer token. Others get 401, or 403 when logged in.
+    '''
+    token = current_app.config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return
+    if 'view_metrics' not in g.permissions:
+        abort(401 if 'role' not in session else 403)
+
+
+# * Route endpoint Prometheus metrics
+@metrics.route('/metrics')
+def prometheus_metrics():
+    """
+    Route to export the per-endpoint request statistics in the Prometheus text format.
+
+    Returns:
+    The metrics as `text/plain`.
+    """
+    return current_app.response_class(profiler.prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+# * Route endpoint JSON metrics
+@metrics.route('/metrics.json')
+def json_metrics():
+    """
+    Route to dump the per-endpoint request statistics, including the statements flagged as N+1, as JSON.
+
+    Returns:
+    JSON of the statistics per endpoint.
+    """
+    return jsonify(profiler.snapshot())
@@ -0,0 +1,89 @@
+from datetime import date, datetime
+from sqlalchemy import event
+from app import db
+
+
+def explain_query_plan(statement):
+    '''
+    Ask the database how it would execute a statement, without running it.
+
+    Parameters:
+        statement: A SQLAlchemy statement or ORM query.
+
+    Returns:
+        list: The lines of the plan (`EXPLAIN QUERY PLAN` on SQLite, `EXPLAIN` elsewhere).
+    '''
+    if hasattr(statement, 'statement'):
+        statement = statement.statement
+    connection = db.session.connection()
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+
+    # rewrite the compiled SQL just before it reaches the driver, keeping its parameters
+    def add_prefix(conn, cursor, sql, parameters, context, executemany):
+        return prefix + sql, parameters
+
+    event.listen(connection, 'before_cursor_execute', add_prefix, retval=True)
+    try:
+        rows = connection.execute(statement).fetchall()
+    finally:
+        event.remove(connection, 'before_cursor_execute', add_prefix)
+    # the plan text is the last column on both SQLite and PostgreSQL
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(statement, index_name:str):
+    '''
+    Assert that the plan of a statement uses an index.
+
+    Parameters:
+        statement: A SQLAlchemy statement or ORM query.
+        index_name (str): The name of the index that must appear in the plan.
+
+    Returns:
+        list: The lines of the plan.
+
+    Raises:
+        AssertionError: If the index does not appear in the plan.
+    '''
+    plan = explain_query_plan(statement)
+    if not any(index_name in line for line in plan):
+        raise AssertionError(f'expected {index_name} in query plan:\n  ' + '\n  '.join(plan))
+    return plan
+
+
+def hot_query_indexes():
+    '''
+    Build the hot queries of the application together with the index each must use.
+
+    Returns:
+        dict: A mapping of query name to `(statement, index_name)`.
+    '''
+    from app.database import DatabaseManager, ProductRow, FIFO_ORDER, FEFO_ORDER
+    from app.models import Product, Item, ArchivedItem
+    from app.search import search_query, SQLITE_SEARCH_TABLE, POSTGRESQL_SEARCH_INDEX
+    now = datetime.utcnow()
+    # SQLite plans the full-text index as a scan of the virtual table
+    search_index = f'{SQLITE_SEARCH_TABLE} VIRTUAL TABLE' if db.engine.dialect.name == 'sqlite' \
+        else POSTGRESQL_SEARCH_INDEX
+    return {
+        'items': (DatabaseManager.filter_items(1, 'available', '2024-01-01', '2024-12-31'),
+                  'ix_item_product_status_entry'),
+        'products': (DatabaseManager.filter_products('Minuman'), 'ix_product_category'),
+        'add_product': (Product.query.filter_by(name='Susu', category='Minuman', sell_price=12000.0, buy_price=9000.0),
+                        'ux_product_identity'),
+        'search_products': (search_query(ProductRow.columns, 'sus', 10), search_index),
+        'reduce_item_quantity': (DatabaseManager._claim_items_statement(
+            1, 10, {'status': 'sold', 'exit_date': now}, [Item.quantity == 1], FIFO_ORDER),
+            'ix_item_product_status_entry'),
+        'reduce_item_quantity_fefo': (DatabaseManager._claim_items_statement(
+            1, 10, {'status': 'sold', 'exit_date': now}, [Item.expiry_date >= now.date()], FEFO_ORDER),
+            'ix_item_product_status_expiry'),
+        'expire_items': (DatabaseManager._expired_products_query(now.date()), 'ix_item_product_status_expiry'),
+        'report': (DatabaseManager._report_rows_query(datetime(2024, 1, 1), now), 'ix_item_entry_date'),
+        'items_archive': (DatabaseManager.filter_items(1, 'sold', '2024-01-01', '2024-12-31', ArchivedItem),
+                          'ix_item_archive_product_entry'),
+        'report_archive': (DatabaseManager._report_rows_query(datetime(2024, 1, 1), now, ArchivedItem),
+                           'ix_item_archive_entry_date'),
+        'archive_items': (DatabaseManager._archive_batch_query(1, now, 500), 'ix_item_product_exit'),
+        'dashboard': (DatabaseManager._dashboard_query(date(2024, 1, 1), now.date()), 'ix_stock_movement_day'),
+    }
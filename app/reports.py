@@ -0,0 +1,167 @@
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from app.database import DatabaseManager
+
+# Style shared by every weekly table of the report
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+# The flowables reportlab may look ahead at, the rest of the story is produced while it lays out pages
+STORY_LOOKAHEAD = 16
+
+
+def report_path(reports_dir:str, job_id:str):
+    '''Returns the path of the PDF file written by a report job.'''
+    return os.path.join(reports_dir, f'weekly_report_{job_id}.pdf')
+
+
+def delete_old_reports(reports_dir:str, max_age:int):
+    '''
+    Delete the report PDFs, and the partial files of crashed jobs, older than `max_age` seconds.
+
+    Returns:
+        int: The number of deleted files.
+    '''
+    if not os.path.isdir(reports_dir):
+        return 0
+    cutoff = time.time() - max_age
+    deleted = 0
+    for entry in os.scandir(reports_dir):
+        if entry.name.startswith('weekly_report_') and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                deleted += 1
+            except FileNotFoundError:
+                # another worker deleted it first
+                pass
+    return deleted
+
+
+class LazyStory(list):
+    """
+    The flowables of a document, pulled from an iterator while reportlab lays them out.
+
+    `doc.build` consumes the story from the front and only looks a few flowables ahead,
+    so at most `lookahead` of them are kept in memory instead of the whole report.
+    """
+    def __init__(self, flowables, lookahead:int=STORY_LOOKAHEAD):
+        super().__init__()
+        self._flowables = iter(flowables)
+        self._lookahead = lookahead
+
+    def _fill(self, size:int):
+        '''Pull flowables from the iterator until `size` are buffered or it is exhausted.'''
+        while super().__len__() < size:
+            flowable = next(self._flowables, None)
+            if flowable is None:
+                return
+            self.append(flowable)
+
+    def __len__(self):
+        self._fill(self._lookahead)
+        return super().__len__()
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index >= 0:
+            self._fill(max(index + 1, self._lookahead))
+        return super().__getitem__(index)
+
+
+def week_period(week_start:str):
+    '''Returns the period label of a week from its `YYYY-MM-DD` Monday.'''
+    week_start = datetime.strptime(week_start, '%Y-%m-%d')
+    week_end = week_start + timedelta(days=6)
+    return f"Periode: {week_start:%Y-%m-%d} - {week_end:%Y-%m-%d}"
+
+
+def build_weekly_report(pdf_path:str, end_date:datetime=None, days:int=90, chunk_size:int=1000):
+    """
+    Build the weekly report PDF containing the products and items entered within a period.
+    The report includes details such as product name, category, prices, item ID, status, entry and exit dates.
+
+    The story is generated while the PDF is laid out and every table holds at most `chunk_size`
+    rows, so memory stays bounded by the chunk size instead of growing with the report.
+
+    Parameters:
+        pdf_path (str): The file to write the PDF to.
+        end_date (datetime): The end of the period (optional, defaults to now).
+        days (int): The length of the period in days.
+        chunk_size (int): The number of rows fetched from the database and put in one table at a time.
+
+    Returns:
+        str: The path of the written PDF.
+    """
+    # initialize end date as today and start date as `days` ago
+    end_date = end_date or datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+
+    # write to a temporary file first so a half written report is never served
+    partial_path = pdf_path + '.part'
+    doc = SimpleDocTemplate(partial_path, pagesize=letter)
+    try:
+        doc.build(LazyStory(report_story(start_date, end_date, chunk_size)))
+    except BaseException:
+        # a failed job must not look like a running one to other workers
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.replace(partial_path, pdf_path)
+    return pdf_path
+
+
+def report_story(start_date:datetime, end_date:datetime, chunk_size:int):
+    '''Yield the flowables of the weekly report, reading the item rows in chunks.'''
+    # Header
+    yield Table([["Laporan Mingguan Produk dan Item"]], colWidths=[500])
+
+    # Summarise the stock movement of each week from the rollup table
+    yield Table([["Ringkasan Pergerakan Stok"]], colWidths=[500])
+    movements = DatabaseManager.get_weekly_movements(start_date.date(), end_date.date())
+    for week_start, week_rows in groupby(movements, key=lambda row: row.week_start):
+        yield Table([[week_period(week_start)]], colWidths=[500])
+        header = ["Produk", "Kategori", "Masuk", "Terjual", "Expire", "Rusak", "Nilai Masuk", "Nilai Terjual"]
+        yield from chunked_tables(header, (
+            [row.name, row.category, row.entered, row.sold, row.expired, row.broken, row.entry_value, row.sold_value]
+            for row in week_rows
+        ), chunk_size)
+
+    # Create the tables of item details for each week, the rows arrive already ordered by week
+    yield Table([["Detail Item"]], colWidths=[500])
+    rows = DatabaseManager.iter_report_rows(start_date, end_date, chunk_size)
+    for week_start, week_rows in groupby(rows, key=lambda row: row.week_start):
+        yield Table([[week_period(week_start)]], colWidths=[500])
+        header = ["Produk", "Kategori", "Harga Jual", "Harga Beli",
+                  "Item ID", "Status", "Jumlah", "Tanggal Masuk", "Tanggal Keluar"]
+        yield from chunked_tables(header, (
+            [
+                row.name, row.category, row.sell_price, row.buy_price,
+                row.item_id, row.status, row.quantity, row.entry_date.strftime('%d-%B-%Y %H:%M'),
+                row.exit_date.strftime('%d-%B-%Y %H:%M') if row.exit_date else 'None'
+            ]
+            for row in week_rows
+        ), chunk_size)
+
+
+def chunked_tables(header:list, rows, chunk_size:int):
+    '''Yield styled tables of at most `chunk_size` rows each, every one starting with the header.'''
+    rows = iter(rows)
+    while True:
+        data = [header] + list(islice(rows, chunk_size))
+        if len(data) == 1:
+            return
+        table = Table(data, repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        yield table
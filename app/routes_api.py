@@ -0,0 +1,178 @@
+from flask import (
+    Blueprint,
+    jsonify,
+    request,
+    abort,
+    current_app,
+    session,
+    g,
+)
+from hashlib import md5
+import json
+from app.database import DatabaseManager
+from app.routes_main import page_size
+from app.auth import permission_required
+from app.cache import cache
+from app.events import stock_events
+
+# * Create a Blueprint for the versioned JSON API
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+@api.before_request
+def require_view_stock():
+    '''Refuse clients that are not logged in (401) or lack the `view_stock` permission (403), every route serves stock data.'''
+    if 'view_stock' not in g.permissions:
+        abort(401 if 'role' not in session else 403)
+
+
+# * Route endpoint list products
+@api.route('/products')
+def products():
+    """
+    Route to list products with their per-status item counts as JSON, one keyset page at a time.
+    Accepts the `category`, `after` and `per_page` args of the products page.
+
+    Returns:
+    JSON with `products` and `next_cursor`, or 304 if the page is unchanged since the client's ETag.
+    """
+    try:
+        products, next_cursor = DatabaseManager.paginate_products(
+            request.args.get('category'), request.args.get('after'), page_size('PRODUCTS_PER_PAGE'))
+    except ValueError:
+        abort(400)
+
+    # the product rows already carry the counters, hashing them needs no item query
+    body = {'products': [product.to_dict() for product in products], 'next_cursor': next_cursor}
+    return conditional_json(content_etag(body), lambda: body)
+
+
+# * Route endpoint search products
+@api.route('/products/search')
+def search_products():
+    """
+    Route to find the products matching a typeahead string, for the product pickers of the forms.
+    Accepts the `q` arg with the text typed so far and the `per_page` arg for the number of matches.
+
+    Returns:
+    JSON with the best matching `products` first, with their per-status item counts.
+    """
+    products = DatabaseManager.search_products(request.args.get('q', ''), page_size('SEARCH_RESULTS_PER_PAGE'))
+    return jsonify({'products': [product.to_dict() for product in products]})
+
+
+# * Route endpoint get product
+@api.route('/products/<int:product_id>')
+def product(product_id):
+    """
+    Route to get a product with its per-status item counts as JSON.
+
+    Parameters:
+    - product_id (int): The unique identifier of the product.
+
+    Returns:
+    JSON of the product, or 304 if it is unchanged since the client's ETag.
+    """
+    product = DatabaseManager.get_product_row(product_id) or abort(404)
+    body = product.to_dict()
+    return conditional_json(content_etag(body), lambda: body)
+
+
+# * Route endpoint list product items
+@api.route('/products/<int:product_id>/items')
+def items(product_id):
+    """
+    Route to list the items of a product as JSON, one keyset page at a time.
+    Accepts the `status`, `start_date`, `end_date`, `after` and `per_page` args of the items page.
+
+    Parameters:
+    - product_id (int): The unique identifier of the product.
+
+    Returns:
+    JSON with `items` and `next_cursor`, or 304 without touching the item table
+    if the product and its version are unchanged since the client's ETag.
+    """
+    product = DatabaseManager.get_product_row(product_id) or abort(404)
+
+    # every change to the items of a product bumps its version, so the version and the
+    # filters fully determine the response
+    etag = content_etag({'product': product.to_dict(), 'args': sorted(request.args.items())})
+
+    def body():
+        try:
+            items, next_cursor = DatabaseManager.paginate_items(
+                product_id, request.args.get('status'), request.args.get('start_date'),
+                request.args.get('end_date'), request.args.get('after'), page_size('ITEMS_PER_PAGE'))
+        except ValueError:
+            abort(400)
+        return {'items': [item.to_dict() for item in items], 'next_cursor': next_cursor}
+
+    return conditional_json(etag, body)
+
+
+# * Route endpoint stream stock changes
+@api.route('/stock/events')
+def stock_event_stream():
+    """
+    Route to stream the counters of the products whose stock changes as server-sent events, so open
+    pages patch their tables in place instead of reloading. The browser reconnects with the
+    `Last-Event-ID` header and gets the events it missed.
+
+    Returns:
+    An event stream of `stock` events with JSON `products` holding `product_id`, `version` and `counts`,
+    503 when this worker already serves `EVENTS_MAX_SUBSCRIBERS` streams, or 204 when the stream is off.
+    """
+    if stock_events.broker is None:
+        # a 204 tells the browser to stop reconnecting
+        return '', 204
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+    subscription = stock_events.broker.subscribe(last_event_id)
+    if subscription is None:
+        abort(503)
+
+    stream = stock_events.stream(
+        subscription, current_app.config['EVENTS_KEEPALIVE'], current_app.config['EVENTS_STREAM_SECONDS'])
+    # proxies must pass every event on as soon as it is written
+    return current_app.response_class(stream, mimetype='text/event-stream',
+                                      headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# * Route endpoint cache statistics
+@api.route('/cache/stats')
+@permission_required('view_metrics')
+def cache_stats():
+    """
+    Route to expose the cache hit and miss counters for monitoring, to administrators only.
+
+    Returns:
+    JSON with the cache backend, its size and per-namespace hits and misses.
+    """
+    return jsonify(cache.stats())
+
+
+def content_etag(data):
+    '''Returns an ETag hashing a JSON serialisable value.'''
+    return md5(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def conditional_json(etag:str, build_body):
+    '''
+    Answer a conditional GET: 304 when the client already has `etag`, otherwise the JSON built by `build_body`.
+
+    Parameters:
+        etag (str): The entity tag of the current representation.
+        build_body (callable): Builds the JSON body, only called when the client's copy is stale.
+
+    Returns:
+        Response: The 304 or 200 response, both carrying the ETag.
+    '''
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build_body())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -4,23 +4,29 @@ from flask import (
     redirect,
     url_for,
     request,
+    flash,
+    jsonify,
+    abort,
 )
-from werkzeug.utils import secure_filename
-from app.database import DatabaseManager
-import os
+from app.database import DatabaseManager, InsufficientStockError, BatchLineError
+from app.models import ITEM_STATUSES
+from app.uploads import save_receipt, is_receipt_url, ReceiptTooLargeError
+from app.auth import permission_required
 
 form = Blueprint('form', __name__)
 
 # * Route endpoint add product form
 @form.route('/product/add', methods=['GET', 'POST'])
+@permission_required('receive_stock')
 def add_product():
     '''
     Route to add a new product to the database if the request method is POST. 
-    Retrieves product details from the form data, saves the sales receipt file, 
+    Retrieves product details from the form data, saves the sales receipt file by its content hash, 
     and adds the product to the database. Redirects to the products page after adding the product. 
 
     Returns: 
     - Redirect to the products page after adding the product.
+    - Redirect back to the form with a message when a value is invalid, nothing is added.
     - Renders the 'add_product.html' template if the request method is GET
     '''
     # 
@@ -32,21 +38,23 @@ def add_product():
         sell_price = request.form['sell_price']
         buy_price = request.form['buy_price']
         entry_date = request.form['entry_date']
+        expiry_date = request.form.get('expiry_date')
         sales_receipt = request.files['sales_receipt']
-        print(entry_date)
         # Save sales receipt file and store its URL
-        if sales_receipt:
-            filename = secure_filename(sales_receipt.filename)
-            upload_path = os.path.join('app/static/uploads', filename)
-
-            sales_receipt.save(upload_path)
-            sales_receipt_url = url_for('static', filename='uploads/' + filename)
-        else:
-            sales_receipt_url = None
-
-        # Add product to the database and redirect to the products page
-        DatabaseManager.add_product(
-            name, category, quantity, sell_price, buy_price, sales_receipt_url, entry_date)
+        try:
+            sales_receipt_url = save_receipt(sales_receipt) if sales_receipt else None
+        except ReceiptTooLargeError as error:
+            flash_receipt_too_large(error)
+            return redirect(url_for('form.add_product'))
+
+        # Add product to the database and redirect to the products page,
+        # go back to the form when a value is invalid, e.g. a negative quantity
+        try:
+            DatabaseManager.add_product(
+                name, category, quantity, sell_price, buy_price, sales_receipt_url, entry_date, expiry_date)
+        except ValueError as error:
+            flash(f'Data barang tidak valid ({error}).', 'danger')
+            return redirect(url_for('form.add_product'))
         return redirect(url_for('main.products'))
     
     # Render the 'add_product.html' template if the request method is GET
@@ -55,46 +63,183 @@ def add_product():
 
 # * Route endpoint reduce product
 @form.route('/product/reduce', methods=['GET', 'POST'])
+@permission_required('reduce_stock')
 def reduce_product():
     '''
     Route to reduce the quantity of a product in the database. Handles both GET and POST requests. 
     If a POST request is received, updates the item quantity, status, and purchase receipt in the database. 
     If the status is 'sold' and a purchase receipt is provided, saves the receipt file and updates the database. 
+    If there are not enough available items, or the quantity, status or date is invalid, nothing is reduced
+    and the form is shown again with a message.
     
     Returns:
     - Redirects to the products page after processing the request. 
-    - If a GET request is received, retrieves all products from the database and renders the 'reduce_product.html' template.
+    - If a GET request is received, renders the 'reduce_product.html' template with its product search picker.
     '''
     if request.method == 'POST':
         # Get form data
-        product_id = request.form['product_id']
-        quantity = int(request.form['quantity'])
-        status = request.form['status']
+        product_id = request.form.get('product_id', type=int)
+        if product_id is None:
+            flash('Pilih barang dari daftar.', 'danger')
+            return redirect(url_for('form.reduce_product'))
+        quantity = request.form.get('quantity', type=int)
+        status = request.form.get('status')
         purchase_receipt = request.files.get('purchase_receipt')
-        exit_date = request.form['exit_date'] 
+        exit_date = request.form['exit_date']
+        # items only leave stock as sold, expired or broken
+        if quantity is None or status not in ITEM_STATUSES or status == 'available':
+            flash('Jumlah atau status pengurangan tidak valid.', 'danger')
+            return redirect(url_for('form.reduce_product'))
 
         # Save purchase receipt file and store its URL
-        if status == 'sold' and purchase_receipt:
-            filename = secure_filename(purchase_receipt.filename)
-            upload_path = os.path.join('app/static/uploads', filename)
-            purchase_receipt.save(upload_path)
-            purchase_receipt_url = url_for(
-                'static', filename='uploads/' + filename)
-        else:
-            purchase_receipt_url = None
-
-        # Reduce item quantity in the database and redirect to the products page
-        DatabaseManager.reduce_item_quantity(
-            product_id, quantity, status, exit_date, purchase_receipt_url)
+        try:
+            purchase_receipt_url = save_receipt(purchase_receipt) \
+                if status == 'sold' and purchase_receipt else None
+        except ReceiptTooLargeError as error:
+            flash_receipt_too_large(error)
+            return redirect(url_for('form.reduce_product'))
+
+        # Reduce item quantity in the database and redirect to the products page,
+        # go back to the form when there is not enough stock
+        try:
+            DatabaseManager.reduce_item_quantity(
+                product_id, quantity, status, exit_date, purchase_receipt_url)
+        except InsufficientStockError as error:
+            flash(f'Stok tidak cukup: tersedia {error.available}, diminta {error.requested}.', 'danger')
+            return redirect(url_for('form.reduce_product'))
+        except ValueError as error:
+            flash(f'Data pengurangan tidak valid ({error}).', 'danger')
+            return redirect(url_for('form.reduce_product'))
+        return redirect(url_for('main.products'))
+
+    # Render the 'reduce_product.html' template, its product picker searches the catalog while typing
+    return render_template('reduce_product.html')
+
+
+# * Route endpoint batch reduce products
+@form.route('/product/batch/reduce', methods=['GET', 'POST'])
+@permission_required('reduce_stock')
+def batch_reduce():
+    '''
+    Route to reduce many products in one all-or-nothing transaction, e.g. a whole checkout.
+    Accepts the form (repeated `product_id`, `quantity` and `status` fields) or JSON
+    `{"exit_date": ..., "purchase_receipt": ..., "lines": [{"product_id", "quantity", "status"}]}`.
+
+    Returns:
+    - JSON with the per-line results, or 409 with the failing line when a line fails.
+    - For the form, redirects to the products page, or back to the form with a message when a line fails.
+    - Renders the 'batch_reduce.html' template if the request method is GET.
+    '''
+    if request.method == 'POST':
+        if request.is_json:
+            return batch_json(DatabaseManager.reduce_items_batch, 'exit_date', 'purchase_receipt')
+
+        # Get the form lines and save the purchase receipt file if a line is sold
+        lines = form_lines('product_id', 'quantity', 'status')
+        purchase_receipt = request.files.get('purchase_receipt')
+        try:
+            purchase_receipt_url = save_receipt(purchase_receipt) \
+                if purchase_receipt and any(line['status'] == 'sold' for line in lines) else None
+            results = DatabaseManager.reduce_items_batch(lines, request.form['exit_date'], purchase_receipt_url)
+        except ReceiptTooLargeError as error:
+            flash_receipt_too_large(error)
+            return redirect(url_for('form.batch_reduce'))
+        except BatchLineError as error:
+            flash(f'Baris {error.index + 1} gagal, tidak ada barang yang dikurangi: {batch_error_message(error)}', 'danger')
+            return redirect(url_for('form.batch_reduce'))
+
+        flash(f'{sum(result["reduced"] for result in results)} item dari {len(results)} baris berhasil dikurangi.', 'success')
+        return redirect(url_for('main.products'))
+
+    # Render the 'batch_reduce.html' template, its product pickers search the catalog while typing
+    return render_template('batch_reduce.html')
+
+
+# * Route endpoint batch receive products
+@form.route('/product/batch/receive', methods=['GET', 'POST'])
+@permission_required('receive_stock')
+def batch_receive():
+    '''
+    Route to add items for many products in one all-or-nothing transaction, e.g. a whole delivery.
+    Accepts the form (repeated `name`, `category`, `quantity`, `sell_price`, `buy_price` and `expiry_date` fields) or JSON
+    `{"entry_date": ..., "sales_receipt": ..., "lines": [{"name", "category", "quantity", "sell_price", "buy_price", "expiry_date"}]}`,
+    `expiry_date` being optional.
+
+    Returns:
+    - JSON with the per-line results, or 409 with the failing line when a line fails.
+    - For the form, redirects to the products page, or back to the form with a message when a line fails.
+    - Renders the 'batch_receive.html' template if the request method is GET.
+    '''
+    if request.method == 'POST':
+        if request.is_json:
+            return batch_json(DatabaseManager.receive_items_batch, 'entry_date', 'sales_receipt')
+
+        # Get the form lines and save the sales receipt file
+        lines = form_lines('name', 'category', 'quantity', 'sell_price', 'buy_price', 'expiry_date')
+        sales_receipt = request.files.get('sales_receipt')
+        try:
+            sales_receipt_url = save_receipt(sales_receipt) if sales_receipt else None
+            results = DatabaseManager.receive_items_batch(lines, request.form['entry_date'], sales_receipt_url)
+        except ReceiptTooLargeError as error:
+            flash_receipt_too_large(error)
+            return redirect(url_for('form.batch_receive'))
+        except BatchLineError as error:
+            flash(f'Baris {error.index + 1} gagal, tidak ada barang yang ditambahkan: {batch_error_message(error)}', 'danger')
+            return redirect(url_for('form.batch_receive'))
+
+        flash(f'{sum(result["quantity"] for result in results)} item dari {len(results)} baris berhasil ditambahkan.', 'success')
         return redirect(url_for('main.products'))
 
-    # Retrieve all products from the database and render the 'reduce_product.html' template
-    products = DatabaseManager.get_all_products()
-    return render_template('reduce_product.html', products=products)
+    # Render the 'batch_receive.html' template if the request method is GET
+    return render_template('batch_receive.html')
+
+
+def form_lines(*fields):
+    '''Zip the repeated form fields of a batch form into one dict per line, skipping empty lines.'''
+    columns = [request.form.getlist(field) for field in fields]
+    return [dict(zip(fields, values)) for values in zip(*columns) if any(values)]
+
+
+def batch_json(operation, date_field:str, receipt_field:str):
+    '''
+    Run a batch operation for a JSON request and answer with its per-line results.
+
+    The body must be an object with a list of line objects and the date, 400 otherwise. A receipt
+    can only refer to a file uploaded before, any other text would be rendered as a link.
+    '''
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400)
+    lines, date, receipt = data.get('lines'), data.get(date_field), data.get(receipt_field)
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines) \
+            or not isinstance(date, str) or not date:
+        abort(400)
+    if receipt is not None and not is_receipt_url(receipt):
+        abort(400)
+    try:
+        results = operation(lines, date, receipt)
+    except ValueError:
+        abort(400)
+    except BatchLineError as error:
+        return jsonify({'error': batch_error_message(error), 'line': error.index}), 409
+    return jsonify({'results': results})
+
+
+def flash_receipt_too_large(error:ReceiptTooLargeError):
+    '''Tell the user the uploaded receipt is over the size limit.'''
+    flash(f'Struk terlalu besar, maksimal {error.max_bytes // (1024 * 1024)} MB.', 'danger')
+
+
+def batch_error_message(error:BatchLineError):
+    '''Describe why a batch line failed.'''
+    if isinstance(error.error, InsufficientStockError):
+        return f'stok barang {error.error.product_id} tidak cukup, tersedia {error.error.available}, diminta {error.error.requested}'
+    return f'data tidak valid ({error.error})'
 
 
 # * Route endpoint handle edit product
 @form.route('/product/edit/<int:product_id>', methods=['GET', 'POST'])
+@permission_required('edit_product')
 def edit_product(product_id):
     """
     Edit a product based on the provided product ID.
@@ -118,7 +263,11 @@ def edit_product(product_id):
         sell_price = request.form['sell_price']
         buy_price = request.form['buy_price']
 
-        DatabaseManager.update_product(product_id, name=name, category=category, sell_price=sell_price, buy_price=buy_price)
+        try:
+            DatabaseManager.update_product(product_id, name=name, category=category, sell_price=sell_price, buy_price=buy_price)
+        except ValueError:
+            flash('Barang dengan nama, kategori dan harga yang sama sudah ada.', 'danger')
+            return redirect(url_for('form.edit_product', product_id=product_id))
         return redirect(url_for('main.products'))
 
     # Render the 'edit_product.html' template with the product details
@@ -127,6 +276,7 @@ def edit_product(product_id):
 
 # * Route handle Delete Product
 @form.route('/product/delete/<int:product_id>')
+@permission_required('delete_product')
 def delete_product(product_id):
     """
     Delete a product from the database based on the provided product_id.
@@ -5,16 +5,20 @@ from flask import (
     redirect, 
     url_for,
     request, 
-    send_file
+    send_file,
+    jsonify,
+    abort,
+    current_app,
+    make_response,
+    stream_with_context,
 )
+from app.auth import permission_required
 from app.database import DatabaseManager
-from app.models import Product, Item
-from werkzeug.utils import secure_filename
-from datetime import datetime, timedelta
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
+from app.exports import csv_stream
+from app.reports import build_weekly_report, delete_old_reports, report_path
+from datetime import date, datetime, timedelta
 import os
+import uuid
 
 # * Create a Blueprint for the main routes
 main = Blueprint('main', __name__)
@@ -26,40 +30,58 @@ def index():
 
 # * Route endpoint display products
 @main.route('/products')
+@permission_required('view_stock')
 def products():
     """
     Route to display products based on selected category or all categories.
     Fetches selected category from request args and retrieves all unique categories.
-    Filters products by selected category or retrieves all products if no category selected.
+    Filters products by selected category or retrieves all products if no category selected,
+    one page at a time continuing after the `after` cursor.
 
     Returns:
-    Renders products.html template with products, selected category, all categories, and user role.
+    Renders products.html template with products, selected category, all categories, next page cursor and user role.
     """
     # Get selected category from request args and all unique categories
     selected_category = request.args.get('category')
-    all_category = [
-        category[0] for category in Product.query.with_entities(Product.category).distinct().all()
-    ]
+    all_category = DatabaseManager.get_categories()
    
     # Filter products by selected category or retrieve all products
-    if selected_category:
-        products = Product.query.filter_by(
-            category=selected_category).all()
-    else:
-        products = DatabaseManager.get_all_products()
+    products, next_cursor = product_page(selected_category)
 
     # Render products.html template with products, selected category, all categories, and user role
     return render_template('products.html', 
                            products=products,
                            selected_category=selected_category,
                            all_category=all_category,
-                           role=session['role'])
+                           next_cursor=next_cursor,
+                           per_page=request.args.get('per_page'),
+                           role=session.get('role'))
+
+
+# * Route endpoint load more products
+@main.route('/products/rows')
+@permission_required('view_stock')
+def product_rows():
+    """
+    Route to fetch the next page of the products table as an HTML fragment of table rows.
+    Accepts the same category, `after` and `per_page` args as the products page.
+
+    Returns:
+    Renders the table rows, the cursor of the following page is sent in the `X-Next-Cursor` header.
+    """
+    products, next_cursor = product_page(request.args.get('category'))
+    response = make_response(render_template('_product_rows.html', products=products, role=session.get('role')))
+    response.headers['X-Next-Cursor'] = next_cursor or ''
+    return response
+
 
 # * Route endpoint display items
 @main.route('/products/<int:product_id>')
+@permission_required('view_stock')
 def items(product_id):
     '''
-    Route to display items related to a specific product based on optional filters like status, start date, and end date.
+    Route to display items related to a specific product based on optional filters like status, start date, and end date,
+    one page at a time continuing after the `after` cursor.
 
     Parameters:
     - product_id (int): The unique identifier of the product to display items for.
@@ -68,24 +90,13 @@ def items(product_id):
     Rendered HTML template displaying items filtered by status, start date, and end date along with product details.
     '''
     # Get product details and optional filters from request args
-    product = Product.query.get_or_404(product_id)
+    product = DatabaseManager.get_product_row(product_id) or abort(404)
     status = request.args.get('status')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
-    query = Item.query.filter_by(product_id=product_id)
-
-    # Filter items by status, start date, and end date
-    if status:
-        query = query.filter_by(status=status)
-    if start_date:
-        query = query.filter(Item.entry_date >= start_date)
-    if end_date:
-        query = query.filter(Item.entry_date <= end_date)
 
     # Retrieve items based on query filters
-    items = query.all()
-
-    
+    items, next_cursor = item_page(product_id, status, start_date, end_date)
 
     # Render items.html template with product, items, selected status, start date, end date, and user role
     return render_template('items.html', 
@@ -94,78 +105,252 @@ def items(product_id):
                            selected_status=status, 
                            start_date=start_date, 
                            end_date=end_date,
-                           role=session['role'])
+                           next_cursor=next_cursor,
+                           per_page=request.args.get('per_page'),
+                           role=session.get('role'))
+
+
+# * Route endpoint load more items
+@main.route('/products/<int:product_id>/rows')
+@permission_required('view_stock')
+def item_rows(product_id):
+    '''
+    Route to fetch the next page of the items table as an HTML fragment of table rows.
+    Accepts the same status, date, `after` and `per_page` args as the items page.
+
+    Parameters:
+    - product_id (int): The unique identifier of the product to display items for.
+
+    Returns:
+    Renders the table rows, the cursor of the following page is sent in the `X-Next-Cursor` header.
+    '''
+    items, next_cursor = item_page(
+        product_id, request.args.get('status'), request.args.get('start_date'), request.args.get('end_date'))
+    response = make_response(render_template('_item_rows.html', items=items))
+    response.headers['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+
+# * Route endpoint export items as CSV
+@main.route('/products/<int:product_id>/items.csv')
+@permission_required('view_stock')
+def export_items(product_id):
+    '''
+    Route to download the items of a product as CSV, with the same status, start date and end date
+    filters as the items page. The rows are streamed while they are read, `gzip=1` compresses the file.
+
+    Parameters:
+    - product_id (int): The unique identifier of the product to export items for.
+
+    Returns:
+    A streamed CSV (or CSV.gz) attachment.
+    '''
+    product = DatabaseManager.get_product_row(product_id) or abort(404)
+    rows = DatabaseManager.iter_items(
+        product_id, request.args.get('status'), request.args.get('start_date'), request.args.get('end_date'),
+        current_app.config['EXPORT_CHUNK_SIZE'])
+    header = ['item_id', 'status', 'entry_date', 'exit_date', 'sales_receipt', 'purchase_receipt', 'expiry_date',
+              'quantity']
+    return csv_response(f'items_{product.product_id}', header, rows)
+
+
+# * Route endpoint export report window as CSV
+@main.route('/products/report.csv')
+@permission_required('view_stock')
+def export_report():
+    """
+    Route to download the items of the weekly report window joined with their product as CSV.
+    The window is taken from the `start_date` and `end_date` args (YYYY-MM-DD), defaulting to the
+    last 90 days like the PDF report. The rows are streamed while they are read, `gzip=1` compresses the file.
+
+    Returns:
+    A streamed CSV (or CSV.gz) attachment.
+    """
+    try:
+        end_date = request.args.get('end_date')
+        end_date = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1, microseconds=-1) \
+            if end_date else datetime.utcnow()
+        start_date = request.args.get('start_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d') if start_date else end_date - timedelta(days=90)
+    except ValueError:
+        abort(400)
+
+    rows = DatabaseManager.iter_report_rows(start_date, end_date, current_app.config['EXPORT_CHUNK_SIZE'])
+    header = ['week_start', 'name', 'category', 'sell_price', 'buy_price',
+              'item_id', 'status', 'entry_date', 'exit_date', 'quantity']
+    return csv_response(f'report_{start_date:%Y%m%d}_{end_date:%Y%m%d}', header, rows)
+
+
+def csv_response(filename:str, header:list, rows):
+    '''Returns a streamed CSV attachment of rows, gzip compressed when the `gzip` arg is set.'''
+    compress = request.args.get('gzip', type=int) == 1
+    # keep the request context, and with it the database session, alive while streaming
+    body = stream_with_context(csv_stream(header, rows, current_app.config['EXPORT_CHUNK_SIZE'], compress))
+    response = current_app.response_class(body, mimetype='application/gzip' if compress else 'text/csv')
+    filename += '.csv.gz' if compress else '.csv'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def page_size(default_key:str):
+    '''Returns the `per_page` request arg bounded by `MAX_PAGE_SIZE`, or the configured default.'''
+    per_page = request.args.get('per_page', type=int) or current_app.config[default_key]
+    return max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+
+
+def product_page(category:str):
+    '''Returns the requested page of products and the next cursor, aborting with 400 on a bad cursor.'''
+    try:
+        return DatabaseManager.paginate_products(
+            category, request.args.get('after'), page_size('PRODUCTS_PER_PAGE'))
+    except ValueError:
+        abort(400)
+
+
+def item_page(product_id:int, status:str, start_date:str, end_date:str):
+    '''Returns the requested page of items and the next cursor, aborting with 400 on a bad cursor.'''
+    try:
+        return DatabaseManager.paginate_items(
+            product_id, status, start_date, end_date, request.args.get('after'), page_size('ITEMS_PER_PAGE'))
+    except ValueError:
+        abort(400)
+
+
+# * Route endpoint stock dashboard
+@main.route('/dashboard')
+@permission_required('view_dashboard')
+def dashboard():
+    """
+    Route to display stock value, margin and sell-through per category.
+    The movement window is taken from the `start_date` and `end_date` args (YYYY-MM-DD),
+    defaulting to the last `DASHBOARD_DAYS` days.
+
+    Returns:
+    Renders dashboard.html template with the rows per category, their totals, the window and user role.
+    """
+    start_date, end_date = dashboard_window()
+    rows = DatabaseManager.get_dashboard(start_date, end_date)
+
+    # add up the categories, sell-through is recomputed from the summed units
+    totals = {key: sum(row[key] for row in rows) for key in (
+        'products', 'available', 'stock_value', 'stock_margin', 'entered',
+        'sold', 'expired', 'broken', 'revenue', 'sold_margin')}
+    sold_or_available = totals['sold'] + totals['available']
+    totals['sell_through'] = totals['sold'] / sold_or_available if sold_or_available else None
+
+    return render_template('dashboard.html',
+                           rows=rows,
+                           totals=totals,
+                           start_date=start_date.isoformat(),
+                           end_date=end_date.isoformat(),
+                           role=session.get('role'))
+
+
+def dashboard_window():
+    '''Returns the dashboard window as `(start_date, end_date)`, aborting with 400 on a bad date.'''
+    try:
+        end_date = request.args.get('end_date')
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else date.today()
+        start_date = request.args.get('start_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date \
+            else end_date - timedelta(days=current_app.config['DASHBOARD_DAYS'] - 1)
+    except ValueError:
+        abort(400)
+    return start_date, end_date
 
 
 # * Route Generate weekly report
-@main.route("/products/report")
+@main.route("/products/report", methods=['POST'])
+@permission_required('view_stock')
 def generate_report():
     """
-    Generate a weekly report in PDF format containing information about products and items entered within the last week.
-    The report includes details such as product name, category, prices, item ID, status, entry and exit dates.
-    
-    Returns the generated PDF file as an attachment for download.
-    """
-    # initialize end date as today and start date as 3 months ago
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=90)
-
-    # Get products and items within the last 3 months
-    products = Product.query.all()
-    items = Item.query.filter(
-        Item.entry_date >= start_date, Item.entry_date <= end_date).all()
-
-    # Create Path file PDF and SimpleDocTemplate
-    pdf_path = os.path.join('app/static/reports', 'weekly_report.pdf')
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    elements = []
-
-    # Header
-    elements.append(
-        Table([["Laporan Mingguan Produk dan Item"]], colWidths=[500]))
-
-    # Group items by week
-    grouped_items = {}
-    for item in items:
-        week_start = item.entry_date - \
-            timedelta(days=item.entry_date.weekday())
-        week_end = week_start + timedelta(days=6)
-        week_key = (week_start.strftime('%Y-%m-%d'),
-                    week_end.strftime('%Y-%m-%d'))
-        if week_key not in grouped_items:
-            grouped_items[week_key] = []
-        grouped_items[week_key].append(item)
-
-    # Create a table for each week
-    for week, items in grouped_items.items():
-        elements.append(
-            Table([[f"Periode: {week[0]} - {week[1]}"]], colWidths=[500]))
-        data = [["Produk", "Kategori", "Harga Jual", "Harga Beli",
-                 "Item ID", "Status", "Tanggal Masuk", "Tanggal Keluar"]]
-        for item in items:
-            product = next(
-                (p for p in products if p.product_id == item.product_id), None)
-            if product:
-                data.append([
-                    product.name, product.category, product.sell_price, product.buy_price,
-                    item.item_id, item.status, item.entry_date.strftime(
-                        '%d-%B-%Y %H:%M'),
-                    item.exit_date.strftime(
-                        '%d-%B-%Y %H:%M') if item.exit_date else 'None'
-                ])
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(table)
-
-    doc.build(elements)
-
-    # Return the generated PDF file as an attachment for download
-    return send_file("static/reports/weekly_report.pdf", as_attachment=True)
+    Start generating a weekly report in PDF format containing information about products and items
+    entered within the last 3 months. The report is built by a background job into its own file.
+
+    Returns:
+    Redirects to the report status page of the new job.
+    """
+    job_id = start_report_job()
+    return redirect(url_for('main.report_status', job_id=job_id))
+
+
+# * Route display report job status
+@main.route("/products/report/<job_id>")
+@permission_required('view_stock')
+def report_status(job_id):
+    """
+    Route to display the status of a report job, the page refreshes itself until the report is ready.
+
+    Parameters:
+    - job_id (str): The identifier of the report job.
+
+    Returns:
+    Renders report.html template with the job status.
+    """
+    return render_template('report.html', job=report_job_status(job_id))
+
+
+# * Route report job status as JSON
+@main.route("/products/report/<job_id>/status")
+@permission_required('view_stock')
+def report_status_json(job_id):
+    """
+    Route to get the status of a report job as JSON.
+
+    Parameters:
+    - job_id (str): The identifier of the report job.
+
+    Returns:
+    JSON with the job status, 404 if the job is unknown.
+    """
+    job = report_job_status(job_id)
+    return jsonify(job), 404 if job['status'] == 'unknown' else 200
+
+
+# * Route download generated report
+@main.route("/products/report/<job_id>/download")
+@permission_required('view_stock')
+def download_report(job_id):
+    """
+    Route to download the PDF built by a report job.
+
+    Parameters:
+    - job_id (str): The identifier of the report job.
+
+    Returns the generated PDF file as an attachment for download, 404 if it is not ready.
+    """
+    pdf_path = report_path(reports_dir(), job_id)
+    if not os.path.exists(pdf_path):
+        abort(404)
+    return send_file(pdf_path, as_attachment=True, download_name='weekly_report.pdf')
+
+
+def reports_dir():
+    '''Returns the directory the report PDFs are written to.'''
+    return current_app.config['REPORTS_DIR'] or os.path.join(current_app.root_path, 'static', 'reports')
+
+
+def start_report_job():
+    '''Submit a weekly report job writing to its own file and return its ID, deleting expired reports first.'''
+    directory = reports_dir()
+    os.makedirs(directory, exist_ok=True)
+    delete_old_reports(directory, current_app.config['REPORT_MAX_AGE'])
+    job_id = uuid.uuid4().hex
+    pdf_path = report_path(directory, job_id)
+    # the partial file tells every worker the job exists until the PDF replaces it
+    open(pdf_path + '.part', 'wb').close()
+    current_app.extensions['jobs'].submit('weekly report', build_weekly_report, args=(pdf_path,), job_id=job_id)
+    return job_id
+
+
+def report_job_status(job_id:str):
+    '''Returns the status dict of a report job, falling back to the output files for jobs of other workers.'''
+    job = current_app.extensions['jobs'].get(job_id)
+    if job:
+        return job.to_dict()
+    pdf_path = report_path(reports_dir(), job_id)
+    if os.path.exists(pdf_path):
+        return {'job_id': job_id, 'status': 'done'}
+    if os.path.exists(pdf_path + '.part'):
+        return {'job_id': job_id, 'status': 'running'}
+    return {'job_id': job_id, 'status': 'unknown'}
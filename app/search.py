@@ -0,0 +1,118 @@
+import re
+from sqlalchemy import column, table, text
+from app import db
+from app.models import Product
+
+# SQLite: an FTS5 table of product names and categories keyed by product ID, with prefix
+# indexes so typeahead prefixes are answered from the index
+SQLITE_SEARCH_TABLE = 'product_search'
+SQLITE_SEARCH_DDL = (f"CREATE VIRTUAL TABLE {SQLITE_SEARCH_TABLE} USING fts5("
+                     "name, category, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+
+# The matches ranked per search, in product ID order
+RANKED_CANDIDATES = 1000
+
+# PostgreSQL: a trigram index on the product name, maintained by the database itself
+POSTGRESQL_SEARCH_INDEX = 'ix_product_name_trgm'
+POSTGRESQL_SEARCH_DDL = (f'CREATE INDEX {POSTGRESQL_SEARCH_INDEX} ON product '
+                         'USING gin (name gin_trgm_ops)')
+
+# `rank` is the hidden BM25 column FTS5 adds to every query
+search_table = table(SQLITE_SEARCH_TABLE, column('rowid'), column('name'), column('category'), column('rank'))
+
+
+def create_search_index():
+    '''
+    Create the product search index of the database backend if it is missing.
+
+    Returns:
+        bool: True if the index was created and needs to be filled with `rebuild_search_index`.
+    '''
+    dialect = db.engine.dialect.name
+    inspector = db.inspect(db.engine)
+    if dialect == 'sqlite':
+        if SQLITE_SEARCH_TABLE in inspector.get_table_names():
+            return False
+        db.session.execute(text(SQLITE_SEARCH_DDL))
+    elif dialect == 'postgresql':
+        if POSTGRESQL_SEARCH_INDEX in {index['name'] for index in inspector.get_indexes('product')}:
+            return False
+        db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        db.session.execute(text(POSTGRESQL_SEARCH_DDL))
+    else:
+        return False
+    db.session.commit()
+    return True
+
+
+def rebuild_search_index():
+    '''Refill the product search index from the product table inside the current transaction.'''
+    if db.engine.dialect.name != 'sqlite':
+        return
+    db.session.execute(search_table.delete())
+    db.session.execute(search_table.insert().from_select(
+        ['rowid', 'name', 'category'], db.select(Product.product_id, Product.name, Product.category)))
+
+
+def index_product(product_id:int, name:str, category:str):
+    '''Add or replace a product in the search index inside the current transaction.'''
+    if db.engine.dialect.name != 'sqlite':
+        return
+    unindex_product(product_id)
+    db.session.execute(search_table.insert().values(rowid=product_id, name=name, category=category))
+
+
+def unindex_product(product_id:int):
+    '''Remove a product from the search index inside the current transaction.'''
+    if db.engine.dialect.name != 'sqlite':
+        return
+    db.session.execute(search_table.delete().where(search_table.c.rowid == product_id))
+
+
+def search_query(columns:tuple, query:str, limit:int):
+    '''
+    Build the query of the best `limit` products matching a typeahead string.
+
+    On SQLite every word of the string must prefix a word of the product name or category,
+    the first `RANKED_CANDIDATES` matches are ranked by BM25. On PostgreSQL the name must start with the string or be similar to it
+    by trigrams, so small typos still match, ranked by similarity. Other backends match name prefixes.
+
+    Parameters:
+        columns (tuple): The columns to select.
+        query (str): The text typed so far.
+        limit (int): The maximum number of products.
+
+    Returns:
+        Query: The search query, or None when the string has no words.
+    '''
+    words = re.findall(r'\w+', query.lower())
+    if not words:
+        return None
+
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        # BM25 is only computed for the first candidates, broad prefixes like a single letter match
+        # most of the catalog and ranking all of it would cost more than the typeahead can afford
+        candidates = db.select(search_table.c.rowid, search_table.c.rank) \
+            .where(text(f'{SQLITE_SEARCH_TABLE} MATCH :match').bindparams(match=match)) \
+            .limit(RANKED_CANDIDATES) \
+            .subquery()
+        # rank and cut the candidates, then join only the best matches to the products
+        best = db.select(candidates.c.rowid, candidates.c.rank) \
+            .order_by(candidates.c.rank) \
+            .limit(limit) \
+            .subquery()
+        return db.session.query(*columns) \
+            .join(best, best.c.rowid == Product.product_id) \
+            .order_by(best.c.rank)
+
+    query = ' '.join(words)
+    matches = Product.name.ilike(f'{query}%')
+    if dialect != 'postgresql':
+        # other backends have no search index, only name prefixes match
+        return db.session.query(*columns).filter(matches).order_by(Product.name).limit(limit)
+    return db.session.query(*columns) \
+        .filter(db.or_(matches, Product.name.op('%')(query))) \
+        .order_by(db.func.similarity(Product.name, query).desc(), Product.name) \
+        .limit(limit)
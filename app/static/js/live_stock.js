@@ -0,0 +1,33 @@
+// Keep the stock counts of the page up to date from the server-sent stock events instead of
+// reloading. Elements with `data-product-id` and `data-version` hold cells with `data-count`
+// set to an item status, rows added later by "load more" are patched as well.
+(function () {
+    var script = document.currentScript;
+    if (!window.EventSource || !script.dataset.eventsUrl) {
+        return;
+    }
+
+    function patch(product) {
+        var selector = '[data-product-id="' + product.product_id + '"]';
+        document.querySelectorAll(selector).forEach(function (element) {
+            // events may arrive after the page rendered a newer version
+            if (Number(element.dataset.version) >= product.version) {
+                return;
+            }
+            element.dataset.version = product.version;
+            element.querySelectorAll('[data-count]').forEach(function (cell) {
+                cell.textContent = product.counts[cell.dataset.count];
+            });
+        });
+    }
+
+    var source = new EventSource(script.dataset.eventsUrl);
+    source.addEventListener('stock', function (event) {
+        JSON.parse(event.data).products.forEach(patch);
+    });
+    // the server lost events for this page, only a reload shows the right counts again
+    source.addEventListener('reset', function () {
+        source.close();
+        window.location.reload();
+    });
+})();
@@ -0,0 +1,34 @@
+// Append the next page of table rows in place instead of loading the whole next page.
+// The link keeps working without JavaScript, the fragment endpoint returns only the
+// rows and the cursor of the following page in the `X-Next-Cursor` header.
+(function () {
+    var link = document.getElementById('load-more');
+    if (!link) {
+        return;
+    }
+
+    function withCursor(href, cursor) {
+        var url = new URL(href, window.location.href);
+        url.searchParams.set('after', cursor);
+        return url.toString();
+    }
+
+    link.addEventListener('click', function (event) {
+        event.preventDefault();
+        link.classList.add('disabled');
+        fetch(link.dataset.rowsUrl).then(function (response) {
+            var cursor = response.headers.get('X-Next-Cursor');
+            return response.text().then(function (html) {
+                document.getElementById('rows').insertAdjacentHTML('beforeend', html);
+                if (!cursor) {
+                    link.remove();
+                    return;
+                }
+                // move both URLs on to the following page
+                link.href = withCursor(link.href, cursor);
+                link.dataset.rowsUrl = withCursor(link.dataset.rowsUrl, cursor);
+                link.classList.remove('disabled');
+            });
+        });
+    });
+})();
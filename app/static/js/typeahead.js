@@ -0,0 +1,78 @@
+// Product pickers that search the catalog while typing instead of listing every product.
+// A picker is a text input with `data-search-url`, followed by the hidden `product_id`
+// input the form submits and an empty `.list-group` for the matches. Pickers added later,
+// like the cloned lines of the batch form, work too because events are delegated.
+(function () {
+    var DELAY_MS = 150;
+
+    function parts(input) {
+        var picker = input.closest('.product-picker');
+        return {
+            hidden: picker.querySelector('input[type=hidden]'),
+            list: picker.querySelector('.list-group')
+        };
+    }
+
+    function choose(input, product) {
+        var picker = parts(input);
+        picker.hidden.value = product.product_id;
+        input.value = product.name;
+        input.setCustomValidity('');
+        picker.list.innerHTML = '';
+    }
+
+    function render(input, products) {
+        var list = parts(input).list;
+        list.innerHTML = '';
+        products.forEach(function (product) {
+            var button = document.createElement('button');
+            button.type = 'button';
+            button.className = 'list-group-item list-group-item-action';
+            button.textContent = product.name + ' (' + (product.category || '-') + ') - stok ' +
+                product.counts.available;
+            button.addEventListener('click', function () { choose(input, product); });
+            list.appendChild(button);
+        });
+        input._matches = products;
+    }
+
+    function search(input) {
+        var url = new URL(input.dataset.searchUrl, window.location.href);
+        url.searchParams.set('q', input.value);
+        var query = input.value;
+        fetch(url).then(function (response) { return response.json(); }).then(function (body) {
+            // drop answers to text that has been typed over since
+            if (input.value === query) {
+                render(input, body.products);
+            }
+        });
+    }
+
+    document.addEventListener('input', function (event) {
+        var input = event.target;
+        if (!input.dataset || !input.dataset.searchUrl) {
+            return;
+        }
+        // the typed text no longer names the chosen product
+        parts(input).hidden.value = '';
+        input.setCustomValidity('Pilih barang dari daftar.');
+        clearTimeout(input._timer);
+        if (!input.value.trim()) {
+            render(input, []);
+            return;
+        }
+        input._timer = setTimeout(function () { search(input); }, DELAY_MS);
+    });
+
+    document.addEventListener('keydown', function (event) {
+        var input = event.target;
+        if (event.key !== 'Enter' || !input.dataset || !input.dataset.searchUrl) {
+            return;
+        }
+        // Enter picks the best match instead of submitting the form
+        if (input._matches && input._matches.length && !parts(input).hidden.value) {
+            event.preventDefault();
+            choose(input, input._matches[0]);
+        }
+    });
+})();
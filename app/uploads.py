@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+import tempfile
+from flask import current_app, url_for
+from werkzeug.utils import secure_filename
+from PIL import Image
+
+# The extensions Pillow is asked to thumbnail
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+# The relative path `save_receipt` stores a receipt under, `<first two hex digits>/<sha256><extension>`
+RECEIPT_PATH = re.compile(r'([0-9a-f]{2})/\1[0-9a-f]{62}(\.[\w-]+)?')
+
+
+class ReceiptTooLargeError(Exception):
+    """
+    Raised when an uploaded receipt is larger than `RECEIPT_MAX_BYTES`.
+
+    Attributes:
+        max_bytes (int): The size limit in bytes.
+    """
+    def __init__(self, max_bytes:int):
+        self.max_bytes = max_bytes
+        super().__init__(f'Receipt is larger than {max_bytes} bytes')
+
+
+def uploads_dir():
+    '''Returns the directory receipts are stored in.'''
+    return os.path.join(current_app.root_path, 'static', 'uploads')
+
+
+def save_receipt(file_storage):
+    """
+    Stream an uploaded receipt to disk and store it under the SHA-256 of its content,
+    so identical receipts are stored once and different files never overwrite each other.
+    Thumbnails of images are produced by a background job.
+
+    Parameters:
+        file_storage (FileStorage): The uploaded file.
+
+    Returns:
+        str: The static URL of the stored receipt.
+
+    Raises:
+        ReceiptTooLargeError: If the file is larger than `RECEIPT_MAX_BYTES`, nothing is stored.
+    """
+    max_bytes = current_app.config['RECEIPT_MAX_BYTES']
+    chunk_size = current_app.config['RECEIPT_CHUNK_SIZE']
+    extension = os.path.splitext(secure_filename(file_storage.filename))[1].lower()
+    directory = uploads_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    # copy in chunks while hashing, into a temporary file next to the final location
+    digest = hashlib.sha256()
+    size = 0
+    handle, partial_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(handle, 'wb') as partial:
+            for chunk in iter(lambda: file_storage.stream.read(chunk_size), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ReceiptTooLargeError(max_bytes)
+                digest.update(chunk)
+                partial.write(chunk)
+
+        # shard by the first two hex digits to keep directories small
+        name = digest.hexdigest()
+        relative_path = f'{name[:2]}/{name}{extension}'
+        final_path = os.path.join(directory, relative_path)
+        if os.path.exists(final_path):
+            os.remove(partial_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            # mkstemp creates the file readable by its owner only, the web server must serve it
+            os.chmod(partial_path, 0o644)
+            os.replace(partial_path, final_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    if extension in IMAGE_EXTENSIONS and not os.path.exists(thumbnail_path(name)):
+        current_app.extensions['jobs'].submit(
+            'receipt thumbnail', make_thumbnail, args=(final_path, thumbnail_path(name)))
+    return url_for('static', filename=f'uploads/{relative_path}')
+
+
+def is_receipt_url(receipt_url:str):
+    '''Returns whether a URL points to a receipt stored by `save_receipt`, for receipts given by clients as text.'''
+    prefix = url_for('static', filename='uploads/')
+    if not isinstance(receipt_url, str) or not receipt_url.startswith(prefix):
+        return False
+    relative_path = receipt_url[len(prefix):]
+    return RECEIPT_PATH.fullmatch(relative_path) is not None \
+        and os.path.isfile(os.path.join(uploads_dir(), relative_path))
+
+
+def thumbnail_path(name:str):
+    '''Returns the path of the thumbnail of a stored receipt from its content hash.'''
+    return os.path.join(uploads_dir(), 'thumbs', f'{name}.jpg')
+
+
+def make_thumbnail(source_path:str, target_path:str):
+    '''
+    Write a compressed JPEG thumbnail of an image receipt.
+
+    Parameters:
+        source_path (str): The stored receipt.
+        target_path (str): The thumbnail file to write.
+
+    Returns:
+        str: The path of the thumbnail.
+    '''
+    size = current_app.config['RECEIPT_THUMBNAIL_SIZE']
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    partial_path = target_path + '.part'
+    with Image.open(source_path) as image:
+        image.thumbnail((size, size))
+        image.convert('RGB').save(partial_path, 'JPEG', quality=70, optimize=True)
+    os.replace(partial_path, target_path)
+    return target_path
+
+
+def receipt_thumbnail(receipt_url:str):
+    '''
+    Returns the URL of the thumbnail of a receipt, or the receipt URL itself when there is none
+    (receipts uploaded before content hashing, non-images, or a thumbnail still being made).
+    '''
+    if not receipt_url:
+        return receipt_url
+    name = os.path.splitext(os.path.basename(receipt_url))[0]
+    if os.path.exists(thumbnail_path(name)):
+        return url_for('static', filename=f'uploads/thumbs/{name}.jpg')
+    return receipt_url
@@ -0,0 +1,40 @@
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.database import DatabaseManager
+
+
+def warm_up(app):
+    '''
+    Prepare a freshly started worker so its first requests are as fast as the later ones.
+
+    Compiles every template, opens a pooled database connection, primes the category
+    cache and runs the first product page and a search once. A database that is not
+    migrated yet only skips the database steps.
+
+    Parameters:
+        app (Flask): The application to warm up.
+
+    Returns:
+        list: A description of every step that was done.
+    '''
+    done = []
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    done.append('compile templates')
+
+    with app.app_context():
+        try:
+            with db.engine.connect() as connection:
+                connection.execute(db.text('SELECT 1'))
+            done.append('open database connection')
+            DatabaseManager.get_categories()
+            done.append('prime category cache')
+            DatabaseManager.paginate_products(limit=app.config['PRODUCTS_PER_PAGE'])
+            DatabaseManager.search_products('a', app.config['SEARCH_RESULTS_PER_PAGE'])
+            done.append('read first product page and search')
+        except SQLAlchemyError as error:
+            current_app.logger.warning('Skipped warming the database, run `flask migrate` first: %s', error)
+        finally:
+            db.session.remove()
+    return done
@@ -0,0 +1,76 @@
+'''
+Time FIFO and FEFO stock allocation and the expiry sweep on one product with
+millions of items. The allocation walks an index in order and stops after the
+requested quantity, so its time does not depend on how many items the product holds.
+
+Usage:
+    python -m benchmarks.allocation [--items 1000000] [--rounds 20] [--quantity 10]
+'''
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from app import db
+from app.database import DatabaseManager
+from app.models import Item
+from benchmarks.common import make_app, drop_database
+
+
+def fill_product(items:int, seed:int=42, chunk_size:int=50000):
+    '''Create one product with `items` available items, half of them perishable and about 1% already expired.'''
+    rng = random.Random(seed)
+    product = DatabaseManager.add_product('Susu', 'Minuman', 0, 12000, 9000, None, '2024-01-01T08:00')
+    today = datetime.utcnow()
+    insert = Item.__table__.insert()
+    remaining = items
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        rows = []
+        for _ in range(size):
+            entry_date = today - timedelta(seconds=rng.randrange(365 * 86400))
+            expiry_date = None
+            if rng.random() < 0.5:
+                expiry_date = (today + timedelta(days=rng.randrange(-2, 198))).date()
+            rows.append({'product_id': product.product_id, 'status': 'available',
+                         'entry_date': entry_date, 'expiry_date': expiry_date})
+        db.session.execute(insert, rows)
+        remaining -= size
+    db.session.commit()
+    DatabaseManager.reconcile_stock_counts(product.product_id)
+    return product.product_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--quantity', type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        product_id = fill_product(args.items)
+        print(f'{args.items} items created in {time.perf_counter() - start:.1f}s\n')
+
+        exit_date = datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
+        print(f"{'allocation':<12} {'median ms':>10} {'max ms':>8}")
+        for allocation in ('fifo', 'fefo'):
+            app.config['STOCK_ALLOCATION'] = allocation
+            timings = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                DatabaseManager.reduce_item_quantity(product_id, args.quantity, 'sold', exit_date)
+                timings.append(time.perf_counter() - start)
+            print(f'{allocation:<12} {statistics.median(timings) * 1000:>10.2f} {max(timings) * 1000:>8.2f}')
+
+        start = time.perf_counter()
+        swept = DatabaseManager.expire_items()
+        print(f'\nexpiry sweep: {sum(swept.values())} item(s) expired in {time.perf_counter() - start:.2f}s')
+        assert not DatabaseManager.check_stock_counts(product_id)
+    drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+'''
+Measure the hot item queries of one product while its closed history grows, with the
+history left in the live `item` table against moved to `item_archive` by `archive_items`.
+
+Two databases get the same recent stock and the same old sold items at every step, only the
+second one is archived. Reads of recent or available items skip the archive, so their latency
+should stay flat there; the first page of all items shows the cost of merging both tiers.
+
+Usage:
+    python -m benchmarks.archive [--steps 100000 200000 400000 800000] [--rounds 20]
+'''
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from app import db
+from app.database import DatabaseManager
+from app.models import Item
+from benchmarks.common import make_app, drop_database
+
+
+def fill_recent(hot_items:int):
+    '''Create one product with `hot_items` available and `hot_items` sold items from the last month.'''
+    product = DatabaseManager.add_product('Susu', 'Minuman', 0, 12000, 9000, None, '2024-01-01T08:00')
+    now = datetime.utcnow()
+    rows = []
+    for index in range(hot_items * 2):
+        entry_date = now - timedelta(days=30, seconds=-index)
+        sold = index % 2 == 1
+        rows.append({'product_id': product.product_id, 'status': 'sold' if sold else 'available',
+                     'entry_date': entry_date, 'exit_date': entry_date + timedelta(days=1) if sold else None})
+    db.session.execute(Item.__table__.insert(), rows)
+    db.session.commit()
+    return product.product_id
+
+
+def add_history(product_id:int, items:int, chunk_size:int=50000):
+    '''Add `items` items that were sold two years ago.'''
+    start = datetime.utcnow() - timedelta(days=730)
+    remaining = items
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        db.session.execute(Item.__table__.insert(), [
+            {'product_id': product_id, 'status': 'sold', 'entry_date': start + timedelta(seconds=index),
+             'exit_date': start + timedelta(days=1, seconds=index)}
+            for index in range(size)
+        ])
+        remaining -= size
+    db.session.commit()
+    DatabaseManager.reconcile_stock_counts(product_id)
+
+
+def measure(product_id:int, rounds:int):
+    '''Returns the median milliseconds of every hot query.'''
+    recent = (datetime.utcnow() - timedelta(days=60)).strftime('%Y-%m-%d')
+    exit_date = datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
+    queries = {
+        'recent sold page': lambda: DatabaseManager.paginate_items(product_id, 'sold', recent),
+        'available page': lambda: DatabaseManager.paginate_items(product_id, 'available'),
+        'reduce 5': lambda: DatabaseManager.reduce_item_quantity(product_id, 5, 'broken', exit_date),
+        'all items page': lambda: DatabaseManager.paginate_items(product_id),
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        results[name] = statistics.median(timings) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, nargs='+', default=[100000, 200000, 400000, 800000])
+    parser.add_argument('--hot-items', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    apps = {'live': make_app(), 'archived': make_app()}
+    product_ids = {}
+    for name, app in apps.items():
+        with app.app_context():
+            product_ids[name] = fill_recent(args.hot_items)
+
+    print(f"{'history':>8} {'query':<18} {'live ms':>9} {'archived ms':>12}")
+    history = 0
+    for step in args.steps:
+        results = {}
+        for name, app in apps.items():
+            with app.app_context():
+                add_history(product_ids[name], step - history)
+                if name == 'archived':
+                    DatabaseManager.archive_items(older_than_days=365)
+                results[name] = measure(product_ids[name], args.rounds)
+        history = step
+        for query in results['live']:
+            print(f"{step:>8} {query:<18} {results['live'][query]:>9.2f} {results['archived'][query]:>12.2f}")
+
+    for app in apps.values():
+        drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
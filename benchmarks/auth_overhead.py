@@ -0,0 +1,79 @@
+'''
+Measure what authorization adds to a request: the same trivial view is served with and
+without `permission_required`, and the password hash cost is timed per method since it is
+only paid at login.
+
+Usage:
+    python -m benchmarks.auth_overhead [--requests 20000]
+'''
+import argparse
+import time
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.auth import permission_required, load_permissions
+from benchmarks.common import make_app, log_in, drop_database
+
+HASH_METHODS = ['pbkdf2:sha256:50000', 'pbkdf2:sha256:260000', 'pbkdf2:sha256:600000', 'scrypt']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = make_app()
+
+    @app.route('/benchmark/open')
+    def open_view():
+        return ''
+
+    @app.route('/benchmark/protected')
+    @permission_required('reduce_stock')
+    def protected_view():
+        return ''
+
+    client = app.test_client()
+    log_in(app, client, 'Cashier')
+
+    # interleave the views and keep the best round of each to cancel out warmup and noise
+    timings = {'open': float('inf'), 'protected': float('inf')}
+    for _ in range(3):
+        for name in timings:
+            url = f'/benchmark/{name}'
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                assert client.get(url).status_code == 200
+            timings[name] = min(timings[name], (time.perf_counter() - start) / args.requests * 1e6)
+
+    print(f"{'view':<12} {'requests':>9} {'us/request':>11}")
+    for name, microseconds in timings.items():
+        print(f'{name:<12} {args.requests:>9} {microseconds:>11.1f}')
+    print(f"authorization overhead: {timings['protected'] - timings['open']:.1f} us/request")
+
+    # the role lookup and permission check alone, without the rest of the request
+    with app.test_request_context():
+        from flask import session
+        from app.models import User
+        session['user_id'] = User.query.filter_by(role='Cashier').first().user_id
+        session['role'] = 'Cashier'
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            load_permissions()
+            protected_view()
+        print(f'role lookup and permission check alone: {(time.perf_counter() - start) / args.requests * 1e6:.2f} us/request')
+    drop_database(app)
+
+    print(f"\n{'hash method':<24} {'ms/login':>9}")
+    for method in HASH_METHODS:
+        try:
+            password_hash = generate_password_hash('password', method=method)
+        except (ValueError, AttributeError):
+            print(f'{method:<24} {"n/a":>9}')
+            continue
+        start = time.perf_counter()
+        for _ in range(5):
+            check_password_hash(password_hash, 'password')
+        print(f'{method:<24} {(time.perf_counter() - start) / 5 * 1000:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
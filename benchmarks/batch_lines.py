@@ -0,0 +1,81 @@
+'''
+Compare a multi-line transaction sent as one `/product/reduce` (or `/product/add`)
+request per line against one request to the batch endpoints.
+
+Usage:
+    python -m benchmarks.batch_lines [--lines 30] [--rounds 20]
+'''
+import argparse
+import io
+from app.database import DatabaseManager
+from benchmarks.common import make_app, log_in, timer, drop_database
+
+EXIT_DATE = '2024-01-02T08:00'
+ENTRY_DATE = '2024-01-01T08:00'
+
+
+def logged_in_client(app):
+    '''Returns a test client logged in as an Admin Gudang user.'''
+    client = app.test_client()
+    log_in(app, client, 'Admin Gudang')
+    return client
+
+
+def single_reduce(client, product_ids:list):
+    for product_id in product_ids:
+        response = client.post('/product/reduce', data={
+            'product_id': product_id, 'quantity': 1, 'status': 'sold', 'exit_date': EXIT_DATE})
+        assert response.status_code == 302
+
+
+def batch_reduce(client, product_ids:list):
+    lines = [{'product_id': product_id, 'quantity': 1, 'status': 'sold'} for product_id in product_ids]
+    response = client.post('/product/batch/reduce', json={'exit_date': EXIT_DATE, 'lines': lines})
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def single_receive(client, product_ids:list):
+    for product_id in product_ids:
+        response = client.post('/product/add', data={
+            'name': f'product {product_id}', 'category': 'batch', 'quantity': 1,
+            'sell_price': 2, 'buy_price': 1, 'entry_date': ENTRY_DATE,
+            'sales_receipt': (io.BytesIO(b''), '')}, content_type='multipart/form-data')
+        assert response.status_code == 302
+
+
+def batch_receive(client, product_ids:list):
+    lines = [{'name': f'product {product_id}', 'category': 'batch', 'quantity': 1,
+              'sell_price': 2, 'buy_price': 1} for product_id in product_ids]
+    response = client.post('/product/batch/receive', json={'entry_date': ENTRY_DATE, 'lines': lines})
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=30)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        product_ids = [
+            DatabaseManager.add_product_bulk(f'product {index}', 'batch', args.rounds * 2, 2, 1, None, ENTRY_DATE)[0].product_id
+            for index in range(args.lines)
+        ]
+    client = logged_in_client(app)
+
+    results = {}
+    for name, operation in (('single reduce', single_reduce), ('batch reduce', batch_reduce),
+                            ('single receive', single_receive), ('batch receive', batch_receive)):
+        with timer(results, name):
+            for _ in range(args.rounds):
+                operation(client, product_ids)
+    drop_database(app)
+
+    print(f"{'operation':<16} {'ms/line':>9}")
+    for name, seconds in results.items():
+        print(f'{name:<16} {seconds * 1000 / (args.lines * args.rounds):>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
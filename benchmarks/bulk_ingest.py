@@ -0,0 +1,53 @@
+'''
+Compare receiving stock through one ORM `Item` per unit against the chunked
+executemany path of `DatabaseManager.add_product_bulk`.
+
+Usage:
+    python -m benchmarks.bulk_ingest [--sizes 1000 10000 100000]
+'''
+import argparse
+from datetime import datetime
+from app import db
+from app.database import DatabaseManager
+from app.models import Product, Item
+from benchmarks.common import make_app, timer, drop_database
+
+
+def orm_ingest(quantity:int):
+    '''The original ingest path: one ORM object per unit flushed through the session.'''
+    product = Product(name='orm', category='bench', sell_price=2, buy_price=1)
+    db.session.add(product)
+    db.session.commit()
+    entry_date = datetime.strptime('2024-01-01T08:00', '%Y-%m-%dT%H:%M')
+    for _ in range(quantity):
+        db.session.add(Item(product_id=product.product_id, status='available',
+                            sales_receipt=None, entry_date=entry_date))
+    db.session.commit()
+
+
+def bulk_ingest(quantity:int):
+    '''The chunked Core insert path.'''
+    DatabaseManager.add_product_bulk('bulk', 'bench', quantity, 2, 1, None, '2024-01-01T08:00')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'units':>8} {'orm s':>9} {'bulk s':>9} {'orm u/s':>10} {'bulk u/s':>10} {'speedup':>8}")
+    for size in args.sizes:
+        results = {}
+        for name, ingest in (('orm', orm_ingest), ('bulk', bulk_ingest)):
+            # every run starts from an empty database so they do not affect each other
+            app = make_app()
+            with app.app_context(), timer(results, name):
+                ingest(size)
+            drop_database(app)
+        print(f"{size:>8} {results['orm']:>9.3f} {results['bulk']:>9.3f} "
+              f"{size / results['orm']:>10.0f} {size / results['bulk']:>10.0f} "
+              f"{results['orm'] / results['bulk']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from app import create_app, db
+from app.migrations import upgrade_schema
+from config import Config
+
+
+def make_app(database_path:str=None, database_uri:str=None, **config):
+    '''
+    Create an application bound to a throwaway SQLite database for benchmarking.
+
+    Parameters:
+        database_path (str): The SQLite file to use (optional, defaults to a new temporary file).
+        database_uri (str): Use this database instead of SQLite (optional), it is never dropped.
+        **config: Extra configuration values overriding `Config`.
+
+    Returns:
+        Flask: The application with an up to date schema.
+    '''
+    if database_path is None and database_uri is None:
+        handle, database_path = tempfile.mkstemp(prefix='inventory-bench-', suffix='.db')
+        os.close(handle)
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri or f'sqlite:///{database_path}'
+    for key, value in config.items():
+        setattr(BenchmarkConfig, key, value)
+
+    app = create_app(BenchmarkConfig)
+    app.config['BENCHMARK_DATABASE_PATH'] = database_path
+    with app.app_context():
+        upgrade_schema()
+    return app
+
+
+@contextmanager
+def timer(results:dict, key:str):
+    '''Store the wall time in seconds of the wrapped block in `results[key]`.'''
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def log_in(app, client, role:str):
+    '''Put a user with a role in the session of a test client, creating one if the database has none.'''
+    from app.database import DatabaseManager
+    from app.models import User
+    with app.app_context():
+        user = User.query.filter_by(role=role).first() \
+            or DatabaseManager.save_user(f"benchmark-{role.lower().replace(' ', '-')}", 'benchmark', role)
+        user_id = user.user_id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = role
+
+
+def drop_database(app):
+    '''Dispose the engine of a benchmark app and delete its SQLite file, if it has one.'''
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    database_path = app.config['BENCHMARK_DATABASE_PATH']
+    if database_path is None:
+        return
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(database_path + suffix):
+            os.remove(database_path + suffix)
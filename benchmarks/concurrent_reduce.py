@@ -0,0 +1,78 @@
+'''
+Run parallel reducers against one product and verify that no item is claimed
+twice by `DatabaseManager.reduce_item_quantity`.
+
+Every reducer writes its own name as the purchase receipt and counts the units
+it reduced. At the end the number of items carrying each receipt must equal
+what that reducer reported, and all units must be sold exactly once.
+
+Usage:
+    python -m benchmarks.concurrent_reduce [--units 2000] [--reducers 8] [--batch 3]
+'''
+import argparse
+import threading
+from app import db
+from app.database import DatabaseManager, InsufficientStockError
+from app.models import Item
+from benchmarks.common import make_app, timer, drop_database
+
+
+def reducer(app, product_id:int, batch:int, name:str, claimed:dict):
+    '''Reduce `batch` units at a time until the product runs out of stock.'''
+    total = 0
+    with app.app_context():
+        while True:
+            try:
+                total += DatabaseManager.reduce_item_quantity(
+                    product_id, batch, 'sold', '2024-01-02T08:00', name)
+            except InsufficientStockError as error:
+                # take whatever is left, then stop
+                if error.available == 0:
+                    break
+                batch = error.available
+        db.session.remove()
+    claimed[name] = total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--units', type=int, default=2000)
+    parser.add_argument('--reducers', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        product, _, _ = DatabaseManager.add_product_bulk(
+            'contended', 'bench', args.units, 2, 1, None, '2024-01-01T08:00')
+        product_id = product.product_id
+
+    claimed, results = {}, {}
+    threads = [
+        threading.Thread(target=reducer, args=(app, product_id, args.batch, f'reducer-{index}', claimed))
+        for index in range(args.reducers)
+    ]
+    with timer(results, 'reduce'):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    with app.app_context():
+        stored = dict(db.session.query(Item.purchase_receipt, db.func.count(Item.item_id))
+                      .filter(Item.product_id == product_id, Item.status == 'sold')
+                      .group_by(Item.purchase_receipt).all())
+        mismatches = DatabaseManager.check_stock_counts(product_id)
+    drop_database(app)
+
+    print(f"{args.reducers} reducers sold {sum(claimed.values())}/{args.units} units "
+          f"in {results['reduce']:.3f}s")
+    assert sum(claimed.values()) == args.units, 'not every unit was sold'
+    assert stored == {name: count for name, count in claimed.items() if count}, \
+        f'double-sold items: reducers reported {claimed}, item table has {stored}'
+    assert not mismatches, f'stock counters out of sync: {mismatches}'
+    print('OK: no item was claimed twice and the stock counters are consistent.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+'''
+Load test the database settings: concurrent `/products` readers against
+`/product/reduce` writers for a fixed time, once per setting.
+
+The SQLite settings compare the rollback journal with `synchronous=FULL` to
+WAL with `synchronous=NORMAL`. Pass `--database-url` to also measure another
+backend such as PostgreSQL; that database must be empty, it is not dropped.
+
+Usage:
+    python -m benchmarks.db_load [--readers 8] [--writers 2] [--seconds 5] [--database-url URL]
+'''
+import argparse
+import threading
+import time
+from app.database import DatabaseManager
+from benchmarks.common import make_app, log_in, drop_database
+
+SETTINGS = {
+    'sqlite-journal': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'sqlite-wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+}
+
+
+def reader(app, stop:threading.Event, counts:list):
+    '''Request the products page until stopped.'''
+    client = app.test_client()
+    log_in(app, client, 'Cashier')
+    while not stop.is_set():
+        assert client.get('/products').status_code == 200
+        counts.append(1)
+
+
+def writer(app, product_id:int, stop:threading.Event, counts:list):
+    '''Reduce one unit at a time until stopped.'''
+    client = app.test_client()
+    log_in(app, client, 'Cashier')
+    form = {'product_id': product_id, 'quantity': 1, 'status': 'sold', 'exit_date': '2024-01-02T08:00'}
+    while not stop.is_set():
+        assert client.post('/product/reduce', data=form).status_code == 302
+        counts.append(1)
+
+
+def run(app, readers:int, writers:int, seconds:float):
+    '''Run the readers and writers against an app, returning their operations per second.'''
+    with app.app_context():
+        for index in range(20):
+            DatabaseManager.add_product_bulk(f'product {index}', 'load', 100, 2, 1, None, '2024-01-01T08:00')
+        product, _, _ = DatabaseManager.add_product_bulk('reduced', 'load', 1000000, 2, 1, None, '2024-01-01T08:00')
+        product_id = product.product_id
+
+    stop = threading.Event()
+    reads, writes = [], []
+    threads = [threading.Thread(target=reader, args=(app, stop, reads)) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(app, product_id, stop, writes)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return len(reads) / seconds, len(writes) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    settings = {name: make_app(**config) for name, config in SETTINGS.items()}
+    if args.database_url:
+        settings['database-url'] = make_app(database_uri=args.database_url)
+
+    print(f"{'setting':<16} {'reads/s':>9} {'writes/s':>9}")
+    for name, app in settings.items():
+        reads, writes = run(app, args.readers, args.writers, args.seconds)
+        print(f'{name:<16} {reads:>9.1f} {writes:>9.1f}')
+        drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
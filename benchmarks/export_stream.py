@@ -0,0 +1,44 @@
+'''
+Measure the Python memory peak of the streaming CSV export at growing item counts.
+With streaming the peak stays flat instead of growing with the number of rows.
+
+Usage:
+    python -m benchmarks.export_stream [--sizes 10000 100000 500000] [--gzip]
+'''
+import argparse
+import time
+import tracemalloc
+from app.database import DatabaseManager
+from benchmarks.common import make_app, log_in, drop_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--gzip', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'items':>10} {'bytes':>12} {'seconds':>8} {'peak MB':>8}")
+    for size in args.sizes:
+        app = make_app()
+        with app.app_context():
+            product = DatabaseManager.add_product('Export', 'Benchmark', size, 2, 1, None, '2024-01-01T08:00')
+            product_id = product.product_id
+        client = app.test_client()
+        log_in(app, client, 'Super Admin')
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(f'/products/{product_id}/items.csv?gzip={int(args.gzip)}', buffered=False)
+        written = sum(len(chunk) for chunk in response.response)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        response.close()
+
+        print(f'{size:>10} {written:>12} {elapsed:>8.2f} {peak / 1024 / 1024:>8.1f}')
+        drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
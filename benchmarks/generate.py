@@ -0,0 +1,104 @@
+'''
+Seeded generator of realistic synthetic inventories.
+
+Products get a category, prices and a number of items drawn from a skewed
+distribution, items get mixed statuses with entry dates over the last year and
+exit dates after them. Rows are written with chunked Core inserts, then the
+stock counters, the movement rollup and the product search index are rebuilt from them.
+
+Usage:
+    python -m benchmarks.generate --size small --output /tmp/inventory-small.db [--seed 42]
+'''
+import argparse
+import random
+from datetime import datetime, timedelta
+from app import db
+from app.database import DatabaseManager
+from app.models import Product, Item
+from benchmarks.common import make_app
+
+# (products, items) per named size
+SIZES = {
+    'tiny': (20, 1000),
+    'small': (100, 10000),
+    'medium': (1000, 1000000),
+    'large': (10000, 10000000),
+}
+
+CATEGORIES = ['Minuman', 'Makanan', 'Snack', 'Sabun', 'Alat Tulis', 'Bumbu', 'Obat', 'Elektronik']
+# share of items per status
+STATUS_WEIGHTS = {'available': 60, 'sold': 30, 'expire': 5, 'broken': 5}
+
+
+def generate_inventory(products:int, items:int, seed:int=42, days:int=365, chunk_size:int=50000, now:datetime=None):
+    '''
+    Fill the database of the current app with a synthetic inventory.
+
+    Parameters:
+        products (int): The number of products.
+        items (int): The total number of items, spread unevenly over the products.
+        seed (int): The random seed, the same seed always produces the same inventory.
+        days (int): How far back entry dates go.
+        chunk_size (int): The number of item rows per INSERT.
+        now (datetime): The newest possible date (optional, defaults to now).
+    '''
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+
+    product_rows = []
+    for index in range(products):
+        buy_price = rng.randrange(1000, 100000, 500)
+        product_rows.append({
+            'name': f'Produk {index + 1:05d}',
+            'category': rng.choice(CATEGORIES),
+            'buy_price': float(buy_price),
+            'sell_price': float(buy_price + rng.randrange(500, 50000, 500)),
+        })
+    db.session.execute(Product.__table__.insert(), product_rows)
+    product_ids = [product_id for product_id, in db.session.query(Product.product_id).order_by(Product.product_id)]
+
+    # a few products hold most of the items, like a real catalog
+    weights = [rng.paretovariate(1.2) for _ in product_ids]
+    statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+    insert = Item.__table__.insert()
+    remaining = items
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        chosen_products = rng.choices(product_ids, weights=weights, k=size)
+        chosen_statuses = rng.choices(statuses, weights=status_weights, k=size)
+        rows = []
+        for product_id, status in zip(chosen_products, chosen_statuses):
+            entry_date = now - timedelta(seconds=rng.randrange(days * 86400))
+            exit_date = None
+            if status != 'available':
+                exit_date = entry_date + timedelta(seconds=rng.randrange(int((now - entry_date).total_seconds()) + 1))
+            rows.append({
+                'product_id': product_id, 'status': status,
+                'entry_date': entry_date, 'exit_date': exit_date,
+                'sales_receipt': None, 'purchase_receipt': None,
+            })
+        db.session.execute(insert, rows)
+        remaining -= size
+    db.session.commit()
+
+    DatabaseManager.reconcile_stock_counts()
+    DatabaseManager.rebuild_stock_movements()
+    DatabaseManager.rebuild_product_search()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--output', required=True, help='The SQLite file to create.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    products, items = SIZES[args.size]
+    app = make_app(args.output)
+    with app.app_context():
+        generate_inventory(products, items, args.seed)
+    print(f'Generated {products} products and {items} items in {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+'''
+Show that one stock write reaches every page subscribed to the stock event stream, and
+compare the traffic with pages that poll `/products` to stay fresh.
+
+The application is served over HTTP in this process with the local event broker, many
+clients open `/api/v1/stock/events`, then items of one product are reduced a few times.
+Every reduction must arrive at every client as one `stock` event with the new counters.
+
+Usage:
+    python -m benchmarks.live_stock [--subscribers 200] [--writes 5] [--poll-seconds 10]
+'''
+import argparse
+import http.client
+import json
+import logging
+import statistics
+import threading
+import time
+from collections import defaultdict
+from werkzeug.serving import make_server
+from app.database import DatabaseManager
+from app.models import Product
+from benchmarks.common import make_app, log_in, drop_database
+from benchmarks.generate import generate_inventory
+
+
+def login(port:int):
+    '''Log in as the default cashier and return the session cookie.'''
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('POST', '/login', 'username=cashier&password=cashier',
+                       {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def subscribe(port:int, cookie:str, received:dict, lock:threading.Lock, connections:list):
+    '''Read the stock events of one client, recording when every product version arrived.'''
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connections.append(connection)
+    connection.request('GET', '/api/v1/stock/events', headers={'Cookie': cookie})
+    response = connection.getresponse()
+    try:
+        event = None
+        for line in iter(response.readline, b''):
+            line = line.decode().rstrip('\n')
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: ') and event == 'stock':
+                arrived = time.perf_counter()
+                for product in json.loads(line[len('data: '):])['products']:
+                    with lock:
+                        received[product['version']].append((arrived, product['counts']['available']))
+    except (OSError, ValueError):
+        # the connection was closed at the end of the run
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--writes', type=int, default=5)
+    parser.add_argument('--poll-seconds', type=float, default=10,
+                        help='How often a polling page would reload /products instead.')
+    args = parser.parse_args()
+
+    app = make_app(EVENTS_MAX_SUBSCRIBERS=args.subscribers, EVENTS_KEEPALIVE=1)
+    with app.app_context():
+        generate_inventory(200, 2000)
+        product_id = Product.query.order_by(Product.available_count.desc()).first().product_id
+    client = app.test_client()
+    log_in(app, client, 'Cashier')
+    page_bytes = len(client.get('/products').data)
+
+    # one access log line per stream would drown the results
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    cookie = login(server.port)
+    received, lock, connections = defaultdict(list), threading.Lock(), []
+    for _ in range(args.subscribers):
+        threading.Thread(target=subscribe, args=(server.port, cookie, received, lock, connections),
+                         daemon=True).start()
+    broker = app.extensions['stock_events']
+    while broker.subscriber_count() < args.subscribers:
+        time.sleep(0.05)
+    print(f'{args.subscribers} subscribers connected\n')
+
+    print(f"{'write':>5} {'delivered':>10} {'median ms':>10} {'max ms':>8} {'event bytes':>12}")
+    for write in range(1, args.writes + 1):
+        with app.app_context():
+            start = time.perf_counter()
+            DatabaseManager.reduce_item_quantity(product_id, 1, 'sold', '2024-06-01T08:00')
+            product = DatabaseManager.get_product_row(product_id)
+        version, available = product.version, product.available_count
+        deadline = time.monotonic() + 10
+        while len(received[version]) < args.subscribers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        deliveries = received[version]
+        assert len(deliveries) == args.subscribers, f'only {len(deliveries)} subscribers got write {write}'
+        assert all(count == available for _, count in deliveries), 'a subscriber got stale counters'
+        latencies = [(arrived - start) * 1000 for arrived, _ in deliveries]
+        event_bytes = len(broker._history[-1][1])
+        print(f'{write:>5} {len(deliveries):>10} {statistics.median(latencies):>10.2f} '
+              f'{max(latencies):>8.2f} {event_bytes:>12}')
+
+    # what the same pages cost when they reload the product list instead
+    polls = args.subscribers * 60 / args.poll_seconds
+    print(f'\npolling every {args.poll_seconds:g}s: {polls:.0f} requests/min, '
+          f'{polls * page_bytes / 1024 / 1024:.1f} MiB/min of /products pages ({page_bytes / 1024:.1f} KiB each)')
+    print(f'event stream: 1 event per write, {event_bytes * args.subscribers / 1024:.1f} KiB per write '
+          f'to all subscribers, keepalives aside')
+
+    for connection in connections:
+        connection.close()
+    server.shutdown()
+    drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+'''
+Compare the database size and query times of one row per unit against lots.
+
+The inventory is received and partly sold in per-unit mode, measured, collapsed
+into lots with `collapse_items` the way `flask collapse-items` does, and measured
+again. Every delivery and every reduction becomes a single lot, so the item table
+shrinks from one row per unit to a few rows per delivery.
+
+Usage:
+    python -m benchmarks.lots [--products 50] [--deliveries 20] [--quantity 500] [--rounds 10]
+'''
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from app import db
+from app.database import DatabaseManager
+from app.models import Item
+from benchmarks.common import make_app, drop_database
+
+
+def fill_inventory(products:int, deliveries:int, quantity:int, seed:int=42):
+    '''Receive `deliveries` deliveries of `quantity` units per product and sell about half of them in batches.'''
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 8, 0)
+    product_ids = []
+    for number in range(products):
+        for delivery in range(deliveries):
+            entry_date = start + timedelta(days=delivery * 7, minutes=number)
+            product, _, _ = DatabaseManager.add_product_bulk(
+                f'Produk {number}', 'Benchmark', quantity, 12000, 9000, f'receipt-{number}-{delivery}',
+                entry_date.strftime('%Y-%m-%dT%H:%M'))
+        product_ids.append(product.product_id)
+
+    for product_id in product_ids:
+        for sale in range(deliveries * 2):
+            exit_date = start + timedelta(days=sale * 3 + 1, minutes=rng.randrange(600))
+            DatabaseManager.reduce_item_quantity(
+                product_id, rng.randrange(1, quantity // 2), 'sold', exit_date.strftime('%Y-%m-%dT%H:%M'),
+                f'sale-{product_id}-{sale}')
+    return product_ids
+
+
+def database_size():
+    '''Returns the size in bytes of the SQLite file after a VACUUM.'''
+    db.session.commit()
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql('VACUUM')
+        # in WAL mode the vacuumed pages only reach the file with a checkpoint
+        connection.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(db.engine.url.database)
+
+
+def median_ms(function, rounds:int):
+    '''Returns the median wall time in milliseconds of calling `function` `rounds` times.'''
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def measure(product_ids:list, rounds:int):
+    '''Measure the item rows, database size and the hot item queries.'''
+    product_id = product_ids[len(product_ids) // 2]
+    start_date, end_date = datetime(2024, 1, 1), datetime(2025, 1, 1)
+    results = {
+        'item rows': db.session.query(db.func.count(Item.item_id)).scalar(),
+        'database MB': database_size() / 1024 / 1024,
+        'items page ms': median_ms(lambda: DatabaseManager.paginate_items(product_id, 'sold'), rounds),
+        'items export ms': median_ms(lambda: sum(1 for _ in DatabaseManager.iter_items(product_id)), rounds),
+        'report ms': median_ms(
+            lambda: sum(1 for _ in DatabaseManager.iter_report_rows(start_date, end_date)), max(1, rounds // 5)),
+        'count by status ms': median_ms(DatabaseManager._count_items_by_status, max(1, rounds // 5)),
+    }
+    exit_date = datetime(2025, 1, 1).strftime('%Y-%m-%dT%H:%M')
+    results['reduce ms'] = median_ms(
+        lambda: DatabaseManager.reduce_item_quantity(product_id, 25, 'broken', exit_date), rounds)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--deliveries', type=int, default=20)
+    parser.add_argument('--quantity', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        product_ids = fill_inventory(args.products, args.deliveries, args.quantity)
+        print(f'inventory created in {time.perf_counter() - start:.1f}s\n')
+        before = measure(product_ids, args.rounds)
+        counts = DatabaseManager._count_items_by_status()
+
+        app.config['STOCK_LOTS'] = True
+        start = time.perf_counter()
+        rows_before, rows_after = DatabaseManager.collapse_items()
+        print(f'collapsed {rows_before} rows into {rows_after} lots in {time.perf_counter() - start:.1f}s\n')
+        assert DatabaseManager._count_items_by_status() == counts
+        after = measure(product_ids, args.rounds)
+        assert not DatabaseManager.check_stock_counts()
+
+    print(f"{'':<20} {'per unit':>12} {'lots':>12}")
+    for key in before:
+        print(f'{key:<20} {before[key]:>12.1f} {after[key]:>12.1f}')
+    drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+'''
+Time the product search typeahead on a large catalog, one request per prefix
+typed so far, against the size of the reduce form that no longer lists every product.
+
+Usage:
+    python -m benchmarks.search [--products 50000] [--rounds 20]
+'''
+import argparse
+import statistics
+import time
+from benchmarks.common import make_app, log_in, drop_database
+from benchmarks.generate import generate_inventory
+
+# what a cashier types, one request per keystroke from the second letter on
+QUERIES = ['produk 01234', 'minuman', 'sabun produk 009']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        generate_inventory(args.products, args.products)
+        print(f'{args.products} products created in {time.perf_counter() - start:.1f}s\n')
+
+    client = app.test_client()
+    log_in(app, client, 'Cashier')
+    print(f'reduce form: {len(client.get("/product/reduce").data) / 1024:.1f} KiB\n')
+
+    print(f"{'query':<20} {'median ms':>10} {'max ms':>8} {'matches':>8}")
+    for query in QUERIES:
+        timings, matches = [], 0
+        for length in range(2, len(query) + 1):
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                response = client.get('/api/v1/products/search', query_string={'q': query[:length]})
+                timings.append(time.perf_counter() - start)
+            matches = len(response.get_json()['products'])
+        print(f'{query:<20} {statistics.median(timings) * 1000:>10.2f} {max(timings) * 1000:>8.2f} {matches:>8}')
+    drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
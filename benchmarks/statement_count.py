@@ -0,0 +1,96 @@
+'''
+Check that the pages run a constant number of SQL statements whatever the catalog size,
+and load no ORM instances for their lists. Exits with an error when a count grows.
+
+Usage:
+    python -m benchmarks.statement_count [--sizes 10 100 1000]
+'''
+import argparse
+import sys
+from collections import Counter
+from sqlalchemy import event
+from app import db
+from app.models import Product
+from benchmarks.common import make_app, log_in, drop_database
+from benchmarks.generate import generate_inventory
+
+PAGES = [
+    '/products?per_page=500',
+    '/products/rows?per_page=500',
+    '/products/{product_id}',
+    '/products/{product_id}/rows',
+    '/products/{product_id}?status=available&start_date=2000-01-01',
+    '/api/v1/products?per_page=500',
+    '/api/v1/products/{product_id}',
+    '/api/v1/products/{product_id}/items',
+    '/api/v1/products/search?q=produk',
+    '/products/{product_id}/items.csv',
+    '/products/report.csv',
+    '/dashboard',
+]
+
+
+def count_statements(sizes:list):
+    '''Returns `{page: {size: (statements, instances)}}` measured on a fresh inventory of every size.'''
+    counts = {page: {} for page in PAGES}
+    for size in sizes:
+        app = make_app()
+        with app.app_context():
+            generate_inventory(size, size * 20, seed=size)
+            product_id = Product.query.order_by(Product.available_count.desc()).first().product_id
+
+        client = app.test_client()
+        log_in(app, client, 'Super Admin')
+
+        counter = Counter()
+        def statement(*args):
+            counter['statements'] += 1
+        def instance(*args):
+            counter['instances'] += 1
+
+        with app.app_context():
+            engine = db.engine
+        for page in PAGES:
+            url = page.format(product_id=product_id)
+            # warm the caches first, a cold cache adds its one-off queries
+            response = client.get(url)
+            assert response.status_code == 200, url
+            response.close()
+            counter.clear()
+            event.listen(engine, 'before_cursor_execute', statement)
+            event.listen(db.Model, 'load', instance, propagate=True)
+            try:
+                # read the whole body, the CSV exports query while they stream
+                response = client.get(url)
+                response.get_data()
+                response.close()
+            finally:
+                event.remove(engine, 'before_cursor_execute', statement)
+                event.remove(db.Model, 'load', instance)
+            counts[page][size] = (counter['statements'], counter['instances'])
+
+        drop_database(app)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Catalog sizes in products, each with 20 items per product.')
+    args = parser.parse_args()
+
+    counts = count_statements(args.sizes)
+    failures = 0
+    print(f"{'page':<64} " + ' '.join(f'{size:>10}' for size in args.sizes))
+    for page, per_size in counts.items():
+        constant = len({statements for statements, _ in per_size.values()}) == 1
+        failures += not constant
+        cells = ' '.join(f'{statements:>5}/{instances:<4}' for statements, instances in per_size.values())
+        print(f"{page:<64} {cells}{'' if constant else '  <- grows'}")
+    print('\n(SQL statements / ORM instances loaded per request)')
+    if failures:
+        sys.exit(f'{failures} page(s) run more statements on a larger catalog.')
+
+
+if __name__ == '__main__':
+    main()
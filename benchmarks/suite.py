@@ -0,0 +1,148 @@
+'''
+Benchmark suite of the main pages and write paths, run through the Flask test
+client against a generated inventory. Results are written as JSON so runs of
+different commits can be compared with `--compare`.
+
+Usage:
+    python -m benchmarks.suite [--size small] [--database PATH] [--rounds 20]
+                               [--output results.json] [--compare previous.json]
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from app.models import Product
+from benchmarks.common import make_app, log_in, drop_database
+from benchmarks.generate import SIZES, generate_inventory
+
+
+def scenarios(client, product_id:int, category:str):
+    '''Returns the benchmarked operations as name -> callable, each asserting its response.'''
+    def get(url, status=200):
+        def run():
+            response = client.get(url)
+            assert response.status_code == status, f'{url}: {response.status_code}'
+        return run
+
+    def report():
+        response = client.post('/products/report')
+        status_url = response.location + '/status'
+        while client.get(status_url).json['status'] not in ('done', 'failed'):
+            time.sleep(0.01)
+
+    def add_product():
+        response = client.post('/product/add', data={
+            'name': 'Benchmark', 'category': category, 'quantity': 10, 'sell_price': 2,
+            'buy_price': 1, 'entry_date': '2024-01-01T08:00', 'sales_receipt': (open(os.devnull, 'rb'), '')},
+            content_type='multipart/form-data')
+        assert response.status_code == 302
+
+    def reduce_item_quantity():
+        response = client.post('/product/reduce', data={
+            'product_id': product_id, 'quantity': 1, 'status': 'sold', 'exit_date': '2024-01-02T08:00'})
+        assert response.status_code == 302
+
+    return {
+        'products': get('/products'),
+        'products_category': get(f'/products?category={category}'),
+        'items': get(f'/products/{product_id}'),
+        'items_filtered': get(f'/products/{product_id}?status=available&start_date=2000-01-01&end_date=2100-01-01'),
+        'report': report,
+        'dashboard': get('/dashboard'),
+        'add_product': add_product,
+        'reduce_item_quantity': reduce_item_quantity,
+    }
+
+
+def measure(operation, rounds:int, warmup:int=2):
+    '''Time an operation over a number of rounds, after warmup rounds, returning summary statistics in seconds.'''
+    for _ in range(warmup):
+        operation()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    return {
+        'rounds': rounds,
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.mean(timings),
+        'median': statistics.median(timings),
+        'stddev': statistics.stdev(timings) if rounds > 1 else 0.0,
+    }
+
+
+def git_commit():
+    '''Returns the current git commit, or None outside a repository.'''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results:dict, previous:dict):
+    '''Print the median of every benchmark against a previous run.'''
+    print(f"\n{'benchmark':<22} {'previous':>10} {'current':>10} {'change':>8}")
+    for name, current in results['benchmarks'].items():
+        before = previous['benchmarks'].get(name)
+        if before:
+            change = (current['median'] - before['median']) / before['median'] * 100
+            print(f"{name:<22} {before['median'] * 1000:>9.2f}m {current['median'] * 1000:>9.2f}m {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--database', help='Reuse an inventory made by benchmarks.generate instead of generating one.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='A previous results file to compare against.')
+    args = parser.parse_args()
+
+    # the report scenario writes a PDF per round, keep them out of app/static/reports
+    reports = tempfile.TemporaryDirectory(prefix='inventory-bench-reports-')
+    app = make_app(args.database, REPORTS_DIR=reports.name)
+    with app.app_context():
+        if not args.database:
+            generate_inventory(*SIZES[args.size], seed=args.seed)
+        # benchmark the product with the most available stock
+        product = Product.query.order_by(Product.available_count.desc()).first()
+        product_id, category = product.product_id, product.category
+
+    client = app.test_client()
+    log_in(app, client, 'Super Admin')
+
+    results = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'size': os.path.basename(args.database) if args.database else args.size,
+        'benchmarks': {},
+    }
+    print(f"{'benchmark':<22} {'median ms':>10} {'mean ms':>10} {'max ms':>10}")
+    for name, operation in scenarios(client, product_id, category).items():
+        stats = measure(operation, args.rounds)
+        results['benchmarks'][name] = stats
+        print(f"{name:<22} {stats['median'] * 1000:>10.2f} {stats['mean'] * 1000:>10.2f} {stats['max'] * 1000:>10.2f}")
+
+    if not args.database:
+        drop_database(app)
+    reports.cleanup()
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+'''
+Load test the production server with a growing number of gunicorn workers on one machine.
+Each run starts `gunicorn -c gunicorn.conf.py wsgi:app` against the same generated
+inventory and lets concurrent clients request the products and items pages for a fixed time.
+
+Usage:
+    python -m benchmarks.worker_scaling [--workers 1 2 4] [--clients 16] [--seconds 10] [--size small]
+'''
+import argparse
+import http.cookiejar
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from app.models import Product
+from benchmarks.common import make_app, drop_database
+from benchmarks.generate import SIZES, generate_inventory
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(database_path:str, workers:int, port:int):
+    '''Start gunicorn with `workers` processes and wait until it answers.'''
+    environment = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}', PORT=str(port),
+                       HOST='127.0.0.1', WEB_CONCURRENCY=str(workers), GUNICORN_ACCESS_LOG='')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                              cwd=ROOT, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('gunicorn did not start, is it installed?')
+
+
+def client(base_url:str, product_id:int, stop:threading.Event, counts:list):
+    '''Log in as a cashier, then request the products and items pages until stopped.'''
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    opener.open(f'{base_url}/login', data=b'username=cashier&password=cashier').read()
+    urls = [f'{base_url}/products', f'{base_url}/products/{product_id}']
+    while not stop.is_set():
+        for url in urls:
+            opener.open(url).read()
+            counts.append(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        generate_inventory(*SIZES[args.size])
+        product_id = Product.query.order_by(Product.available_count.desc()).first().product_id
+    database_path = app.config['BENCHMARK_DATABASE_PATH']
+
+    print(f'{os.cpu_count()} core(s), {args.clients} clients, {args.seconds:g}s per run')
+    print(f"{'workers':>8} {'requests':>9} {'req/s':>8} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        server = start_server(database_path, workers, args.port)
+        try:
+            stop, counts = threading.Event(), []
+            threads = [threading.Thread(target=client, args=(f'http://127.0.0.1:{args.port}', product_id, stop, counts))
+                       for _ in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            time.sleep(args.seconds)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            throughput = len(counts) / (time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait()
+        baseline = baseline or throughput
+        print(f'{workers:>8} {len(counts):>9} {throughput:>8.1f} {throughput / baseline:>7.2f}x')
+
+    drop_database(app)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,100 @@ class Config:
     
     Attributes:
         SECRET_KEY (str): The secret key for the application, defaults to 'your-secret-key' if not provided in the environment.
-        SQLALCHEMY_DATABASE_URI (str): The URI for the SQLite database.
+        PASSWORD_HASH_METHOD (str): The werkzeug password hash method and cost, e.g. `pbkdf2:sha256:260000`.
+        SQLALCHEMY_DATABASE_URI (str): The URI of the database, taken from `DATABASE_URL` and defaulting to SQLite.
         SQLALCHEMY_TRACK_MODIFICATIONS (bool): Indicates whether to track modifications in SQLAlchemy.
+        ITEM_INSERT_CHUNK_SIZE (int): The number of item rows sent per bulk INSERT when receiving stock.
+        SERVER_THREADS (int): The number of request threads of each gunicorn worker or of waitress.
+        JOB_WORKERS (int): The number of threads running background jobs such as reports.
+        REPORTS_DIR (str): The directory report PDFs are written to, defaults to `app/static/reports`.
+        REPORT_MAX_AGE (int): The seconds a generated report PDF is kept before it is deleted.
+        PRODUCTS_PER_PAGE (int): The default number of products per page.
+        ITEMS_PER_PAGE (int): The default number of items per page.
+        SEARCH_RESULTS_PER_PAGE (int): The default number of products returned by the product search.
+        MAX_PAGE_SIZE (int): The largest page size a client may request with `per_page`.
+        DASHBOARD_DAYS (int): The default number of days of movements summarised on the dashboard.
+        EXPORT_CHUNK_SIZE (int): The number of rows fetched and encoded at a time by the CSV exports.
+        STOCK_ALLOCATION (str): `fifo` reduces the oldest items first, `fefo` the items expiring first.
+        EXPIRY_SWEEP_BATCH_SIZE (int): The number of items marked expired per transaction by the expiry sweep.
+        ARCHIVE_AFTER_DAYS (int): The age in days of the exit date after which closed items are archived.
+        ARCHIVE_BATCH_SIZE (int): The number of items moved to the archive per transaction.
+        STOCK_LOTS (bool): Store received stock as one lot row per delivery instead of one row per unit.
+        DB_POOL_SIZE (int): The number of connections kept open in the pool.
+        DB_MAX_OVERFLOW (int): The number of extra connections allowed above the pool size.
+        DB_POOL_TIMEOUT (int): The seconds to wait for a free pooled connection.
+        DB_POOL_RECYCLE (int): The seconds after which a connection is replaced (not used on SQLite).
+        DB_BUSY_TIMEOUT (int): The milliseconds to wait for a lock (SQLite busy timeout, PostgreSQL lock timeout).
+        SQLITE_JOURNAL_MODE (str): The SQLite journal mode, WAL lets readers run alongside a writer.
+        SQLITE_SYNCHRONOUS (str): The SQLite synchronous setting, NORMAL is safe in WAL mode.
+        SQLITE_MMAP_SIZE (int): The bytes of the SQLite database file read through memory mapping.
+        CACHE_BACKEND (str): `local` for an in-process cache, or a `redis://` URL shared by all workers.
+        CACHE_DEFAULT_TTL (int): The seconds a cached value is kept.
+        CACHE_MAX_ENTRIES (int): The number of entries the local cache keeps before evicting.
+        EVENTS_BACKEND (str): `local` to stream stock changes within one process, a `redis://` URL shared by all workers,
+            or `off` to disable the stream.
+        EVENTS_MAX_SUBSCRIBERS (int): The number of stock event streams a worker serves, each one holds a server thread,
+            so it defaults to half of `SERVER_THREADS` to leave threads for the other requests.
+        EVENTS_QUEUE_SIZE (int): The number of events a slow stream may fall behind before its page has to reload.
+        EVENTS_HISTORY_SIZE (int): The number of latest events kept for streams that reconnect.
+        EVENTS_KEEPALIVE (int): The seconds between keepalive comments on an idle stream.
+        EVENTS_STREAM_SECONDS (int): The seconds after which a stream ends and the browser reconnects.
+        RECEIPT_MAX_BYTES (int): The largest receipt upload accepted, in bytes.
+        RECEIPT_CHUNK_SIZE (int): The bytes copied at a time while storing a receipt.
+        RECEIPT_THUMBNAIL_SIZE (int): The longest side of receipt thumbnails, in pixels.
+        MAX_CONTENT_LENGTH (int): The largest request body accepted, rejects oversized uploads before parsing.
+        PROFILING_ENABLED (bool): Record per-endpoint timings and SQL statistics, served at `/metrics`.
+        METRICS_TOKEN (str): The bearer token a Prometheus scraper sends to read `/metrics` without logging in (optional).
+        PROFILING_N_PLUS_ONE_THRESHOLD (int): How often one SELECT may run in a request before it is flagged as N+1.
+        PROFILING_SAMPLE_INTERVAL (float): The seconds between stack samples, 0 disables the sampling profiler.
+        PROFILING_SLOW_SECONDS (float): Requests at least this slow get their sampled stacks written.
+        PROFILING_OUTPUT_DIR (str): The directory the folded stack files are written to.
     '''
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///inventory.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+    SQLALCHEMY_DATABASE_URI = (os.environ.get('DATABASE_URL') or 'sqlite:///inventory.db') \
+        .replace('postgres://', 'postgresql://', 1)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    ITEM_INSERT_CHUNK_SIZE = int(os.environ.get('ITEM_INSERT_CHUNK_SIZE', 5000))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    REPORTS_DIR = os.environ.get('REPORTS_DIR')
+    REPORT_MAX_AGE = int(os.environ.get('REPORT_MAX_AGE', 24 * 60 * 60))
+    PRODUCTS_PER_PAGE = int(os.environ.get('PRODUCTS_PER_PAGE', 50))
+    ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', 100))
+    SEARCH_RESULTS_PER_PAGE = int(os.environ.get('SEARCH_RESULTS_PER_PAGE', 10))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+    DASHBOARD_DAYS = int(os.environ.get('DASHBOARD_DAYS', 30))
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+    STOCK_ALLOCATION = os.environ.get('STOCK_ALLOCATION', 'fifo')
+    EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get('EXPIRY_SWEEP_BATCH_SIZE', 10000))
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    STOCK_LOTS = os.environ.get('STOCK_LOTS') == '1'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_BUSY_TIMEOUT = int(os.environ.get('DB_BUSY_TIMEOUT', 5000))
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'local')
+    EVENTS_MAX_SUBSCRIBERS = int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', max(1, SERVER_THREADS // 2)))
+    EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))
+    EVENTS_HISTORY_SIZE = int(os.environ.get('EVENTS_HISTORY_SIZE', 1000))
+    EVENTS_KEEPALIVE = int(os.environ.get('EVENTS_KEEPALIVE', 15))
+    EVENTS_STREAM_SECONDS = int(os.environ.get('EVENTS_STREAM_SECONDS', 300))
+    RECEIPT_MAX_BYTES = int(os.environ.get('RECEIPT_MAX_BYTES', 10 * 1024 * 1024))
+    RECEIPT_CHUNK_SIZE = 64 * 1024
+    RECEIPT_THUMBNAIL_SIZE = int(os.environ.get('RECEIPT_THUMBNAIL_SIZE', 320))
+    MAX_CONTENT_LENGTH = RECEIPT_MAX_BYTES + 1024 * 1024
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    PROFILING_N_PLUS_ONE_THRESHOLD = int(os.environ.get('PROFILING_N_PLUS_ONE_THRESHOLD', 5))
+    PROFILING_SAMPLE_INTERVAL = float(os.environ.get('PROFILING_SAMPLE_INTERVAL', 0))
+    PROFILING_SLOW_SECONDS = float(os.environ.get('PROFILING_SLOW_SECONDS', 0.5))
+    PROFILING_OUTPUT_DIR = os.environ.get('PROFILING_OUTPUT_DIR', 'profiles')
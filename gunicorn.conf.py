@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+from config import Config
+
+# Gunicorn settings, used with `gunicorn -c gunicorn.conf.py wsgi:app`
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 8000)}"
+
+# two processes per core plus one, so a worker waiting on the database or disk does not idle a core
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# threads let a worker overlap requests that wait on I/O, such as receipt uploads
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', Config.SERVER_THREADS))
+
+# every stock event stream holds a thread for EVENTS_STREAM_SECONDS, keep some for the other requests
+if 'EVENTS_MAX_SUBSCRIBERS' not in os.environ:
+    Config.EVENTS_MAX_SUBSCRIBERS = threads // 2
+elif Config.EVENTS_MAX_SUBSCRIBERS >= threads:
+    raise RuntimeError(f'EVENTS_MAX_SUBSCRIBERS ({Config.EVENTS_MAX_SUBSCRIBERS}) must be below '
+                       f'the {threads} threads of a worker')
+
+# the local event broker only reaches the pages of its own worker, so several workers share
+# the Redis cache server or run without the stream; the workers fork with this Config
+if workers > 1 and Config.EVENTS_BACKEND == 'local':
+    if 'EVENTS_BACKEND' in os.environ:
+        raise RuntimeError('EVENTS_BACKEND=local does not reach the pages of other workers, '
+                           'use a redis:// URL or off when WEB_CONCURRENCY is above 1')
+    Config.EVENTS_BACKEND = Config.CACHE_BACKEND if Config.CACHE_BACKEND.startswith('redis') else 'off'
+
+# every worker builds its own app after forking, so no database connection, cache
+# or job thread is shared between processes; wsgi.py warms each worker up on import
+preload_app = False
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# restart workers now and then to bound the growth of long running processes
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# an empty GUNICORN_ACCESS_LOG turns the access log off
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
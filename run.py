@@ -1,11 +1,8 @@
-from app import create_app, db
+from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
-    # Membuat/mengkoneksikan database
-    with app.app_context():
-        db.create_all()
-
-    # Menjalankan aplikasi
-    app.run(debug=True)
\ No newline at end of file
+    # Menjalankan aplikasi dengan server pengembangan,
+    # skema database dibuat/diperbarui terpisah dengan `flask migrate`
+    app.run(debug=True)
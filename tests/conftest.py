@@ -0,0 +1,55 @@
+import pytest
+from app import create_app, db
+from app.migrations import upgrade_schema
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path):
+    '''An application bound to a fresh SQLite database with an up to date schema.'''
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'inventory.db'}"
+        # logins are made directly in the session, a cheap hash keeps user creation fast
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1'
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        upgrade_schema()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def log_in(app, client, role:str):
+    '''Log a test client in as a user with a role, creating the user on first use.'''
+    from app.database import DatabaseManager
+    from app.models import User
+    with app.app_context():
+        user = User.query.filter_by(username=f'test-{role}').first() \
+            or DatabaseManager.save_user(f'test-{role}', 'test', role)
+        user_id = user.user_id
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = role
+    return user_id
+
+
+@pytest.fixture
+def login(app):
+    '''Returns a function giving a test client logged in with a role, or anonymous for None.'''
+    def client_as(role:str=None):
+        client = app.test_client()
+        if role is not None:
+            log_in(app, client, role)
+        return client
+    return client_as
+
+
+@pytest.fixture
+def product(app):
+    '''A product with five available items, returned as its ID.'''
+    from app.database import DatabaseManager
+    with app.app_context():
+        return DatabaseManager.add_product('Susu', 'Minuman', 5, 12000, 9000, None, '2024-01-01T08:00').product_id
@@ -0,0 +1,47 @@
+from datetime import datetime
+from app.database import DatabaseManager
+from app.models import ArchivedItem, Item
+
+
+def walk(product_id:int, status:str=None, start_date:str=None, limit:int=2):
+    '''Read every page of the items of a product and list `(item_id, status)` in page order.'''
+    rows, after = [], None
+    while True:
+        items, after = DatabaseManager.paginate_items(product_id, status, start_date, after=after, limit=limit)
+        rows.extend((item.item_id, item.status) for item in items)
+        if after is None:
+            return rows
+
+
+def test_archived_items_stay_in_the_item_pages(app, product):
+    recent = datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
+    with app.app_context():
+        DatabaseManager.add_product('Susu', 'Minuman', 2, 12000, 9000, None, '2024-01-03T08:00')
+        DatabaseManager.reduce_item_quantity(product, 2, 'sold', '2024-01-05T08:00')
+        DatabaseManager.reduce_item_quantity(product, 1, 'broken', '2024-01-06T08:00')
+        DatabaseManager.reduce_item_quantity(product, 1, 'sold', recent)
+        before, sold = walk(product, limit=100), walk(product, 'sold', limit=100)
+
+        assert DatabaseManager.archive_items(365, batch_size=2) == 3
+        assert DatabaseManager.archive_items(365) == 0
+        assert ArchivedItem.query.count() == 3
+        assert Item.query.filter_by(product_id=product).count() == 4
+
+        # the archive is merged back in order, across page boundaries
+        assert walk(product) == before
+        assert walk(product, 'sold') == sold
+        assert [row[1] for row in DatabaseManager.iter_items(product)] == [status for _, status in before]
+        # reads that cannot reach the archive skip it
+        assert DatabaseManager._item_tiers(product, 'available') == (Item,)
+        assert DatabaseManager._item_tiers(product, None, '2024-01-02T00:00') == (Item,)
+        assert walk(product, start_date='2024-01-02T00:00') == before[5:]
+        assert DatabaseManager.check_stock_counts(product) == []
+
+
+def test_archive_items_command_keeps_recent_and_available_items(app, product):
+    with app.app_context():
+        DatabaseManager.reduce_item_quantity(product, 1, 'sold', datetime.utcnow().strftime('%Y-%m-%dT%H:%M'))
+    result = app.test_cli_runner().invoke(args=['archive-items', '--days', '30'])
+    assert 'Archived 0 item(s).' in result.output
+    with app.app_context():
+        assert ArchivedItem.query.count() == 0
@@ -0,0 +1,97 @@
+import pytest
+
+
+@pytest.mark.parametrize('url', ['/products/{product_id}/items.csv', '/products/report.csv'])
+def test_exports_refuse_anonymous_users(login, product, url):
+    response = login().get(url.format(product_id=product))
+    assert response.status_code == 302
+    assert '/login' in response.location
+
+
+@pytest.mark.parametrize('url', ['/products/{product_id}/items.csv', '/products/report.csv'])
+def test_exports_refuse_roles_without_view_stock(login, product, url):
+    assert login('Tamu').get(url.format(product_id=product)).status_code == 403
+
+
+@pytest.mark.parametrize('url', ['/products/{product_id}/items.csv', '/products/report.csv'])
+def test_exports_serve_every_role(login, product, url):
+    for role in ('Cashier', 'Admin Gudang', 'Super Admin'):
+        response = login(role).get(url.format(product_id=product))
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert response.data
+        response.close()
+
+
+@pytest.mark.parametrize('url', ['/products', '/products/rows', '/products/{product_id}', '/products/{product_id}/rows'])
+def test_read_pages_redirect_anonymous_users_to_login(login, product, url):
+    response = login().get(url.format(product_id=product))
+    assert response.status_code == 302
+    assert '/login' in response.location
+
+
+@pytest.mark.parametrize('url', ['/products', '/products/rows', '/products/{product_id}', '/products/{product_id}/rows'])
+def test_read_pages_refuse_roles_without_view_stock(login, product, url):
+    assert login('Tamu').get(url.format(product_id=product)).status_code == 403
+
+
+@pytest.mark.parametrize('url', ['/products', '/products/{product_id}'])
+def test_read_pages_serve_cashiers(login, product, url):
+    assert login('Cashier').get(url.format(product_id=product)).status_code == 200
+
+
+API_URLS = ['/api/v1/products', '/api/v1/products/search?q=susu', '/api/v1/products/{product_id}',
+            '/api/v1/products/{product_id}/items', '/api/v1/stock/events', '/api/v1/cache/stats']
+
+
+@pytest.mark.parametrize('url', API_URLS)
+def test_api_refuses_anonymous_clients(login, product, url):
+    assert login().get(url.format(product_id=product)).status_code == 401
+
+
+@pytest.mark.parametrize('url', API_URLS)
+def test_api_refuses_roles_without_view_stock(login, product, url):
+    assert login('Tamu').get(url.format(product_id=product)).status_code == 403
+
+
+@pytest.mark.parametrize('url', API_URLS[:4])
+def test_api_serves_cashiers(login, product, url):
+    assert login('Cashier').get(url.format(product_id=product)).status_code == 200
+
+
+@pytest.mark.parametrize('role, status', [('Cashier', 403), ('Admin Gudang', 403), ('Super Admin', 200)])
+def test_cache_stats_are_for_administrators_only(login, role, status):
+    assert login(role).get('/api/v1/cache/stats').status_code == status
+
+
+def test_demoted_users_lose_permissions_on_their_next_request(app, login):
+    from app.database import DatabaseManager
+    client = login('Super Admin')
+    assert client.get('/api/v1/cache/stats').status_code == 200
+    with app.app_context():
+        DatabaseManager.save_user('test-Super Admin', 'test', 'Cashier')
+    assert client.get('/api/v1/cache/stats').status_code == 403
+    assert client.get('/api/v1/products').status_code == 200
+    with client.session_transaction() as session:
+        assert session['role'] == 'Cashier'
+
+
+def test_deleted_users_are_logged_out(app, login):
+    from app import db
+    from app.models import User
+    client = login('Cashier')
+    with app.app_context():
+        User.query.filter_by(username='test-Cashier').delete()
+        db.session.commit()
+    response = client.get('/products')
+    assert response.status_code == 302
+    assert '/login' in response.location
+    with client.session_transaction() as session:
+        assert 'role' not in session and 'user_id' not in session
+
+
+def test_a_role_without_a_user_grants_nothing(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['role'] = 'Super Admin'
+    assert client.get('/api/v1/products').status_code == 401
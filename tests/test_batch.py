@@ -0,0 +1,109 @@
+import io
+import pytest
+from werkzeug.datastructures import FileStorage
+from app import uploads
+from app.database import DatabaseManager
+from app.models import Item, Product
+from app.uploads import save_receipt
+
+ENDPOINTS = {
+    '/product/batch/reduce': 'exit_date',
+    '/product/batch/receive': 'entry_date',
+}
+
+
+@pytest.fixture
+def client(login):
+    return login('Admin Gudang')
+
+
+def stock(app, product_id:int):
+    with app.app_context():
+        return DatabaseManager.get_product_row(product_id)
+
+
+def test_batch_reduce_is_all_or_nothing(app, client, product):
+    response = client.post('/product/batch/reduce', json={'exit_date': '2024-06-01T08:00', 'lines': [
+        {'product_id': product, 'quantity': 2, 'status': 'sold'},
+        {'product_id': product, 'quantity': 99, 'status': 'sold'},
+    ]})
+    assert response.status_code == 409
+    assert response.json['line'] == 1
+    assert (stock(app, product).available_count, stock(app, product).sold_count) == (5, 0)
+    with app.app_context():
+        assert Item.query.filter_by(status='sold').count() == 0
+
+    response = client.post('/product/batch/reduce', json={'exit_date': '2024-06-01T08:00', 'lines': [
+        {'product_id': product, 'quantity': 2, 'status': 'sold'},
+        {'product_id': product, 'quantity': 1, 'status': 'broken'},
+    ]})
+    assert response.status_code == 200
+    assert [line['reduced'] for line in response.json['results']] == [2, 1]
+    assert (stock(app, product).available_count, stock(app, product).broken_count) == (2, 1)
+
+
+def test_batch_receive_is_all_or_nothing(app, client, product):
+    line = {'name': 'Teh', 'category': 'Minuman', 'quantity': 3, 'sell_price': 5000, 'buy_price': 4000}
+    response = client.post('/product/batch/receive', json={'entry_date': '2024-06-01T08:00', 'lines': [
+        line, {'name': 'Susu', 'category': 'Minuman', 'quantity': 2, 'sell_price': 12000, 'buy_price': 9000},
+        dict(line, quantity='banyak'),
+    ]})
+    assert response.status_code == 409
+    assert response.json['line'] == 2
+    assert stock(app, product).available_count == 5
+    with app.app_context():
+        assert Product.query.count() == 1
+        assert DatabaseManager.search_products('teh') == []
+
+
+def test_batch_form_failure_writes_nothing(app, client, product):
+    response = client.post('/product/batch/reduce', data={
+        'exit_date': '2024-06-01T08:00', 'product_id': [product, product],
+        'quantity': [1, 99], 'status': ['sold', 'sold']}, follow_redirects=True)
+    assert 'Baris 2 gagal, tidak ada barang yang dikurangi' in response.get_data(as_text=True)
+    assert stock(app, product).available_count == 5
+
+
+@pytest.mark.parametrize('url, date_field', ENDPOINTS.items())
+@pytest.mark.parametrize('body', [
+    '[1]', '"lines"', 'null', '{', '{"lines": []}', '{"DATE": "2024-06-01T08:00", "lines": "x"}',
+    '{"DATE": "2024-06-01T08:00", "lines": [1]}', '{"DATE": "2024-06-01T08:00", "lines": [[1, 2]]}',
+])
+def test_batch_rejects_malformed_json(client, url, date_field, body):
+    response = client.post(url, data=body.replace('DATE', date_field), content_type='application/json')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('url, date_field', ENDPOINTS.items())
+def test_batch_rejects_a_date_that_is_not_text(client, url, date_field):
+    assert client.post(url, json={date_field: 20240601, 'lines': []}).status_code == 400
+
+
+@pytest.mark.parametrize('url, date_field', ENDPOINTS.items())
+@pytest.mark.parametrize('receipt', [
+    'javascript:alert(1)', 'https://example.com/struk.pdf', '/static/uploads/../../app.py',
+    '/static/uploads/ab/' + 'ab' * 32 + '.pdf', 42,
+])
+def test_batch_rejects_receipts_that_were_not_uploaded(app, client, product, url, date_field, receipt):
+    field = 'purchase_receipt' if date_field == 'exit_date' else 'sales_receipt'
+    line = {'product_id': product, 'quantity': 1, 'status': 'sold'} if date_field == 'exit_date' else \
+        {'name': 'Teh', 'category': 'Minuman', 'quantity': 1, 'sell_price': 5000, 'buy_price': 4000}
+    response = client.post(url, json={date_field: '2024-06-01T08:00', field: receipt, 'lines': [line]})
+    assert response.status_code == 400
+    with app.app_context():
+        assert Item.query.count() == 5
+
+
+def test_batch_accepts_an_uploaded_receipt(app, client, product, monkeypatch, tmp_path):
+    directory = tmp_path / 'uploads'
+    directory.mkdir()
+    monkeypatch.setattr(uploads, 'uploads_dir', lambda: str(directory))
+    with app.test_request_context():
+        receipt = save_receipt(FileStorage(io.BytesIO(b'struk'), 'struk.pdf'))
+
+    response = client.post('/product/batch/reduce', json={
+        'exit_date': '2024-06-01T08:00', 'purchase_receipt': receipt,
+        'lines': [{'product_id': product, 'quantity': 1, 'status': 'sold'}]})
+    assert response.status_code == 200
+    with app.app_context():
+        assert Item.query.filter_by(status='sold').one().purchase_receipt == receipt
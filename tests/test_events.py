@@ -0,0 +1,74 @@
+import json
+from app.database import DatabaseManager
+
+
+def test_stream_off_answers_no_content(app, login, product):
+    app.config['EVENTS_BACKEND'] = 'off'
+    app.extensions['stock_events'] = None
+    client = login('Cashier')
+    assert client.get('/api/v1/stock/events').status_code == 204
+    assert b'live_stock.js' not in client.get('/products').data
+    with app.app_context():
+        # writes still succeed without a broker to publish to
+        DatabaseManager.reduce_item_quantity(product, 1, 'sold', '2024-06-01T08:00')
+
+
+def test_collapse_items_publishes_new_versions(app, product):
+    broker = app.extensions['stock_events']
+    subscription = broker.subscribe()
+    with app.app_context():
+        version = DatabaseManager.get_product_row(product).version
+        assert DatabaseManager.collapse_items(product) == (5, 1)
+        assert DatabaseManager.get_product_row(product).version == version + 1
+    event_id, data = subscription.get(timeout=1)
+    assert json.loads(data)['products'] == [{
+        'product_id': product, 'version': version + 1,
+        'counts': {'available': 5, 'sold': 0, 'expire': 0, 'broken': 0},
+    }]
+    broker.unsubscribe(subscription)
+
+
+def test_every_subscriber_receives_each_write(app, product):
+    broker = app.extensions['stock_events']
+    broker.max_subscribers = 50
+    subscriptions = [broker.subscribe() for _ in range(50)]
+    with app.app_context():
+        for _ in range(3):
+            DatabaseManager.reduce_item_quantity(product, 1, 'sold', '2024-06-01T08:00')
+        version = DatabaseManager.get_product_row(product).version
+
+    for subscription in subscriptions:
+        events = [json.loads(subscription.get(timeout=1)[1])['products'] for _ in range(3)]
+        assert [products[0]['counts']['available'] for products in events] == [4, 3, 2]
+        assert events[-1][0]['version'] == version
+        assert subscription.get(timeout=0) is None
+        broker.unsubscribe(subscription)
+    assert broker.subscriber_count() == 0
+
+
+def test_stream_replays_the_events_missed_since_the_last_one(app, login, product):
+    app.config['EVENTS_STREAM_SECONDS'] = 0.2
+    with app.app_context():
+        DatabaseManager.reduce_item_quantity(product, 1, 'sold', '2024-06-01T08:00')
+    client = login('Cashier')
+
+    response = client.get('/api/v1/stock/events', headers={'Last-Event-ID': '0'})
+    assert response.mimetype == 'text/event-stream'
+    body = response.get_data(as_text=True)
+    assert body.startswith('retry: ')
+    assert 'id: 1\nevent: stock\ndata: {"products":[{"product_id":%d,' % product in body
+    response.close()
+
+    # an ID the broker never handed out, e.g. from before a restart, cannot be replayed
+    response = client.get('/api/v1/stock/events', headers={'Last-Event-ID': '99'})
+    assert 'event: reset' in response.get_data(as_text=True)
+    response.close()
+    assert app.extensions['stock_events'].subscriber_count() == 0
+
+
+def test_streams_over_the_worker_limit_are_refused(app, login):
+    broker = app.extensions['stock_events']
+    broker.max_subscribers = 1
+    subscription = broker.subscribe()
+    assert login('Cashier').get('/api/v1/stock/events').status_code == 503
+    broker.unsubscribe(subscription)
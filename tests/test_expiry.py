@@ -0,0 +1,79 @@
+from datetime import date
+import pytest
+from app import db
+from app.database import DatabaseManager, InsufficientStockError
+from app.models import Item, Product
+
+
+def receive(quantity:int, entry_date:str, expiry_date:str=None):
+    '''Receive items of the same yoghurt product, returned as its ID.'''
+    return DatabaseManager.add_product(
+        'Yoghurt', 'Minuman', quantity, 8000, 6000, None, entry_date, expiry_date=expiry_date).product_id
+
+
+def expiry_of(product_id:int, status:str):
+    '''Count the items of a product in a status per expiry date.'''
+    return dict(db.session.query(Item.expiry_date, db.func.sum(Item.quantity))
+                .filter(Item.product_id == product_id, Item.status == status)
+                .group_by(Item.expiry_date))
+
+
+@pytest.mark.parametrize('lots', [False, True])
+def test_expire_items_sweeps_only_items_past_their_expiry_date(app, lots):
+    app.config['STOCK_LOTS'] = lots
+    with app.app_context():
+        product_id = receive(3, '2024-01-01T08:00', '2024-02-01')
+        receive(2, '2024-01-02T08:00', '2024-03-01')
+        receive(1, '2024-01-03T08:00')
+        assert DatabaseManager.expire_items(date(2024, 2, 15), batch_size=2) == {product_id: 3}
+        assert DatabaseManager.expire_items(date(2024, 2, 15)) == {}
+        assert expiry_of(product_id, 'expire') == {date(2024, 2, 1): 3}
+        assert expiry_of(product_id, 'available') == {date(2024, 3, 1): 2, None: 1}
+        product = Product.query.get(product_id)
+        assert (product.available_count, product.expire_count) == (3, 3)
+        assert DatabaseManager.check_stock_counts(product_id) == []
+
+
+def test_expire_stock_command_reports_the_sweep(app):
+    with app.app_context():
+        receive(4, '2024-01-01T08:00', '2024-02-01')
+    result = app.test_cli_runner().invoke(args=['expire-stock', '--as-of', '2024-02-02'])
+    assert 'Expired 4 item(s) of 1 product(s).' in result.output
+
+
+@pytest.mark.parametrize('lots', [False, True])
+def test_fefo_reduces_the_items_expiring_first(app, lots):
+    app.config.update(STOCK_LOTS=lots, STOCK_ALLOCATION='fefo')
+    with app.app_context():
+        product_id = receive(2, '2024-01-01T08:00')
+        receive(2, '2024-01-02T08:00', '2024-03-01')
+        receive(2, '2024-01-03T08:00', '2024-02-01')
+        assert DatabaseManager.reduce_item_quantity(product_id, 3, 'sold', '2024-01-10T08:00') == 3
+        assert expiry_of(product_id, 'sold') == {date(2024, 2, 1): 2, date(2024, 3, 1): 1}
+        # the items that do not perish are only sold once the perishable ones are gone
+        assert DatabaseManager.reduce_item_quantity(product_id, 2, 'sold', '2024-01-10T08:00') == 2
+        assert expiry_of(product_id, 'available') == {None: 1}
+        assert DatabaseManager.check_stock_counts(product_id) == []
+
+
+def test_fifo_reduces_the_oldest_items_first(app):
+    with app.app_context():
+        product_id = receive(2, '2024-01-01T08:00', '2024-03-01')
+        receive(2, '2024-01-02T08:00', '2024-02-01')
+        DatabaseManager.reduce_item_quantity(product_id, 2, 'sold', '2024-01-10T08:00')
+        assert expiry_of(product_id, 'sold') == {date(2024, 3, 1): 2}
+
+
+@pytest.mark.parametrize('allocation', ['fifo', 'fefo'])
+def test_expired_items_are_never_sold_before_the_sweep(app, allocation):
+    app.config['STOCK_ALLOCATION'] = allocation
+    with app.app_context():
+        product_id = receive(2, '2024-01-01T08:00', '2024-02-01')
+        receive(1, '2024-01-02T08:00', '2024-03-01')
+        with pytest.raises(InsufficientStockError):
+            DatabaseManager.reduce_item_quantity(product_id, 2, 'sold', '2024-02-10T08:00')
+        assert expiry_of(product_id, 'sold') == {}
+        assert DatabaseManager.reduce_item_quantity(product_id, 1, 'sold', '2024-02-10T08:00') == 1
+        assert expiry_of(product_id, 'sold') == {date(2024, 3, 1): 1}
+        # expired items may still be written off as broken
+        assert DatabaseManager.reduce_item_quantity(product_id, 2, 'broken', '2024-02-10T08:00') == 2
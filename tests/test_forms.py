@@ -0,0 +1,59 @@
+import pytest
+from app.models import Item, Product
+
+
+def add_product_form(**values):
+    form = {'name': 'Teh', 'category': 'Minuman', 'quantity': 3, 'sell_price': 5000, 'buy_price': 4000,
+            'entry_date': '2024-01-01T08:00', 'sales_receipt': (b'', '')}
+    form.update(values)
+    return form
+
+
+@pytest.mark.parametrize('values', [{'quantity': -3}, {'quantity': 'tiga'}, {'sell_price': 'mahal'},
+                                    {'entry_date': 'kemarin'}])
+def test_add_product_flashes_invalid_values(app, login, values):
+    client = login('Admin Gudang')
+    response = client.post('/product/add', data=add_product_form(**values), content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert response.location.endswith('/product/add')
+    assert 'Data barang tidak valid' in client.get('/product/add').get_data(as_text=True)
+    with app.app_context():
+        assert Product.query.count() == 0
+        assert Item.query.count() == 0
+
+
+def test_add_product_adds_items(app, login):
+    response = login('Admin Gudang').post('/product/add', data=add_product_form(), content_type='multipart/form-data')
+    assert response.status_code == 302
+    with app.app_context():
+        assert Product.query.one().available_count == 3
+
+
+def reduce_form(product_id:int, **values):
+    form = {'product_id': product_id, 'quantity': 2, 'status': 'sold', 'exit_date': '2024-06-01T08:00'}
+    form.update(values)
+    return form
+
+
+@pytest.mark.parametrize('values, message', [
+    ({'status': 'available'}, 'Jumlah atau status pengurangan tidak valid'),
+    ({'status': 'hilang'}, 'Jumlah atau status pengurangan tidak valid'),
+    ({'quantity': 'dua'}, 'Jumlah atau status pengurangan tidak valid'),
+    ({'exit_date': 'kemarin'}, 'Data pengurangan tidak valid'),
+    ({'quantity': 99}, 'Stok tidak cukup: tersedia 5, diminta 99'),
+])
+def test_reduce_product_flashes_invalid_values(app, login, product, values, message):
+    client = login('Cashier')
+    response = client.post('/product/reduce', data=reduce_form(product, **values))
+    assert response.status_code == 302
+    assert response.location.endswith('/product/reduce')
+    assert message in client.get('/product/reduce').get_data(as_text=True)
+    with app.app_context():
+        assert Product.query.get(product).available_count == 5
+
+
+def test_reduce_product_reduces_items(app, login, product):
+    response = login('Cashier').post('/product/reduce', data=reduce_form(product, status='broken'))
+    assert response.status_code == 302
+    with app.app_context():
+        assert Product.query.get(product).status_counts == {'available': 3, 'sold': 0, 'expire': 0, 'broken': 2}
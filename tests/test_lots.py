@@ -0,0 +1,82 @@
+import pytest
+from app.database import DatabaseManager, InsufficientStockError
+from app.models import Item, Product
+
+
+@pytest.fixture
+def lot(app):
+    '''A product received as one lot of five units while `STOCK_LOTS` was enabled.'''
+    app.config['STOCK_LOTS'] = True
+    with app.app_context():
+        product_id = DatabaseManager.add_product('Beras', 'Pokok', 5, 15000, 12000, None, '2024-01-01T08:00').product_id
+    return product_id
+
+
+def test_lots_left_after_disabling_lots_are_reported_and_split(app, lot):
+    app.config['STOCK_LOTS'] = False
+    with app.app_context():
+        # the counters include the lot, but single-unit reductions cannot claim it
+        with pytest.raises(InsufficientStockError):
+            DatabaseManager.reduce_item_quantity(lot, 1, 'sold', '2024-06-01T08:00')
+        assert DatabaseManager.find_unclaimable_lots() == {lot: 5}
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['check-stock'])
+    assert result.exit_code != 0
+    assert 'run `flask split-lots`' in result.output
+
+    result = runner.invoke(args=['split-lots'])
+    assert 'Split 1 lot(s) into 5 item row(s).' in result.output
+    assert runner.invoke(args=['check-stock']).exit_code == 0
+    with app.app_context():
+        assert [item.quantity for item in Item.query.filter_by(product_id=lot)] == [1] * 5
+        assert DatabaseManager.reduce_item_quantity(lot, 2, 'sold', '2024-06-01T08:00') == 2
+        assert DatabaseManager.check_stock_counts(lot) == []
+
+
+def test_split_lots_refuses_while_lots_are_enabled(app, lot):
+    result = app.test_cli_runner().invoke(args=['split-lots'])
+    assert result.exit_code != 0
+    with app.app_context():
+        assert DatabaseManager.find_unclaimable_lots() == {}
+
+
+def lots_of(product_id:int):
+    '''List the rows of a product as `(status, quantity, purchase_receipt)`.'''
+    return [(item.status, item.quantity, item.purchase_receipt)
+            for item in Item.query.filter_by(product_id=product_id).order_by(Item.item_id)]
+
+
+def test_partial_reductions_split_the_lot(app, lot):
+    with app.app_context():
+        assert lots_of(lot) == [('available', 5, None)]
+        assert DatabaseManager.reduce_item_quantity(lot, 2, 'sold', '2024-01-02T08:00', 'nota-1') == 2
+        assert lots_of(lot) == [('available', 3, None), ('sold', 2, 'nota-1')]
+        with pytest.raises(InsufficientStockError):
+            DatabaseManager.reduce_item_quantity(lot, 4, 'broken', '2024-01-02T08:00')
+        assert lots_of(lot) == [('available', 3, None), ('sold', 2, 'nota-1')]
+        # a reduction of the whole lot claims it without splitting
+        assert DatabaseManager.reduce_item_quantity(lot, 3, 'broken', '2024-01-03T08:00') == 3
+        assert lots_of(lot) == [('broken', 3, None), ('sold', 2, 'nota-1')]
+        assert DatabaseManager.check_stock_counts(lot) == []
+
+
+def test_collapse_items_merges_rows_into_lots(app, product):
+    with app.app_context():
+        DatabaseManager.add_product('Susu', 'Minuman', 3, 12000, 9000, None, '2024-01-02T08:00')
+        DatabaseManager.reduce_item_quantity(product, 2, 'sold', '2024-01-03T08:00', 'nota-1')
+        version = Product.query.get(product).version
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['collapse-items']).exit_code != 0
+
+    app.config['STOCK_LOTS'] = True
+    result = runner.invoke(args=['collapse-items'])
+    assert 'Collapsed 8 item row(s) into 3 lot(s).' in result.output
+    with app.app_context():
+        assert sorted(lots_of(product)) == [('available', 3, None), ('available', 3, None), ('sold', 2, 'nota-1')]
+        assert Product.query.get(product).version == version + 1
+        assert DatabaseManager.check_stock_counts(product) == []
+        # products that are already collapsed are left untouched
+        assert DatabaseManager.collapse_items(product) == (0, 0)
+        assert DatabaseManager.reduce_item_quantity(product, 4, 'sold', '2024-01-04T08:00') == 4
+        assert DatabaseManager.check_stock_counts(product) == []
@@ -0,0 +1,31 @@
+from datetime import datetime
+from app import db
+from app.database import DatabaseManager
+from app.migrations import upgrade_schema
+from app.models import Item, Product, StockMovement
+
+
+def test_upgrade_merges_duplicate_products_before_the_identity_index(app, product):
+    with app.app_context():
+        # a database from before the unique index, where the same product was entered twice
+        db.session.execute(db.text('DROP INDEX ux_product_identity'))
+        duplicate = Product(name='Susu', category='Minuman', sell_price=12000, buy_price=9000,
+                            available_count=2, sold_count=1)
+        db.session.add(duplicate)
+        db.session.flush()
+        db.session.add_all([
+            Item(product_id=duplicate.product_id, entry_date=datetime(2024, 2, 1, 8), status='available', quantity=2),
+            Item(product_id=duplicate.product_id, entry_date=datetime(2024, 2, 1, 8),
+                 exit_date=datetime(2024, 3, 1, 8), status='sold'),
+        ])
+        db.session.commit()
+
+        applied = upgrade_schema()
+        assert 'merge 1 duplicate product(s)' in applied
+        assert 'create index ux_product_identity' in applied
+        assert Product.query.count() == 1
+        assert Item.query.filter(Item.product_id != product).count() == 0
+        assert Product.query.get(product).status_counts == {'available': 7, 'sold': 1, 'expire': 0, 'broken': 0}
+        assert DatabaseManager.check_stock_counts() == []
+        assert [row.product_id for row in DatabaseManager.search_products('susu')] == [product]
+        assert {row.product_id for row in StockMovement.query} == {product}
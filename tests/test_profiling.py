@@ -0,0 +1,47 @@
+import pytest
+from app import create_app, db
+from app.migrations import upgrade_schema
+from config import Config
+from tests.conftest import log_in
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    '''An application recording request statistics, with a scrape token.'''
+    class ProfilingConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'inventory.db'}"
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1'
+        PROFILING_ENABLED = True
+        METRICS_TOKEN = 'scrape-token'
+
+    app = create_app(ProfilingConfig)
+    with app.app_context():
+        upgrade_schema()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def client_as(app, role:str=None):
+    client = app.test_client()
+    if role is not None:
+        log_in(app, client, role)
+    return client
+
+
+@pytest.mark.parametrize('url', ['/metrics', '/metrics.json'])
+def test_metrics_refuse_users_without_view_metrics(profiled_app, url):
+    assert client_as(profiled_app).get(url).status_code == 401
+    for role in ('Cashier', 'Admin Gudang'):
+        assert client_as(profiled_app, role).get(url).status_code == 403
+    wrong_token = {'Authorization': 'Bearer wrong'}
+    assert client_as(profiled_app).get(url, headers=wrong_token).status_code == 401
+
+
+@pytest.mark.parametrize('url', ['/metrics', '/metrics.json'])
+def test_metrics_serve_super_admins_and_the_scraper(profiled_app, url):
+    assert client_as(profiled_app, 'Super Admin').get(url).status_code == 200
+    token = {'Authorization': 'Bearer scrape-token'}
+    assert client_as(profiled_app).get(url, headers=token).status_code == 200
@@ -0,0 +1,19 @@
+import pytest
+from app.query_plan import assert_uses_index, hot_query_indexes
+
+HOT_QUERIES = [
+    'items', 'products', 'add_product', 'search_products', 'reduce_item_quantity', 'reduce_item_quantity_fefo',
+    'expire_items', 'report', 'items_archive', 'report_archive', 'archive_items', 'dashboard',
+]
+
+
+def test_every_hot_query_is_checked(app):
+    with app.app_context():
+        assert sorted(hot_query_indexes()) == sorted(HOT_QUERIES)
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_its_index(app, product, name):
+    with app.app_context():
+        statement, index_name = hot_query_indexes()[name]
+        assert_uses_index(statement, index_name)
@@ -0,0 +1,34 @@
+import threading
+import pytest
+from app import db
+from app.database import DatabaseManager, InsufficientStockError
+from app.models import Item
+from benchmarks.concurrent_reduce import reducer
+
+
+@pytest.mark.parametrize('lots', [False, True])
+def test_concurrent_reducers_never_claim_an_item_twice(app, lots):
+    app.config['STOCK_LOTS'] = lots
+    with app.app_context():
+        product_id = DatabaseManager.add_product_bulk(
+            'contended', 'test', 300, 2, 1, None, '2024-01-01T08:00')[0].product_id
+
+    claimed = {}
+    threads = [
+        threading.Thread(target=reducer, args=(app, product_id, 3, f'reducer-{index}', claimed))
+        for index in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        stored = dict(db.session.query(Item.purchase_receipt, db.func.sum(Item.quantity))
+                      .filter(Item.product_id == product_id, Item.status == 'sold')
+                      .group_by(Item.purchase_receipt))
+        assert sum(claimed.values()) == 300
+        assert stored == {name: count for name, count in claimed.items() if count}
+        assert DatabaseManager.check_stock_counts(product_id) == []
+        with pytest.raises(InsufficientStockError):
+            DatabaseManager.reduce_item_quantity(product_id, 1, 'sold', '2024-01-02T08:00')
@@ -0,0 +1,88 @@
+import os
+import time
+import pytest
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+from app.reports import STORY_LOOKAHEAD, LazyStory, build_weekly_report, delete_old_reports, report_path
+
+
+@pytest.fixture
+def reports_dir(app, tmp_path):
+    '''Points the application at an empty reports directory.'''
+    directory = tmp_path / 'reports'
+    directory.mkdir()
+    app.config['REPORTS_DIR'] = str(directory)
+    return directory
+
+
+def test_generate_report_refuses_get(login):
+    assert login('Cashier').get('/products/report').status_code == 405
+
+
+def test_generate_report_refuses_anonymous_users(login, reports_dir):
+    response = login().post('/products/report')
+    assert response.status_code == 302
+    assert '/login' in response.location
+    assert login('Tamu').post('/products/report').status_code == 403
+    assert not os.listdir(reports_dir)
+
+
+def test_generate_report_builds_the_pdf(login, product, reports_dir):
+    client = login('Cashier')
+    response = client.post('/products/report')
+    assert response.status_code == 302
+    deadline = time.monotonic() + 30
+    while client.get(response.location + '/status').json['status'] not in ('done', 'failed'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert client.get(response.location + '/status').json['status'] == 'done'
+    download = client.get(response.location + '/download')
+    assert download.data.startswith(b'%PDF')
+    download.close()
+    assert [name for name in os.listdir(reports_dir) if name.endswith('.part')] == []
+
+
+def test_report_of_another_worker_is_running_while_partial(login, reports_dir):
+    client = login('Cashier')
+    open(report_path(str(reports_dir), 'other') + '.part', 'wb').close()
+    assert client.get('/products/report/other/status').json['status'] == 'running'
+    os.replace(report_path(str(reports_dir), 'other') + '.part', report_path(str(reports_dir), 'other'))
+    assert client.get('/products/report/other/status').json['status'] == 'done'
+    assert client.get('/products/report/missing/status').status_code == 404
+
+
+def test_delete_old_reports_keeps_recent_files(reports_dir):
+    old, recent = report_path(str(reports_dir), 'old'), report_path(str(reports_dir), 'recent')
+    for path in (old, old + '.part', recent):
+        open(path, 'wb').close()
+    past = time.time() - 7200
+    os.utime(old, (past, past))
+    os.utime(old + '.part', (past, past))
+    assert delete_old_reports(str(reports_dir), 3600) == 2
+    assert os.listdir(reports_dir) == [os.path.basename(recent)]
+
+
+def test_build_weekly_report_splits_tables(app, product, tmp_path):
+    with app.app_context():
+        pdf_path = build_weekly_report(str(tmp_path / 'report.pdf'), chunk_size=2)
+    assert os.path.getsize(pdf_path) > 0
+    assert not os.path.exists(pdf_path + '.part')
+
+
+def test_lazy_story_buffers_a_bounded_number_of_flowables(tmp_path):
+    style, buffered = getSampleStyleSheet()['Normal'], []
+
+    class RecordingStory(LazyStory):
+        def _fill(self, size):
+            super()._fill(size)
+            buffered.append(list.__len__(self))
+
+    produced = []
+    def flowables():
+        for row in range(2000):
+            produced.append(row)
+            yield Paragraph(f'Baris {row}', style)
+
+    SimpleDocTemplate(str(tmp_path / 'story.pdf')).build(RecordingStory(flowables()))
+    assert len(produced) == 2000
+    assert max(buffered) <= STORY_LOOKAHEAD
@@ -0,0 +1,64 @@
+import pytest
+from app import db
+from app.database import DatabaseManager
+from app.search import search_table
+
+
+def names(query:str):
+    '''Search the catalog and list the names of the matching products.'''
+    return [product.name for product in DatabaseManager.search_products(query)]
+
+
+def test_search_matches_word_prefixes_of_name_and_category(app, product):
+    with app.app_context():
+        DatabaseManager.add_product('Susu Kental Manis', 'Minuman', 2, 15000, 11000, None, '2024-01-01T08:00')
+        DatabaseManager.add_product('Roti Tawar', 'Makanan', 2, 18000, 14000, None, '2024-01-01T08:00')
+        assert sorted(names('su')) == ['Susu', 'Susu Kental Manis']
+        assert names('su ken') == ['Susu Kental Manis']
+        assert names('mak') == ['Roti Tawar']
+        assert names('kopi') == []
+        assert names('') == []
+
+
+def test_search_index_follows_product_changes(app, product):
+    with app.app_context():
+        DatabaseManager.update_product(product, name='Teh Botol')
+        assert names('susu') == []
+        assert names('teh') == ['Teh Botol']
+
+        other = DatabaseManager.add_product('Teh Celup', 'Minuman', 1, 5000, 4000, None, '2024-01-01T08:00')
+        # a rejected rename leaves the index as it was
+        with pytest.raises(ValueError):
+            DatabaseManager.update_product(other.product_id, name='Teh Botol', sell_price=12000, buy_price=9000)
+        assert sorted(names('teh')) == ['Teh Botol', 'Teh Celup']
+
+        DatabaseManager.delete_product(product)
+        assert names('teh') == ['Teh Celup']
+
+
+def test_batch_receipts_index_new_products(app):
+    with app.app_context():
+        DatabaseManager.receive_items_batch([
+            {'name': 'Gula Pasir', 'category': 'Pokok', 'quantity': 2, 'sell_price': 16000, 'buy_price': 13000},
+            {'name': 'Gula Merah', 'category': 'Pokok', 'quantity': 1, 'sell_price': 20000, 'buy_price': 17000},
+        ], '2024-01-01T08:00')
+        assert sorted(names('gula')) == ['Gula Merah', 'Gula Pasir']
+
+
+def test_rebuild_search_restores_the_index(app, product):
+    with app.app_context():
+        db.session.execute(search_table.delete())
+        db.session.commit()
+        assert names('susu') == []
+    result = app.test_cli_runner().invoke(args=['rebuild-search'])
+    assert 'Indexed 1 product(s) for search.' in result.output
+    with app.app_context():
+        assert names('susu') == ['Susu']
+
+
+def test_search_endpoint_returns_the_counters(login, product):
+    response = login('Cashier').get('/api/v1/products/search?q=sus')
+    assert response.status_code == 200
+    [found] = response.json['products']
+    assert (found['product_id'], found['name']) == (product, 'Susu')
+    assert found['counts']['available'] == 5
@@ -0,0 +1,47 @@
+import multiprocessing
+import runpy
+import pytest
+from config import Config
+
+
+def load_gunicorn_config(monkeypatch, **environ):
+    for name in ('WEB_CONCURRENCY', 'GUNICORN_THREADS', 'EVENTS_BACKEND', 'EVENTS_MAX_SUBSCRIBERS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    # Config was read before the environment changed, and the config file adjusts the class the
+    # workers fork with, so set it as importing config.py would and restore it afterwards
+    monkeypatch.setattr(Config, 'EVENTS_BACKEND', environ.get('EVENTS_BACKEND', 'local'))
+    monkeypatch.setattr(Config, 'CACHE_BACKEND', environ.get('CACHE_BACKEND', 'local'))
+    monkeypatch.setattr(Config, 'EVENTS_MAX_SUBSCRIBERS',
+                        int(environ.get('EVENTS_MAX_SUBSCRIBERS', Config.EVENTS_MAX_SUBSCRIBERS)))
+    return runpy.run_path('gunicorn.conf.py')
+
+
+def test_gunicorn_defaults_follow_the_documented_values(monkeypatch):
+    settings = load_gunicorn_config(monkeypatch)
+    assert settings['workers'] == multiprocessing.cpu_count() * 2 + 1
+    assert settings['threads'] == Config.SERVER_THREADS
+
+
+def test_gunicorn_environment_overrides(monkeypatch):
+    settings = load_gunicorn_config(monkeypatch, WEB_CONCURRENCY='3', GUNICORN_THREADS='6')
+    assert (settings['workers'], settings['threads']) == (3, 6)
+
+
+def test_event_streams_leave_threads_for_other_requests(monkeypatch):
+    load_gunicorn_config(monkeypatch, GUNICORN_THREADS='6')
+    assert Config.EVENTS_MAX_SUBSCRIBERS == 3
+    with pytest.raises(RuntimeError):
+        load_gunicorn_config(monkeypatch, GUNICORN_THREADS='4', EVENTS_MAX_SUBSCRIBERS='32')
+
+
+def test_several_workers_do_not_use_the_local_event_broker(monkeypatch):
+    load_gunicorn_config(monkeypatch, WEB_CONCURRENCY='2')
+    assert Config.EVENTS_BACKEND == 'off'
+    load_gunicorn_config(monkeypatch, WEB_CONCURRENCY='2', CACHE_BACKEND='redis://cache:6379/0')
+    assert Config.EVENTS_BACKEND == 'redis://cache:6379/0'
+    with pytest.raises(RuntimeError):
+        load_gunicorn_config(monkeypatch, WEB_CONCURRENCY='2', EVENTS_BACKEND='local')
+    load_gunicorn_config(monkeypatch, WEB_CONCURRENCY='1')
+    assert Config.EVENTS_BACKEND == 'local'
@@ -0,0 +1,19 @@
+import pytest
+from benchmarks.statement_count import PAGES, count_statements
+
+
+@pytest.fixture(scope='module')
+def counts():
+    '''The statements and ORM instances of every page on a small and a ten times larger catalog.'''
+    return count_statements([5, 50])
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_statement_count_does_not_grow_with_the_catalog(counts, page):
+    statements = {size: statements for size, (statements, _) in counts[page].items()}
+    assert len(set(statements.values())) == 1, statements
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_pages_load_no_orm_instances(counts, page):
+    assert all(instances == 0 for _, instances in counts[page].values()), counts[page]
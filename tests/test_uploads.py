@@ -0,0 +1,37 @@
+import io
+import os
+import stat
+import pytest
+from werkzeug.datastructures import FileStorage
+from app import uploads
+from app.uploads import ReceiptTooLargeError, save_receipt
+
+
+@pytest.fixture
+def uploads_dir(monkeypatch, tmp_path):
+    '''Stores receipts in an empty directory instead of app/static/uploads.'''
+    directory = tmp_path / 'uploads'
+    directory.mkdir()
+    monkeypatch.setattr(uploads, 'uploads_dir', lambda: str(directory))
+    return directory
+
+
+def test_saved_receipts_are_readable_by_the_web_server(app, uploads_dir):
+    with app.test_request_context():
+        url = save_receipt(FileStorage(io.BytesIO(b'struk'), 'struk.txt'))
+    path = os.path.join(uploads_dir, url.split('/uploads/', 1)[1])
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert [name for name in os.listdir(uploads_dir) if name.endswith('.part')] == []
+
+
+def test_oversized_receipts_are_refused(app, login, uploads_dir):
+    app.config['RECEIPT_MAX_BYTES'] = 4
+    with app.test_request_context(), pytest.raises(ReceiptTooLargeError):
+        save_receipt(FileStorage(io.BytesIO(b'struk'), 'struk.txt'))
+    assert os.listdir(uploads_dir) == []
+
+    response = login('Admin Gudang').post('/product/add', data={
+        'name': 'Susu', 'category': 'Minuman', 'quantity': 1, 'sell_price': 2, 'buy_price': 1,
+        'entry_date': '2024-01-01T08:00', 'sales_receipt': (io.BytesIO(b'struk'), 'struk.txt')},
+        content_type='multipart/form-data', follow_redirects=True)
+    assert 'Struk terlalu besar, maksimal 0 MB.' in response.get_data(as_text=True)
@@ -0,0 +1,7 @@
+from app.warmup import warm_up
+
+
+def test_warm_up_reads_categories_first_page_and_search(app, product):
+    assert warm_up(app) == [
+        'compile templates', 'open database connection', 'prime category cache', 'read first product page and search',
+    ]
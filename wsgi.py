@@ -0,0 +1,16 @@
+import os
+from app import create_app
+from app.warmup import warm_up
+from config import Config
+
+# Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app`, or `python wsgi.py` for waitress
+app = create_app()
+warm_up(app)
+
+if __name__ == '__main__':
+    # waitress serves with threads in a single process and also runs on Windows
+    from waitress import serve
+    serve(app,
+          host=os.environ.get('HOST', '0.0.0.0'),
+          port=int(os.environ.get('PORT', 8000)),
+          threads=int(os.environ.get('WAITRESS_THREADS', Config.SERVER_THREADS)))